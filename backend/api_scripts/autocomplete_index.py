@@ -0,0 +1,155 @@
+import re
+import time
+import heapq
+from array import array
+from bisect import bisect_left
+from api_scripts.card_names import normalize_card_name
+
+# Words a query can start matching from, ex. "Atraxa, Praetors' Voice" is found by "atr", "praetors v" and "voice"
+WORD_SPLIT = re.compile(r"[\s/\-]+")
+# Sorts after every character a normalized key can contain ([a-z0-9]), so prefix + KEY_END bounds a prefix range
+KEY_END = "{"
+
+class PrefixIndex:
+    # Sorted normalized keys with the card each one belongs to, card numbers are ranks (0 = best edhrec_rank)
+    # Prefixes up to precomputed_length characters match thousands of keys, their top results are computed on load
+    # A longer prefix is a range of keys, its best cards come out of a segment tree over the card numbers one at a time,
+    # so a search costs O(limit log n) however many keys the prefix matches
+    def __init__(self, entries:list, max_results:int, precomputed_length:int):
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.cards = array('i', (card for _, card in entries))
+        self.max_results = max_results
+        self.precomputed_length = precomputed_length
+        self.top = dict()
+        for length in range(1, precomputed_length + 1):
+            groups = dict()
+            for key, card in entries:
+                if len(key) >= length:
+                    groups.setdefault(key[:length], set()).add(card)
+            for prefix, cards in groups.items():
+                self.top[prefix] = heapq.nsmallest(max_results, cards)
+
+        # tree[i] is the position of the best card under node i (-1 for none), the leaves are tree[size:size + n]
+        self.size = 1 << max(len(self.cards) - 1, 0).bit_length()
+        self.tree = array('i', [-1]) * (2 * self.size)
+        self.tree[self.size:self.size + len(self.cards)] = array('i', range(len(self.cards)))
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = self.better(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def better(self, a:int, b:int) -> int:
+        if a < 0:
+            return b
+        if b < 0 or self.cards[a] <= self.cards[b]:
+            return a
+        return b
+
+    def best_position(self, lo:int, hi:int) -> int:
+        # Position of the best card in keys[lo:hi], -1 if the range is empty
+        best = -1
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                best = self.better(best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self.better(best, self.tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def search(self, prefix:str, limit:int) -> list:
+        if len(prefix) <= self.precomputed_length:
+            return self.top.get(prefix, [])[:limit]
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + KEY_END, lo)
+
+        # Best first: pop a range's best card, then push the best of what's left on either side of it
+        results = []
+        seen = set()
+        ranges = []
+        position = self.best_position(lo, hi)
+        if position >= 0:
+            ranges.append((self.cards[position], position, lo, hi))
+        while ranges and len(results) < limit:
+            card, position, start, end = heapq.heappop(ranges)
+            # A card can have several keys in the range, ex. two of its words start with the prefix
+            if card not in seen:
+                seen.add(card)
+                results.append(card)
+            for start, end in ((start, position), (position + 1, end)):
+                best = self.best_position(start, end)
+                if best >= 0:
+                    heapq.heappush(ranges, (self.cards[best], best, start, end))
+        return results
+
+class AutocompleteIndex:
+    # In-memory prefix index over scryfall_cards.card_name for /autocomplete, best edhrec_rank first
+    # One index over every card name and a smaller one over the names in edhrec_commanders
+    MAX_RESULTS = 50
+    PRECOMPUTED_PREFIX_LENGTH = 2
+
+    def __init__(self, db_pool):
+        self.db_pool = db_pool
+        self.load_seconds = None
+        self._data = None
+
+    def load(self):
+        start_time = time.time()
+        conn = self.db_pool.getconn()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT sc.card_name, cmd.card_id IS NOT NULL
+                FROM scryfall_cards sc
+                LEFT JOIN (SELECT DISTINCT card_id FROM edhrec_commanders WHERE card_id IS NOT NULL) cmd ON cmd.card_id = sc.id
+                WHERE sc.card_name IS NOT NULL
+                ORDER BY sc.edhrec_rank IS NULL, sc.edhrec_rank ASC, sc.card_name ASC
+            """)
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            self.db_pool.putconn(conn)
+
+        # One entry per name (the best ranked printing), so a card's number is its rank order
+        names = []
+        card_numbers = dict()
+        is_commander = []
+        for card_name, commander in rows:
+            card = card_numbers.get(card_name)
+            if card is None:
+                card = len(names)
+                card_numbers[card_name] = card
+                names.append(card_name)
+                is_commander.append(False)
+            is_commander[card] = is_commander[card] or commander
+
+        all_entries = []
+        commander_entries = []
+        for card, card_name in enumerate(names):
+            words = [word for word in WORD_SPLIT.split(card_name) if word]
+            keys = {normalize_card_name(" ".join(words[i:])) for i in range(len(words))}
+            for key in keys:
+                if key:
+                    all_entries.append((key, card))
+                    if is_commander[card]:
+                        commander_entries.append((key, card))
+
+        all_cards = PrefixIndex(all_entries, self.MAX_RESULTS, self.PRECOMPUTED_PREFIX_LENGTH)
+        commanders = PrefixIndex(commander_entries, self.MAX_RESULTS, self.PRECOMPUTED_PREFIX_LENGTH)
+
+        # Readers only ever see a complete index
+        self._data = (names, all_cards, commanders)
+        self.load_seconds = time.time() - start_time
+        return self
+
+    def search(self, query:str, commanders_only:bool=False, limit:int=20) -> list:
+        # Card names starting with the query (or with a word in them starting with it), best edhrec_rank first
+        prefix = normalize_card_name(query)
+        if not prefix or limit <= 0:
+            return []
+        names, all_cards, commanders = self._data
+        index = commanders if commanders_only else all_cards
+        return [names[card] for card in index.search(prefix, min(limit, self.MAX_RESULTS))]
@@ -0,0 +1,89 @@
+import time
+from api_scripts.card_names import card_name_keys, normalize_card_name
+
+# Columns /cards/<card_name> returns, in response order
+CARD_COLUMNS = "sc.card_name, sc.mana_cost, sc.cmc, sc.type_line, sc.oracle_text, sc.colors, sc.color_identity, sc.commander_legal, sc.set_code, sc.rarity, sc.prices, sc.edhrec_rank"
+CARD_FIELDS = [column.split(".")[1] for column in CARD_COLUMNS.split(", ")]
+
+# Canonical printing of a name: full-name matches beat face matches, then ranked cards, then the oldest row
+# Served by the card_name_key() expression indexes from dba_scripts/create_card_name_index.py
+FETCH_CARD_SQL = f"""
+    SELECT {CARD_COLUMNS}
+    FROM scryfall_cards sc
+    WHERE card_name_key(sc.card_name) = %(key)s
+        OR card_name_key(split_part(sc.card_name, ' // ', 1)) = %(key)s
+        OR card_name_key(split_part(sc.card_name, ' // ', 2)) = %(key)s
+    ORDER BY card_name_key(sc.card_name) = %(key)s DESC, sc.edhrec_rank IS NULL, sc.edhrec_rank ASC, sc.id ASC
+    LIMIT 1
+"""
+
+def fetch_card(cur, card_name:str):
+    key = normalize_card_name(card_name)
+    if not key:
+        return None
+    cur.execute(FETCH_CARD_SQL, {"key": key})
+    return cur.fetchone()
+
+class CardLookup:
+    # Normalized card name => canonical scryfall_cards row, so /cards/<card_name> is one dict lookup
+    # Split and MDFC cards are also reachable by each face's name, unless another card has that exact name
+    # With a card catalog (ml_scripts/card_catalog.py) the rows come from it instead of another scan of scryfall_cards
+    def __init__(self, db_pool, catalog=None):
+        self.db_pool = db_pool
+        self.catalog = catalog
+        self.load_seconds = None
+        self.cards = dict()
+
+    def load(self):
+        start_time = time.time()
+        if self.catalog is not None:
+            rows = self.catalog_rows()
+        else:
+            rows = self.fetch_rows()
+
+        cards = dict()
+        faces = dict()
+        for row in rows:
+            if not row[0]:
+                continue
+            keys = card_name_keys(row[0])
+            if not keys:
+                continue
+            cards.setdefault(keys[0], row)
+            for key in keys[1:]:
+                faces.setdefault(key, row)
+        for key, row in faces.items():
+            cards.setdefault(key, row)
+
+        # Readers only ever see a complete map
+        self.cards = cards
+        self.load_seconds = time.time() - start_time
+        return self
+
+    def fetch_rows(self) -> list:
+        conn = self.db_pool.getconn()
+        try:
+            cur = conn.cursor()
+            # Same preference order as FETCH_CARD_SQL, the first row for a key wins
+            cur.execute(f"""
+                SELECT {CARD_COLUMNS}
+                FROM scryfall_cards sc
+                ORDER BY sc.edhrec_rank IS NULL, sc.edhrec_rank ASC, sc.id ASC
+            """)
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            self.db_pool.putconn(conn)
+        return rows
+
+    def catalog_rows(self) -> list:
+        # The catalog is in id order, the stable sort gives the same preference order as fetch_rows()
+        cards = sorted(self.catalog.cards(), key=lambda card: (card.edhrec_rank is None, card.edhrec_rank or 0))
+        return [tuple(getattr(card, field) for field in CARD_FIELDS) for card in cards]
+
+    def get(self, card_name:str):
+        # Returns the card's row (in CARD_COLUMNS order) or None
+        return self.cards.get(normalize_card_name(card_name))
+
+    def __len__(self) -> int:
+        return len(self.cards)
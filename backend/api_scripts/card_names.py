@@ -0,0 +1,38 @@
+import re
+
+# Decklist lines come in however the user typed them: "1x Sol Ring", "1 Sol Ring (CMR) 472", "Sol Ring *F*"
+DECKLIST_QUANTITY = re.compile(r'^\s*\d+\s*x?\s+', re.IGNORECASE)
+DECKLIST_SUFFIX = re.compile(r'\s*(\(.*|\*.*|\[.*)$')
+NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]')
+
+# Accented letters that show up in card names, folded the same way by the card_name_key() SQL function
+# (see dba_scripts/create_card_name_index.py), ex. "Lim-Dûl's Vault" => "limdulsvault"
+ACCENTED = "àáâãäåèéêëìíîïòóôõöùúûüýñçÀÁÂÃÄÅÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÝÑÇ"
+UNACCENTED = "aaaaaaeeeeiiiiooooouuuuyncaaaaaaeeeeiiiiooooouuuuync"
+ACCENT_TRANSLATION = str.maketrans(ACCENTED, UNACCENTED)
+FACE_SEPARATOR = "//"
+
+def normalize_card_name(card_name:str) -> str:
+    # Same normalization the frontend uses plus accent folding, ex. "Shessra, Death's Whisper" => "shessradeathswhisper"
+    return NON_ALPHANUMERIC.sub('', card_name.lower().translate(ACCENT_TRANSLATION))
+
+def card_name_keys(card_name:str) -> list:
+    # Normalized full name first, then each face of a split/MDFC card, ex. "Fire // Ice" => ["fireice", "fire", "ice"]
+    keys = [normalize_card_name(card_name)]
+    if FACE_SEPARATOR in card_name:
+        keys.extend(normalize_card_name(face) for face in card_name.split(FACE_SEPARATOR))
+    return [key for key in keys if key]
+
+def parse_decklist(decklist) -> dict:
+    # Accepts a list of lines or one newline separated string, returns normalized card name => the name as written
+    if isinstance(decklist, str):
+        decklist = decklist.splitlines()
+    card_names = dict()
+    for line in decklist:
+        if not isinstance(line, str):
+            continue
+        line = DECKLIST_SUFFIX.sub('', DECKLIST_QUANTITY.sub('', line)).strip()
+        card_name = normalize_card_name(line)
+        if card_name:
+            card_names.setdefault(card_name, line)
+    return card_names
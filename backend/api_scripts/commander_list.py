@@ -0,0 +1,80 @@
+import random
+import threading
+import time
+
+COLOR_ORDER = "WUBRG"
+COLORLESS = "C"
+
+def color_bucket(color_identity:str) -> str:
+    # Canonical key for a color identity, ex. "GWU" => "WUG", "" => "C"
+    if not color_identity:
+        return COLORLESS
+    color_identity = color_identity.upper()
+    bucket = "".join(color for color in COLOR_ORDER if color in color_identity)
+    return bucket or COLORLESS
+
+def parse_colors(colors:str) -> str:
+    # Validates a ?colors= value, returns its bucket or None if it isn't a color identity
+    colors = colors.strip().upper()
+    if not colors or any(color not in COLOR_ORDER + COLORLESS for color in colors):
+        return None
+    if COLORLESS in colors:
+        return COLORLESS if set(colors) == {COLORLESS} else None
+    return color_bucket(colors)
+
+class CommanderList:
+    # Every commander's display name, grouped by color identity, so picking a random one never touches Postgres
+    # The list is reloaded after ttl seconds, one request does the reload while the others keep using the old list
+    def __init__(self, db_pool, ttl:float=600.0):
+        self.db_pool = db_pool
+        self.ttl = ttl
+        self.reload_lock = threading.Lock()
+        self.loaded_at = 0.0
+        self.names = []
+        self.buckets = dict()
+
+    def load(self):
+        conn = self.db_pool.getconn()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT cmd.card_name, sc.color_identity
+                FROM edhrec_commanders cmd
+                LEFT JOIN scryfall_cards sc ON cmd.card_id = sc.id
+                WHERE cmd.card_name IS NOT NULL
+                ORDER BY cmd.id ASC
+            """)
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            self.db_pool.putconn(conn)
+
+        names = []
+        buckets = dict()
+        for card_name, color_identity in rows:
+            names.append(card_name)
+            buckets.setdefault(color_bucket(color_identity), []).append(card_name)
+
+        # Readers only ever see a complete list
+        self.names, self.buckets = names, buckets
+        self.loaded_at = time.monotonic()
+        return self
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.loaded_at >= self.ttl
+
+    def refresh_if_stale(self):
+        if not self.is_stale():
+            return
+        if self.reload_lock.acquire(blocking=False):
+            try:
+                self.load()
+            finally:
+                self.reload_lock.release()
+
+    def random(self, bucket:str=None) -> str:
+        self.refresh_if_stale()
+        names = self.names if bucket is None else self.buckets.get(bucket)
+        if not names:
+            return None
+        return random.choice(names)
@@ -0,0 +1,61 @@
+import threading
+import time
+import psycopg2.errors
+
+class DatasetVersion:
+    # Identifies the data currently in Postgres, changes whenever an ingest refreshes dataset_stats
+    # Checked at most every ttl seconds. On a change the listeners run (ex. reload in-memory copies) before the new
+    # version is published, so nothing gets stamped with a version whose data isn't loaded yet.
+    def __init__(self, db_pool, ttl:float=30.0):
+        self.db_pool = db_pool
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.version = None
+        self.checked_at = 0.0
+
+    def on_change(self, listener):
+        self.listeners.append(listener)
+
+    def fetch(self) -> str:
+        conn = self.db_pool.getconn()
+        try:
+            cur = conn.cursor()
+            try:
+                # Set by dba_scripts/refresh_dataset_stats.py at the end of every ingest
+                cur.execute("SELECT refreshed_at FROM dataset_stats")
+                row = cur.fetchone()
+                if row is not None and row[0] is not None:
+                    return row[0].strftime("%Y%m%d%H%M%S%f")
+            except (psycopg2.errors.UndefinedTable, psycopg2.errors.ObjectNotInPrerequisiteState):
+                pass
+            # No stats view yet, the newest row in each table is the next best thing
+            cur.execute("""
+                SELECT
+                    (SELECT MAX(id) FROM edhrec_cards),
+                    (SELECT MAX(id) FROM edhrec_commanders),
+                    (SELECT MAX(id) FROM scryfall_cards)
+            """)
+            return "ids-" + "-".join(str(value) for value in cur.fetchone())
+        finally:
+            self.db_pool.putconn(conn)
+
+    def is_stale(self) -> bool:
+        # True when the next current() call would query Postgres
+        return self.version is None or time.monotonic() - self.checked_at >= self.ttl
+
+    def current(self) -> str:
+        if self.is_stale():
+            # One request does the check, the others keep answering with the version they already have
+            if self.lock.acquire(blocking=self.version is None):
+                try:
+                    if self.is_stale():
+                        version = self.fetch()
+                        if self.version is not None and version != self.version:
+                            for listener in self.listeners:
+                                listener(version)
+                        self.version = version
+                        self.checked_at = time.monotonic()
+                finally:
+                    self.lock.release()
+        return self.version
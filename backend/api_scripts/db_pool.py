@@ -0,0 +1,99 @@
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions, pool
+
+def timed_cursor_factory(on_query):
+    # Cursor class that reports (seconds, rowcount) to on_query after every execute, rowcount is -1 when unknown
+    class TimedCursor(extensions.cursor):
+        def execute(self, query, vars=None):
+            start_time = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                on_query(time.perf_counter() - start_time, self.rowcount)
+    return TimedCursor
+
+class ConnectionPool:
+    # Thread-safe pool of Postgres connections for the API
+    # Each request borrows a connection with getconn() and hands it back with putconn(),
+    # so threaded gunicorn workers never share a cursor between requests.
+    def __init__(self, db_config:dict, min_size:int=1, max_size:int=10, timeout:float=10.0, on_query=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        # Optional on_query(seconds, rowcount) called for every query run on a pooled connection
+        self.cursor_factory = timed_cursor_factory(on_query) if on_query is not None else extensions.cursor
+        self._stats_lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._timeouts = 0
+
+        # ThreadedConnectionPool raises as soon as it's exhausted, so the semaphore makes borrowers wait instead
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._pool = pool.ThreadedConnectionPool(
+            min_size,
+            max_size,
+            dbname=db_config['name'],
+            user=db_config['user'],
+            password=db_config['password'],
+            host=db_config['host'],
+            port=db_config['port']
+        )
+
+    def getconn(self):
+        with self._stats_lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._stats_lock:
+            self._waiting -= 1
+            if acquired:
+                self._in_use += 1
+            else:
+                self._timeouts += 1
+        if not acquired:
+            raise pool.PoolError(f"No database connection available after {self.timeout} seconds")
+        try:
+            conn = self._pool.getconn()
+            # The server may have dropped the connection while it sat in the pool, swap it for a fresh one
+            if self._is_broken(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            # The API only reads, autocommit keeps connections from idling inside an open transaction
+            conn.autocommit = True
+            conn.cursor_factory = self.cursor_factory
+            return conn
+        except Exception:
+            self._release_slot()
+            raise
+
+    def putconn(self, conn):
+        try:
+            broken = self._is_broken(conn)
+            if not broken and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self._pool.putconn(conn, close=broken)
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._stats_lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"in_use": self._in_use, "waiting": self._waiting, "max_size": self.max_size, "timeouts": self._timeouts}
+
+    def closeall(self):
+        self._pool.closeall()
+
+    def _is_broken(self, conn) -> bool:
+        # psycopg2 flags the connection as closed once it notices the server went away
+        return conn.closed != 0 or conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN
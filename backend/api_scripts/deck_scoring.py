@@ -0,0 +1,9 @@
+import numpy as np
+
+def score_cards(model, embeddings:np.ndarray, has_embedding:np.ndarray, decimals:int=2) -> np.ndarray:
+    # Scores every card with one batched predict instead of one predict call per card
+    # embeddings only holds rows for cards where has_embedding is True, the other cards score 0
+    scores = np.zeros(len(has_embedding), dtype=np.float64)
+    if embeddings is not None and len(embeddings) > 0:
+        scores[has_embedding] = np.round(model.predict(embeddings), decimals)
+    return scores
@@ -0,0 +1,36 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response
+
+class HttpCache:
+    # Stamps 200 GET responses with a strong ETag derived from the dataset version and the URL, and answers If-None-Match
+    # with 304 before the view runs, so a revalidation never reaches Postgres. The URL is part of the tag, so a tag only
+    # matches the URL it was issued for, which answered 200 at that dataset version (a 404 never gets one)
+    def __init__(self, get_dataset_version, app_version:str=""):
+        self.get_dataset_version = get_dataset_version
+        self.app_version = app_version
+
+    def etag(self, dataset_version:str, path:str, query_string:str="") -> str:
+        # The app version is part of the tag, a deploy can change a response without an ingest
+        # path is the decoded path, query_string the raw one, the same in Flask and the ASGI app
+        return hashlib.sha1(f"{dataset_version}:{self.app_version}:{path}?{query_string}".encode("utf-8")).hexdigest()[:20]
+
+    def versioned(self, max_age:int):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                dataset_version = self.get_dataset_version()
+                etag = self.etag(dataset_version, request.path, request.query_string.decode("latin-1"))
+                # nginx weakens ETags when it gzips, so compare weakly
+                if request.if_none_match.contains_weak(etag):
+                    response = make_response("", 304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = f"public, max-age={max_age}"
+                response.headers['X-Dataset-Version'] = dataset_version
+                return response
+            return wrapper
+        return decorator
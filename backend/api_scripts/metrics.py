@@ -0,0 +1,139 @@
+import json
+import random
+import logging
+import threading
+
+# Minimal in-process metrics in the Prometheus text format, served by /metrics
+# Each gunicorn worker keeps its own numbers, scrape every worker (or sum them) to get the whole picture.
+# Recording is a dict lookup and a few additions under a per-metric lock.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(labelnames:tuple, labelvalues:tuple, extra:str="") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name:str, documentation:str, labelnames:tuple=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = dict()
+
+    def inc(self, amount:float=1, *labelvalues):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = list(self.values.items())
+        for labelvalues, value in values:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name:str, documentation:str, labelnames:tuple=(), buckets:tuple=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # labelvalues => [count per bucket (not cumulative) + overflow, sum]
+        self.values = dict()
+
+    def observe(self, value:float, *labelvalues):
+        # Linear scan, there are only a dozen buckets
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        with self.lock:
+            counts = self.values.get(labelvalues)
+            if counts is None:
+                counts = self.values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][i] += 1
+            counts[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            values = [(labelvalues, list(counts[0]), counts[1]) for labelvalues, counts in self.values.items()]
+        for labelvalues, bucket_counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += count
+                le = 'le="' + format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labelvalues)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+class Gauge:
+    # Read when /metrics is scraped, collect() returns a number or a {labelvalues tuple: number} dict
+    def __init__(self, name:str, documentation:str, collect, labelnames:tuple=()):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        values = self.collect()
+        if values is None:
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in values.items():
+            lines.append(f"{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self, prefix:str=""):
+        self.prefix = prefix
+        self.metrics = []
+
+    def counter(self, name:str, documentation:str, labelnames:tuple=()) -> Counter:
+        return self.register(Counter(self.prefix + name, documentation, labelnames))
+
+    def histogram(self, name:str, documentation:str, labelnames:tuple=(), buckets:tuple=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(self.prefix + name, documentation, labelnames, buckets))
+
+    def gauge(self, name:str, documentation:str, collect, labelnames:tuple=()) -> Gauge:
+        return self.register(Gauge(self.prefix + name, documentation, collect, labelnames))
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class SampledLogger:
+    # One JSON object per line, only a sample_rate fraction of the events are written (errors always are)
+    def __init__(self, name:str, sample_rate:float=0.01):
+        self.logger = logging.getLogger(name)
+        self.sample_rate = sample_rate
+
+    def log(self, event:str, level:int=logging.INFO, sampled:bool=True, **fields):
+        # sampled=False writes the event whatever the sample rate, for one-off events like startup
+        if sampled and level < logging.WARNING and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(level, json.dumps({"event": event, **fields}, default=str))
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import joblib
+
+class ModelRegistry:
+    # LRU cache of the per-commander models in ml_scripts/cmd_models, so /analyze doesn't unpickle a model on every request
+    # Keyed by the sanitized file name, holds at most max_size models
+    def __init__(self, model_dir:str, converter, max_size:int=64):
+        if max_size < 1:
+            raise ValueError(f"Invalid model cache size: {max_size}")
+        self.model_dir = model_dir
+        self.converter = converter
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def model_path(self, commander_name:str) -> str:
+        return os.path.join(self.model_dir, f"{self.converter.sanitize_filename(commander_name)}.joblib")
+
+    def has_model(self, commander_name:str) -> bool:
+        return os.path.exists(self.model_path(commander_name))
+
+    def get(self, commander_name:str):
+        # Returns the commander's model, or None if it was never trained
+        key = self.converter.sanitize_filename(commander_name)
+        with self.lock:
+            model = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                self.hits += 1
+                return model
+            self.misses += 1
+
+        # Unpickle outside the lock so one slow load doesn't block requests for cached models
+        path = self.model_path(commander_name)
+        if not os.path.exists(path):
+            return None
+        start_time = time.time()
+        model = joblib.load(path)
+        elapsed = time.time() - start_time
+
+        with self.lock:
+            self.load_seconds += elapsed
+            self.models[key] = model
+            self.models.move_to_end(key)
+            while len(self.models) > self.max_size:
+                self.models.popitem(last=False)
+                self.evictions += 1
+        return model
+
+    def preload(self, commander_names:list) -> int:
+        # Warms the cache with up to max_size commanders, loaded in reverse so the first one ends up most recently used
+        loaded = 0
+        for commander_name in reversed(commander_names[:self.max_size]):
+            if self.get(commander_name) is not None:
+                loaded += 1
+        # Warm-up loads aren't real traffic
+        with self.lock:
+            self.misses = 0
+            self.hits = 0
+        return loaded
+
+    def stats(self) -> dict:
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self.models),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "load_seconds": self.load_seconds,
+            }
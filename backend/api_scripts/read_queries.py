@@ -0,0 +1,126 @@
+import re
+from functools import lru_cache
+
+# SQL of the read endpoints, shared by the Flask views (app.py, psycopg2) and the ASGI handlers (asgi_app.py, asyncpg)
+# Written with psycopg2 placeholders, asyncpg_sql() numbers them as $n. Each *_FALLBACK_SQL is what the query before it
+# falls back to while its precomputed table or column doesn't exist yet
+# dba_scripts/explain_check.py plans every query in this module
+
+PYFORMAT_PARAM = re.compile(r"%\((\w+)\)s|%s|%%")
+
+# Precomputed by dba_scripts/refresh_dataset_stats.py after each ingest
+DB_INFO_SQL = """
+    SELECT avg_synergy_score, avg_commander_synergy_score, commander_count, card_commander_pairs_count, unique_card_count
+    FROM dataset_stats
+"""
+DB_INFO_FALLBACK_SQL = """
+    SELECT
+        AVG(c.synergy_score) as avg_synergy_score,
+        (SELECT AVG(avg_synergy_score)
+        FROM (
+            SELECT AVG(c.synergy_score) as avg_synergy_score
+            FROM edhrec_cards c
+            GROUP BY c.commander_id
+        ) AS commander_avg_synergies) as avg_commander_synergy_score,
+    COUNT(DISTINCT cmd.id) as commander_count,
+    COUNT(*) as card_commander_pairs_count,
+    COUNT(DISTINCT c.card_name) as unique_card_count
+    FROM edhrec_cards c
+    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+"""
+
+# Parameter: commander name
+COMMANDER_INFO_SQL = """
+    SELECT cmd.id, cmd.name, cmd.scryfall_id,
+    (SELECT AVG(c.synergy_score) FROM edhrec_cards c WHERE c.commander_id = cmd.id) as avg_synergy_score,
+    (SELECT COUNT(*) FROM edhrec_cards c WHERE c.commander_id = cmd.id) as card_count
+    FROM edhrec_commanders cmd
+    WHERE cmd.name = %s
+"""
+
+# Precomputed by dba_scripts/build_commander_similarity.py. Parameter: commander id
+SIMILAR_COMMANDERS_SQL = """
+    SELECT cmd2.card_name, cmd2.name, cmd2.scryfall_id, s.overlap_count, s.overlap_percentage
+    FROM commander_similarity s
+    JOIN edhrec_commanders cmd2 ON s.similar_commander_id = cmd2.id
+    WHERE s.commander_id = %s
+    ORDER BY s.rank ASC
+    LIMIT 5
+"""
+# Parameters: the commander's card count, commander name
+SIMILAR_COMMANDERS_FALLBACK_SQL = """
+    SELECT cmd2.card_name, cmd2.name, cmd2.scryfall_id, COUNT(DISTINCT c2.card_id), COUNT(DISTINCT c2.card_id) * 100.0 / %s as overlap_percentage
+    FROM edhrec_cards c1
+    JOIN edhrec_commanders cmd1 ON c1.commander_id = cmd1.id
+    JOIN edhrec_cards c2 ON c1.card_id = c2.card_id
+    JOIN edhrec_commanders cmd2 ON c2.commander_id = cmd2.id
+    WHERE cmd1.name = %s AND cmd1.id != cmd2.id
+    GROUP BY cmd2.card_name, cmd2.name, cmd2.scryfall_id
+    ORDER BY overlap_percentage DESC
+    LIMIT 5
+"""
+
+# Suggestions start + 1 through end in synergy order, an index range scan on the ranks from dba_scripts/update_commander_ranks.py
+# Parameters: commander name, start + 1, end
+SUGGESTION_PAGE_SQL = """
+    SELECT sc.card_name, c.synergy_score, sc.scryfall_id
+    FROM edhrec_cards c
+    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+    JOIN scryfall_cards sc ON c.card_id = sc.id
+    WHERE cmd.name = %s AND c.synergy_rank BETWEEN %s AND %s
+    ORDER BY c.synergy_rank ASC
+"""
+# Parameters: commander name, page size, start
+SUGGESTION_PAGE_FALLBACK_SQL = """
+    SELECT sc.card_name, c.synergy_score, sc.scryfall_id
+    FROM edhrec_cards c
+    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+    JOIN scryfall_cards sc ON c.card_id = sc.id
+    WHERE cmd.name = %s
+    ORDER BY c.synergy_score DESC, c.id ASC
+    LIMIT %s
+    OFFSET %s
+"""
+
+# Parameters: commander name, count
+REDUCTIONS_SQL = """
+    SELECT sc.card_name, c.percentage, c.synergy_score, sc.scryfall_id
+    FROM edhrec_cards c
+    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+    JOIN scryfall_cards sc ON c.card_id = sc.id
+    WHERE cmd.name = %s AND c.reduction_rank <= %s
+    ORDER BY c.reduction_rank ASC
+"""
+REDUCTIONS_FALLBACK_SQL = """
+    SELECT sc.card_name, c.percentage, c.synergy_score, sc.scryfall_id
+    FROM edhrec_cards c
+    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+    JOIN scryfall_cards sc ON c.card_id = sc.id
+    WHERE cmd.name = %s AND c.synergy_score < 0.8
+    ORDER BY c.percentage ASC, c.synergy_score ASC, c.id ASC
+    LIMIT %s
+"""
+
+@lru_cache(maxsize=None)
+def to_dollar_params(sql:str) -> tuple:
+    # %s => $1, $2, ... in order, each %(name)s => one $n per name (numbered by first use), returns (sql, parameter count)
+    names = dict()
+    positional = [0]
+
+    def replace(match):
+        if match.group(0) == "%%":
+            return "%"
+        if match.group(1) is not None:
+            if match.group(1) not in names:
+                names[match.group(1)] = len(names) + 1
+            return f"${names[match.group(1)]}"
+        positional[0] += 1
+        return f"${positional[0]}"
+
+    sql = PYFORMAT_PARAM.sub(replace, sql)
+    dollar_params = [int(n) for n in re.findall(r"\$(\d+)", sql)]
+    return sql, max(dollar_params, default=0)
+
+def asyncpg_sql(sql:str) -> str:
+    # The asyncpg form of a psycopg2 query, named parameters are passed in the order they first appear
+    return to_dollar_params(sql)[0]
@@ -0,0 +1,132 @@
+from api_scripts.commander_list import parse_colors
+
+# Argument checks and response bodies of the read endpoints, shared by the Flask views (app.py) and the ASGI handlers
+# (asgi_app.py) so both answer every request the same way, they only differ in how they fetch the rows.
+# The *_body functions return (body, status), a bad argument raises InvalidRequest, which both apps answer with a 400
+
+# Longest commander name is 31 characters (Asmoranomardicadaistinaculdacar)
+LONGEST_COMMANDER_NAME = 31
+MAX_PAGE_SIZE = 100
+
+class InvalidRequest(Exception):
+    def __init__(self, message:str):
+        super().__init__(message)
+        self.message = message
+
+def error_body(message:str, status:int) -> tuple:
+    return {"error": message}, status
+
+def check_commander_name(commander_name:str):
+    if len(commander_name) > LONGEST_COMMANDER_NAME:
+        raise InvalidRequest("Commander name too long.")
+
+def db_info_body(data) -> tuple:
+    avg_synergy_score, avg_commander_synergy_score, commander_count, card_commander_pairs_count, unique_card_count = data
+    return {"avg_synergy_score": avg_synergy_score, "avg_commander_synergy_score": avg_commander_synergy_score, "commander_count": commander_count, "card_commander_pairs_count": card_commander_pairs_count, "unique_card_count": unique_card_count}, 200
+
+def commander_info_body(data, similar_rows) -> tuple:
+    # data is the COMMANDER_INFO_SQL row (None if there's no such commander), similar_rows the SIMILAR_COMMANDERS_SQL rows
+    if not data:
+        return error_body("Commander not found.", 404)
+    commander_id, name, scryfall_id, avg_synergy_score, card_count = data
+    similar_commanders = [
+        {
+            "card_name": card_name,
+            "name": name,
+            "scryfall_id": scryfall_id,
+            "overlap_count": overlap_count,
+            "overlap_percentage": round(overlap_percentage, 2)
+        } for card_name, name, scryfall_id, overlap_count, overlap_percentage in similar_rows
+    ]
+    return {
+        "name": name,
+        "scryfall_id": scryfall_id,
+        "avg_synergy_score": avg_synergy_score,
+        "card_count": card_count,
+        "similar_commanders": similar_commanders
+    }, 200
+
+def random_commander_bucket(colors:str):
+    # Optional ?colors= filter on exact color identity, ex. ?colors=wub or ?colors=c for colorless
+    if colors is None:
+        return None
+    bucket = parse_colors(colors)
+    if bucket is None:
+        raise InvalidRequest("Colors must be a combination of W, U, B, R and G, or C for colorless.")
+    return bucket
+
+def random_commander_body(commander_name:str) -> tuple:
+    if commander_name is None:
+        return error_body("No commanders found for these colors.", 404)
+    return {"commander_name": commander_name}, 200
+
+def autocomplete_limit(limit:str) -> int:
+    try:
+        return int(limit)
+    except ValueError:
+        raise InvalidRequest("Limit must be an integer.")
+
+def suggestions_page(commander_name:str, count:str) -> tuple:
+    # /<commander>/suggestions/<count> => (start, end, the count echoed in the response)
+    try:
+        int(count)
+    except ValueError:
+        raise InvalidRequest("Count must be an integer.")
+    check_commander_name(commander_name)
+    if int(count) > MAX_PAGE_SIZE:
+        count = MAX_PAGE_SIZE
+    return 0, max(int(count), 0), {"count": count}
+
+def suggestions_range_page(commander_name:str, start:str, end:str) -> tuple:
+    # /<commander>/suggestions/range/<start>/<end> => (start, end, start and end echoed in the response)
+    # end is exclusive, /range/100/200 is the second page of 100
+    try:
+        int(start)
+        int(end)
+    except ValueError:
+        raise InvalidRequest("Start and end must be integers.")
+    check_commander_name(commander_name)
+    if int(start) < 0:
+        start = 0
+    if int(end) > int(start) + MAX_PAGE_SIZE:
+        end = int(start) + MAX_PAGE_SIZE
+    return int(start), int(end), {"start": start, "end": end}
+
+def suggestions_body(rows, echo:dict) -> tuple:
+    suggestions = [{'name': name, 'score': score, 'scryfall_id': scryfall_id} for name, score, scryfall_id in rows]
+    if not suggestions:
+        return error_body("No suggestions found for this commander.", 404)
+    return {"suggestions": suggestions, **echo}, 200
+
+def reductions_count(commander_name:str, count:str) -> int:
+    try:
+        count = int(count)
+    except ValueError:
+        raise InvalidRequest("Count must be an integer.")
+    check_commander_name(commander_name)
+    return min(count, MAX_PAGE_SIZE)
+
+def reductions_body(rows, count:int) -> tuple:
+    reductions = [{'name': name, 'percentage': percentage, 'score': score, 'scryfall_id': scryfall_id} for name, percentage, score, scryfall_id in rows]
+    if not reductions:
+        return error_body("No reductions found for this commander.", 404)
+    return {"reductions": reductions, "count": count}, 200
+
+def card_body(data) -> tuple:
+    # data is a FETCH_CARD_SQL / CardLookup row
+    if data is None:
+        return error_body("Card not found.", 404)
+    return {
+        "name": data[0],
+        "mana_cost": data[1],
+        "cmc": data[2],
+        "type_line": data[3],
+        "oracle_text": data[4],
+        "colors": data[5],
+        "color_identity": data[6],
+        "commander_legal": data[7],
+        "set_code": data[8],
+        "rarity": data[9],
+        "prices": data[10],
+        "edhrec_rank": data[11]
+    }, 200
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+
+class ResponseCache:
+    # LRU of finished 200 responses, keyed by view and normalized arguments, so a repeat request skips Postgres and jsonify
+    # Bounded by both entry count and body bytes, entries expire after ttl seconds and are all dropped by clear()
+    # when the dataset version changes
+    def __init__(self, max_entries:int=2048, max_bytes:int=64 * 1024 * 1024, ttl:float=300.0):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError(f"Invalid response cache bounds: {max_entries} entries, {max_bytes} bytes")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        # Bumped by clear(), a response computed before an invalidation is never stored after it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def make_key(self, endpoint:str, args:tuple, kwargs:dict, query:list=None) -> tuple:
+        # Query args are sorted so ?a=1&b=2 and ?b=2&a=1 share an entry, defaults to the current Flask request's
+        if query is None:
+            query = request.args.items(multi=True)
+        return (endpoint, args, tuple(sorted(kwargs.items())), tuple(sorted(query)))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            status, mimetype, body, expires_at = entry
+            if expires_at <= time.monotonic():
+                self.remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return status, mimetype, body
+
+    def set(self, key, status:int, mimetype:str, body:bytes, generation:int):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (status, mimetype, body, time.monotonic() + self.ttl)
+            self.size_bytes += size
+            while len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        # Caller holds the lock
+        self.size_bytes -= len(self.entries.pop(key)[2])
+
+    def clear(self, *args):
+        # Takes (and ignores) the new version so it can be registered with DatasetVersion.on_change directly
+        with self.lock:
+            self.entries.clear()
+            self.size_bytes = 0
+            self.generation += 1
+            self.invalidations += 1
+
+    def cached(self, normalize=None):
+        # normalize(*args, **kwargs) returns the view arguments the key is built from (ex. a lowercased card name),
+        # only use it where the response doesn't echo the raw argument back
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key_args, key_kwargs = normalize(*args, **kwargs) if normalize is not None else (args, kwargs)
+                key = self.make_key(view.__name__, tuple(key_args), key_kwargs)
+                entry = self.get(key)
+                if entry is not None:
+                    status, mimetype, body = entry
+                    response = make_response(body, status)
+                    response.mimetype = mimetype
+                    return response
+
+                generation = self.generation
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.set(key, response.status_code, response.mimetype, response.get_data(), generation)
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,101 @@
+import csv
+import io
+import re
+import json
+import zlib
+from decimal import Decimal
+
+# Bulk export of every (commander, card, percentage, synergy_score, scryfall_id) row, for /export/suggestions and
+# dba_scripts/export_suggestions.py. Rows come from a server-side cursor and are written out in batches,
+# so memory stays flat no matter how big edhrec_cards gets.
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = ("commander", "card", "percentage", "synergy_score", "scryfall_id")
+DEFAULT_ITERSIZE = 5000
+
+# Dataset versions from DatasetVersion.fetch(), dataset_stats.refreshed_at as %Y%m%d%H%M%S%f
+SINCE_PATTERN = re.compile(r"^\d{20}$")
+
+def parse_since(since:str) -> str:
+    # Returns the version if it can be used as a ?since= filter, None otherwise (ex. an "ids-..." fallback version)
+    since = since.strip()
+    return since if SINCE_PATTERN.match(since) else None
+
+def open_export_cursor(conn, since:str=None, itersize:int=DEFAULT_ITERSIZE):
+    # Named cursors need a transaction, the pool hands out autocommit connections
+    # The caller owns the cursor, it iterates over the rows and must be handed to close_export_cursor() once the
+    # export ends, even halfway through: a generator's finally only runs when the generator itself is closed,
+    # which the gzip/format wrappers around it don't do
+    conn.autocommit = False
+    cur = conn.cursor(name="suggestion_export")
+    cur.itersize = itersize
+    try:
+        # updated_at is set by the scraper whenever a row's numbers change, rows deleted since then aren't reported
+        cur.execute(f"""
+            SELECT cmd.name, sc.card_name, c.percentage, c.synergy_score, sc.scryfall_id
+            FROM edhrec_cards c
+            JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+            JOIN scryfall_cards sc ON c.card_id = sc.id
+            {"WHERE c.updated_at > to_timestamp(%s, 'YYYYMMDDHH24MISSUS')" if since is not None else ""}
+            ORDER BY c.commander_id ASC, c.synergy_score DESC
+        """, (since,) if since is not None else None)
+    except Exception:
+        close_export_cursor(conn, cur)
+        raise
+    return cur
+
+def close_export_cursor(conn, cur):
+    # Ends the export transaction and puts the connection back in autocommit
+    try:
+        if not conn.closed:
+            cur.close()
+            conn.rollback()
+    finally:
+        if not conn.closed:
+            conn.autocommit = True
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def batched(rows, batch_size:int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def format_ndjson(rows, batch_size:int=DEFAULT_ITERSIZE):
+    for batch in batched(rows, batch_size):
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=json_default) + "\n" for row in batch).encode("utf-8")
+
+def format_csv(rows, batch_size:int=DEFAULT_ITERSIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batched(rows, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def export_chunks(rows, export_format:str="ndjson", batch_size:int=DEFAULT_ITERSIZE):
+    if export_format == "csv":
+        return format_csv(rows, batch_size)
+    return format_ndjson(rows, batch_size)
+
+def gzip_chunks(chunks, level:int=6):
+    # Streams a single gzip member, each chunk is compressed as it arrives
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,146 @@
+import sys
+import threading
+import time
+from array import array
+from decimal import Decimal
+
+class SuggestionIndex:
+    # Read-only, in-memory copy of every commander's card list, pre-sorted for the suggestion and reduction endpoints
+    # Card names and scryfall ids are stored once per card, and each commander only keeps int arrays pointing into them.
+    # Scores are kept as the Decimals Postgres returns (interned), so responses are identical to the SQL path.
+    # A Decimal like the scores, Decimal('0.8') < 0.8 is True while the SQL's numeric < 0.8 is False
+    REDUCTION_THRESHOLD = Decimal("0.8")
+
+    def __init__(self, db_pool):
+        self.db_pool = db_pool
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        self.load_seconds = None
+        self._data = None
+
+    def load(self):
+        start_time = time.time()
+        conn = self.db_pool.getconn()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT cmd.name, sc.id, sc.card_name, sc.scryfall_id, c.synergy_score, c.percentage
+                FROM edhrec_cards c
+                JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+                JOIN scryfall_cards sc ON c.card_id = sc.id
+                ORDER BY cmd.name, c.id
+            """)
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            self.db_pool.putconn(conn)
+
+        card_index = dict()
+        card_names = []
+        scryfall_ids = []
+        values = []
+        value_index = dict()
+
+        def intern_value(value) -> int:
+            # NULL scores are interned too, so None always maps to the same slot
+            key = None if value is None else str(value)
+            i = value_index.get(key)
+            if i is None:
+                i = len(values)
+                value_index[key] = i
+                values.append(value)
+            return i
+
+        grouped = dict()
+        for commander_name, card_id, card_name, scryfall_id, synergy_score, percentage in rows:
+            i = card_index.get(card_id)
+            if i is None:
+                i = len(card_names)
+                card_index[card_id] = i
+                card_names.append(card_name)
+                scryfall_ids.append(scryfall_id)
+            grouped.setdefault(commander_name, []).append((i, synergy_score, percentage))
+
+        commanders = dict()
+        for commander_name, cards in grouped.items():
+            # ORDER BY synergy_score DESC, Postgres puts NULLs first when descending
+            # The sorts are stable, so ties stay in id order like synergy_rank and reduction_rank
+            by_synergy = sorted(cards, key=lambda row: (row[1] is None, row[1] if row[1] is not None else 0), reverse=True)
+            # WHERE synergy_score < 0.8 ORDER BY percentage ASC, synergy_score ASC, NULL percentages last
+            reductions = [row for row in cards if row[1] is not None and row[1] < self.REDUCTION_THRESHOLD]
+            reductions.sort(key=lambda row: (row[2] is None, row[2] if row[2] is not None else 0, row[1]))
+            commanders[commander_name] = (
+                array('i', [row[0] for row in by_synergy]),
+                array('i', [intern_value(row[1]) for row in by_synergy]),
+                array('i', [row[0] for row in reductions]),
+                array('i', [intern_value(row[1]) for row in reductions]),
+                array('i', [intern_value(row[2]) for row in reductions]),
+            )
+
+        data = {
+            "commanders": commanders,
+            "card_names": card_names,
+            "scryfall_ids": scryfall_ids,
+            "values": values,
+            "row_count": len(rows),
+        }
+        with self.lock:
+            self._data = data
+            self.loaded_at = time.time()
+            self.load_seconds = self.loaded_at - start_time
+        return self
+
+    def has_commander(self, commander_name:str) -> bool:
+        return commander_name in self._data["commanders"]
+
+    def commander_names(self) -> list:
+        return list(self._data["commanders"].keys())
+
+    def get_suggestions(self, commander_name:str, offset:int, limit:int) -> list:
+        # Same rows as ORDER BY synergy_score DESC LIMIT limit OFFSET offset
+        data = self._data
+        entry = data["commanders"].get(commander_name)
+        if entry is None:
+            return []
+        card_names, scryfall_ids, values = data["card_names"], data["scryfall_ids"], data["values"]
+        card_ids, scores = entry[0], entry[1]
+        stop = offset + limit
+        return [(card_names[i], values[score], scryfall_ids[i]) for i, score in zip(card_ids[offset:stop], scores[offset:stop])]
+
+    def iter_suggestions(self, commander_name:str):
+        # Every row in synergy order, lazily, so callers can keep going past cards they filter out
+        data = self._data
+        entry = data["commanders"].get(commander_name)
+        if entry is None:
+            return
+        card_names, scryfall_ids, values = data["card_names"], data["scryfall_ids"], data["values"]
+        for i, score in zip(entry[0], entry[1]):
+            yield (card_names[i], values[score], scryfall_ids[i])
+
+    def get_reductions(self, commander_name:str, limit:int) -> list:
+        # Same rows as WHERE synergy_score < 0.8 ORDER BY percentage ASC, synergy_score ASC LIMIT limit
+        data = self._data
+        entry = data["commanders"].get(commander_name)
+        if entry is None:
+            return []
+        card_names, scryfall_ids, values = data["card_names"], data["scryfall_ids"], data["values"]
+        card_ids, scores, percentages = entry[2][:limit], entry[3][:limit], entry[4][:limit]
+        return [(card_names[i], values[percentage], values[score], scryfall_ids[i]) for i, percentage, score in zip(card_ids, percentages, scores)]
+
+    def memory_usage(self) -> dict:
+        # Approximate deep size in bytes of everything the index holds on to
+        data = self._data
+        arrays = sum(sys.getsizeof(key) + sys.getsizeof(entry) + sum(sys.getsizeof(a) for a in entry) for key, entry in data["commanders"].items())
+        strings = sys.getsizeof(data["card_names"]) + sys.getsizeof(data["scryfall_ids"])
+        strings += sum(sys.getsizeof(s) for s in data["card_names"] if s is not None)
+        strings += sum(sys.getsizeof(s) for s in data["scryfall_ids"] if s is not None)
+        values = sys.getsizeof(data["values"]) + sum(sys.getsizeof(v) for v in data["values"])
+        return {
+            "commanders": len(data["commanders"]),
+            "cards": len(data["card_names"]),
+            "rows": data["row_count"],
+            "commander_arrays_bytes": arrays,
+            "card_strings_bytes": strings,
+            "values_bytes": values,
+            "total_bytes": arrays + strings + values,
+        }
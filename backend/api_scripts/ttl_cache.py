@@ -0,0 +1,28 @@
+import threading
+import time
+
+class TTLCache:
+    # Small thread-safe key/value cache where every entry expires ttl seconds after it was set
+    def __init__(self, ttl:float=300.0):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = dict()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -1,28 +1,52 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from urllib.parse import urlparse, unquote
 from pathlib import Path
 import psycopg2
+import psycopg2.pool
+import psycopg2.errors
 import os
+import time
+import logging
 from dotenv import load_dotenv
-import random
 
 from ml_scripts.card_fetcher import CardsContext
 from ml_scripts.converter import MLConverter
 from ml_scripts.card_embedder import CardEmbedder
 from ml_scripts.card_parser import CardParser
-import joblib
-
-ml_db = CardsContext()
-ml_converter = MLConverter()
-ml_card_embedder = CardEmbedder()
-ml_card_parser = CardParser()
+from ml_scripts.embedding_store import EmbeddingStore
+from ml_scripts.card_catalog import CardCatalog, set_shared_catalog
+from api_scripts.db_pool import ConnectionPool
+from api_scripts.suggestion_index import SuggestionIndex
+from api_scripts.ttl_cache import TTLCache
+from api_scripts.commander_list import CommanderList
+from api_scripts.card_names import normalize_card_name, parse_decklist
+from api_scripts.model_registry import ModelRegistry
+from api_scripts.deck_scoring import score_cards
+from api_scripts.dataset_version import DatasetVersion
+from api_scripts.http_cache import HttpCache
+from api_scripts.response_cache import ResponseCache
+from api_scripts.card_lookup import CardLookup, fetch_card
+from api_scripts.read_queries import (
+    DB_INFO_SQL, DB_INFO_FALLBACK_SQL, COMMANDER_INFO_SQL, SIMILAR_COMMANDERS_SQL, SIMILAR_COMMANDERS_FALLBACK_SQL,
+    SUGGESTION_PAGE_SQL, SUGGESTION_PAGE_FALLBACK_SQL, REDUCTIONS_SQL, REDUCTIONS_FALLBACK_SQL,
+)
+from api_scripts.read_responses import (
+    InvalidRequest, LONGEST_COMMANDER_NAME, error_body, check_commander_name, db_info_body, commander_info_body,
+    random_commander_bucket, random_commander_body, autocomplete_limit, suggestions_page, suggestions_range_page,
+    suggestions_body, reductions_count, reductions_body, card_body,
+)
+from api_scripts.autocomplete_index import AutocompleteIndex
+from api_scripts.metrics import MetricsRegistry, SampledLogger
+from api_scripts.suggestion_export import EXPORT_FORMATS, parse_since, open_export_cursor, close_export_cursor, export_chunks, gzip_chunks
+import numpy as np
 
 BASE_DIR = Path(__file__).resolve().parent
 load_dotenv(os.path.join(BASE_DIR, '.env'))
 
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": [
+cors_origins = [
     "https://cardcognition.com", 
     "http://cardcognition.com", 
     "https://www.cardcognition.com", 
@@ -32,7 +56,56 @@ CORS(app, resources={r"/*": {"origins": [
     "https://www.api.cardcognition.com",
     "http://www.api.cardcognition.com",
     "http://localhost:3000",
-]}})
+]
+CORS(app, resources={r"/*": {"origins": cors_origins}})
+
+# Per-route latency, DB time, row counts and JSON serialization time, served on /metrics in the Prometheus text format
+metrics = MetricsRegistry(prefix="cardcognition_")
+request_seconds = metrics.histogram("request_duration_seconds", "Time spent handling a request", ("route", "method", "status"))
+request_errors = metrics.counter("request_errors_total", "Requests answered with a 5xx status", ("route", "status"))
+db_seconds = metrics.histogram("db_query_duration_seconds", "Time spent executing queries", ("route",))
+db_rows = metrics.counter("db_rows_total", "Rows returned by queries", ("route",))
+serialize_seconds = metrics.histogram("json_serialization_seconds", "Time spent building JSON responses", ("route",))
+
+def route_label() -> str:
+    # The URL rule, not the path, so every commander shares one series
+    if not has_request_context():
+        return "background"
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def record_query(seconds:float, rowcount:int):
+    route = route_label()
+    db_seconds.observe(seconds, route)
+    if rowcount > 0:
+        db_rows.inc(rowcount, route)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def response(self, *args, **kwargs):
+        start_time = time.perf_counter()
+        response = super().response(*args, **kwargs)
+        serialize_seconds.observe(time.perf_counter() - start_time, route_label())
+        return response
+
+app.json = TimedJSONProvider(app)
+
+# Structured logs, LOG_SAMPLE_RATE of the routine events are written (warnings and errors always are)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format="%(message)s")
+request_log = SampledLogger("cardcognition", sample_rate=float(os.getenv('LOG_SAMPLE_RATE', 0.01)))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    start_time = g.pop('request_start', None)
+    if start_time is not None:
+        route = route_label()
+        status = str(response.status_code)
+        request_seconds.observe(time.perf_counter() - start_time, route, request.method, status)
+        if response.status_code >= 500:
+            request_errors.inc(1, route, status)
+    return response
 
 # Database Configuration
 db_config = {
@@ -43,297 +116,508 @@ db_config = {
     'port': os.getenv('DB_PORT')
 }
 
-# Connect to the database
-conn = psycopg2.connect(
-    dbname=db_config['name'],
-    user=db_config['user'],
-    password=db_config['password'],
-    host=db_config['host'],
-    port=db_config['port']
+# Connection pool, each request borrows its own connection and returns it on teardown
+db_pool = ConnectionPool(
+    db_config,
+    min_size=int(os.getenv('DB_POOL_MIN', 1)),
+    max_size=int(os.getenv('DB_POOL_MAX', 10)),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    on_query=record_query
 )
-cur = conn.cursor()
 
-longest_commander_name = 31
+def get_cursor():
+    if 'db_conn' not in g:
+        g.db_conn = db_pool.getconn()
+    return g.db_conn.cursor()
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.putconn(conn)
+
+@app.errorhandler(psycopg2.OperationalError)
+@app.errorhandler(psycopg2.InterfaceError)
+@app.errorhandler(psycopg2.pool.PoolError)
+def handle_db_unavailable(error):
+    return jsonify({"error": "Database unavailable, please try again."}), 503
+
+@app.errorhandler(InvalidRequest)
+def handle_invalid_request(error):
+    body, status = error_body(error.message, 400)
+    return jsonify(body), status
+
+# Every scryfall_cards and edhrec_commanders row, shared with ml_db, the embedder and the card lookup below
+card_catalog = CardCatalog(db_pool).load()
+set_shared_catalog(card_catalog)
+request_log.log("card_catalog_loaded", sampled=False, seconds=round(card_catalog.load_seconds, 2), cards=len(card_catalog))
+
+# CardsContext answers from the shared card catalog, the queries it can't borrow a pooled connection per call
+ml_db = CardsContext(db_pool=db_pool)
+ml_converter = MLConverter()
+ml_card_embedder = CardEmbedder(context=ml_db)
+ml_card_parser = CardParser()
+
+# Memory-mapped card embeddings from ml_scripts/embed_cards.py, /analyze falls back to live parsing without it
+try:
+    embedding_store = EmbeddingStore(ml_card_embedder)
+except (OSError, ValueError) as e:
+    # Cards will be embedded live
+    request_log.log("embedding_store_unavailable", level=logging.WARNING, error=str(e))
+    embedding_store = None
+
+# Optional serving mode that answers /suggestions, /suggestions/range and /reductions from memory
+suggestion_index = None
+if os.getenv('SUGGESTION_INDEX', '').lower() in ('1', 'true', 'yes'):
+    suggestion_index = SuggestionIndex(db_pool).load()
+    request_log.log("suggestion_index_loaded", sampled=False, seconds=round(suggestion_index.load_seconds, 2), memory=suggestion_index.memory_usage())
+
+# Normalized name => canonical card for /cards/<card_name>, CARD_INDEX=0 looks cards up in Postgres instead
+card_lookup = None
+if os.getenv('CARD_INDEX', '1').lower() in ('1', 'true', 'yes'):
+    card_lookup = CardLookup(db_pool, card_catalog).load()
+    request_log.log("card_lookup_loaded", sampled=False, seconds=round(card_lookup.load_seconds, 2), names=len(card_lookup))
+
+# Card name prefixes for /autocomplete
+autocomplete_index = AutocompleteIndex(db_pool).load()
+request_log.log("autocomplete_index_loaded", sampled=False, seconds=round(autocomplete_index.load_seconds, 2))
+
+# Commander names and color identities for /random-commander, reloaded every COMMANDER_LIST_TTL seconds
+commander_list = CommanderList(db_pool, ttl=float(os.getenv('COMMANDER_LIST_TTL', 600))).load()
+
+# /dbinfo only changes on ingest, so the dataset_stats row is kept in memory for a while
+dataset_stats_cache = TTLCache(ttl=float(os.getenv('DBINFO_TTL', 300)))
+
+# Version of the data in Postgres, bumped by every ingest. When it changes, the in-memory copies are reloaded
+# before responses start carrying the new version
+dataset_version = DatasetVersion(db_pool, ttl=float(os.getenv('DATASET_VERSION_TTL', 30)))
+dataset_version.on_change(lambda version: dataset_stats_cache.clear())
+dataset_version.on_change(lambda version: commander_list.load())
+# Before the card lookup, which is built from it
+dataset_version.on_change(lambda version: card_catalog.load())
+if suggestion_index is not None:
+    dataset_version.on_change(lambda version: suggestion_index.load())
+if card_lookup is not None:
+    dataset_version.on_change(lambda version: card_lookup.load())
+dataset_version.on_change(lambda version: autocomplete_index.load())
+
+# Finished responses of the read endpoints, RESPONSE_CACHE_ENTRIES responses or RESPONSE_CACHE_BYTES of bodies at most
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_ENTRIES', 2048)),
+    max_bytes=int(os.getenv('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 300))
+)
+dataset_version.on_change(response_cache.clear)
+dataset_version.current()
+
+# ETag/Cache-Control for the read endpoints, nginx caches on these too (see nginx/nginx.conf)
+http_cache = HttpCache(dataset_version.current, app_version=os.getenv('APP_VERSION', ''))
+http_max_age = int(os.getenv('HTTP_MAX_AGE', 300))
+
+# Rows fetched per round trip by /export/suggestions
+export_itersize = int(os.getenv('EXPORT_ITERSIZE', 5000))
+
+# Per-commander models for /analyze, kept in an LRU of MODEL_CACHE_SIZE models
+# MODEL_PRELOAD loads that many of the most played commanders when the worker starts
+model_registry = ModelRegistry(os.path.join(BASE_DIR, 'ml_scripts', 'cmd_models'), ml_converter, max_size=int(os.getenv('MODEL_CACHE_SIZE', 64)))
+
+def get_popular_commander_names(limit:int) -> list:
+    conn = db_pool.getconn()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT cmd.card_name
+            FROM edhrec_commanders cmd
+            JOIN edhrec_cards c ON c.commander_id = cmd.id
+            WHERE cmd.card_name IS NOT NULL
+            GROUP BY cmd.id, cmd.card_name
+            ORDER BY MAX(c.num_decks) DESC
+            LIMIT %s
+        """, (limit,))
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        db_pool.putconn(conn)
+
+if int(os.getenv('MODEL_PRELOAD', 0)) > 0:
+    preloaded = model_registry.preload(get_popular_commander_names(int(os.getenv('MODEL_PRELOAD'))))
+    request_log.log("models_preloaded", sampled=False, models=preloaded)
+
+max_commanders_per_request = 4
 
 @app.route('/', methods=['GET'])
 def index():
     return jsonify({"message": "Success!"}), 200
 
+def fetch_db_info(cur):
+    try:
+        cur.execute(DB_INFO_SQL)
+        data = cur.fetchone()
+        if data is not None:
+            return data
+    except (psycopg2.errors.UndefinedTable, psycopg2.errors.ObjectNotInPrerequisiteState):
+        # View not created or never refreshed yet, fall back to the full scan
+        pass
+    cur.execute(DB_INFO_FALLBACK_SQL)
+    return cur.fetchone()
+
 @app.route('/dbinfo', methods=['GET'])
+@http_cache.versioned(max_age=http_max_age)
 def get_db_info():
-    cur.execute("""
-        SELECT 
-            AVG(c.synergy_score) as avg_synergy_score,
-            (SELECT AVG(avg_synergy_score)
-            FROM (
-                SELECT AVG(c.synergy_score) as avg_synergy_score
-                FROM edhrec_cards c
-                GROUP BY c.commander_id
-            ) AS commander_avg_synergies) as avg_commander_synergy_score,
-        COUNT(DISTINCT cmd.id) as commander_count,
-        COUNT(*) as card_commander_pairs_count,
-        COUNT(DISTINCT c.card_name) as unique_card_count
-        FROM edhrec_cards c
-        JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
-    """)
-    data = cur.fetchone()
-    avg_synergy_score, avg_commander_synergy_score, commander_count, card_commander_pairs_count, unique_card_count = data
-    return jsonify({"avg_synergy_score": avg_synergy_score, "avg_commander_synergy_score": avg_commander_synergy_score, "commander_count": commander_count, "card_commander_pairs_count": card_commander_pairs_count, "unique_card_count": unique_card_count}), 200
-
+    data = dataset_stats_cache.get('dbinfo')
+    if data is None:
+        data = fetch_db_info(get_cursor())
+        dataset_stats_cache.set('dbinfo', data)
+    body, status = db_info_body(data)
+    return jsonify(body), status
+
+def fetch_similar_commanders(cur, commander_id, commander_name, card_count):
+    try:
+        cur.execute(SIMILAR_COMMANDERS_SQL, (commander_id,))
+        return cur.fetchall()
+    except psycopg2.errors.UndefinedTable:
+        # Similarity table not built yet, fall back to the self-join
+        pass
+    cur.execute(SIMILAR_COMMANDERS_FALLBACK_SQL, (card_count, commander_name))
+    return cur.fetchall()
 
 @app.route('/<commander_name>/info', methods=['GET'])
+@http_cache.versioned(max_age=http_max_age)
+@response_cache.cached()
 def get_commander_info(commander_name):
-
-    if len(commander_name) > longest_commander_name:
-        return jsonify({"error": "Commander name too long."}), 400
-
-    cur.execute("""
-        SELECT cmd.name, cmd.scryfall_id,
-        (SELECT AVG(c.synergy_score) FROM edhrec_cards c WHERE c.commander_id = cmd.id) as avg_synergy_score,
-        (SELECT COUNT(*) FROM edhrec_cards c WHERE c.commander_id = cmd.id) as card_count
-        FROM edhrec_commanders cmd
-        WHERE cmd.name = %s
-    """, (commander_name,))
-
+    check_commander_name(commander_name)
+    cur = get_cursor()
+    cur.execute(COMMANDER_INFO_SQL, (commander_name,))
     data = cur.fetchone()
-    if not data:
-        return jsonify({"error": "Commander not found."}), 404
-    name, scryfall_id, avg_synergy_score, card_count = data
-
-    cur.execute("""
-        SELECT cmd2.card_name, cmd2.name, cmd2.scryfall_id, COUNT(DISTINCT c2.card_id), COUNT(DISTINCT c2.card_id) * 100.0 / %s as overlap_percentage
-        FROM edhrec_cards c1
-        JOIN edhrec_commanders cmd1 ON c1.commander_id = cmd1.id
-        JOIN edhrec_cards c2 ON c1.card_id = c2.card_id
-        JOIN edhrec_commanders cmd2 ON c2.commander_id = cmd2.id
-        WHERE cmd1.name = %s AND cmd1.id != cmd2.id
-        GROUP BY cmd2.card_name, cmd2.name, cmd2.scryfall_id
-        ORDER BY overlap_percentage DESC
-        LIMIT 5
-    """, (card_count, commander_name))
-
-
-    similar_commanders = [
-        {
-            "card_name": card_name, 
-            "name": name, 
-            "scryfall_id": scryfall_id, 
-            "overlap_count": overlap_count, 
-            "overlap_percentage": round(overlap_percentage, 2)
-        } for card_name, name, scryfall_id, overlap_count, overlap_percentage in cur.fetchall()
-    ]
-
-    return jsonify({
-        "name": name,
-        "scryfall_id": scryfall_id,
-        "avg_synergy_score": avg_synergy_score,
-        "card_count": card_count,
-        "similar_commanders": similar_commanders
-    }), 200
+    similar_rows = fetch_similar_commanders(cur, data[0], commander_name, data[4]) if data else []
+    body, status = commander_info_body(data, similar_rows)
+    return jsonify(body), status
 
 @app.route('/random-commander', methods=['GET'])
 def get_random_commander():
-    # Get number of commanders
-    cur.execute("""
-        SELECT COUNT(*) FROM edhrec_commanders
-    """)
-    count = cur.fetchone()[0]
-
-    index = random.randint(1, count)
-    # Get random commander by id
-    cur.execute("""
-        SELECT cmd.card_name
-        FROM edhrec_commanders cmd
-        LIMIT 1 OFFSET %s
-    """, (index,))
-    random_commander = cur.fetchone()[0]
-        
-    return jsonify({"commander_name": random_commander}), 200
+    bucket = random_commander_bucket(request.args.get('colors'))
+    body, status = random_commander_body(commander_list.random(bucket))
+    return jsonify(body), status
+
+@app.route('/autocomplete', methods=['GET'])
+@http_cache.versioned(max_age=http_max_age)
+def autocomplete():
+    # ?q=atr&commander=true => commanders whose name (or a word in it) starts with "atr", best edhrec_rank first
+    query = request.args.get('q', '')
+    commanders_only = request.args.get('commander', '').lower() in ('1', 'true', 'yes')
+    limit = autocomplete_limit(request.args.get('limit', 20))
+    return jsonify({"query": query, "results": autocomplete_index.search(query, commanders_only, limit)}), 200
+
+def fetch_suggestion_page(cur, commander_name:str, start:int, end:int) -> list:
+    try:
+        cur.execute(SUGGESTION_PAGE_SQL, (commander_name, start + 1, end))
+        return cur.fetchall()
+    except psycopg2.errors.UndefinedColumn:
+        # Ranks not migrated yet, fall back to sorting the commander's cards
+        pass
+    cur.execute(SUGGESTION_PAGE_FALLBACK_SQL, (commander_name, max(end - start, 0), start))
+    return cur.fetchall()
+
+def fetch_reductions(cur, commander_name:str, count:int) -> list:
+    try:
+        cur.execute(REDUCTIONS_SQL, (commander_name, count))
+        return cur.fetchall()
+    except psycopg2.errors.UndefinedColumn:
+        # Ranks not migrated yet, fall back to sorting the commander's cards
+        pass
+    cur.execute(REDUCTIONS_FALLBACK_SQL, (commander_name, count))
+    return cur.fetchall()
+
+def suggestion_rows(commander_name:str, start:int, end:int) -> list:
+    if suggestion_index is not None:
+        return suggestion_index.get_suggestions(commander_name, start, max(end - start, 0))
+    return fetch_suggestion_page(get_cursor(), commander_name, start, end)
 
 @app.route('/<commander_name>/suggestions/<count>', methods=['GET'])
+@http_cache.versioned(max_age=http_max_age)
+@response_cache.cached()
 def get_suggestions(commander_name, count):
-    # Get the suggestions for the commander
-    try:
-        int(count)
-    except ValueError:
-        # Probably using range, so count would look like "range/100/200"
-        # Redirect to range endpoint
-        return get_suggestions_range(commander_name, count.split('/')[1], count.split('/')[2])
-
-    if len(commander_name) > longest_commander_name:
+    start, end, echo = suggestions_page(commander_name, count)
+    body, status = suggestions_body(suggestion_rows(commander_name, start, end), echo)
+    return jsonify(body), status
+
+def iter_suggestions_for_commanders(commander_names):
+    # Yields (name, score, scryfall_id) in synergy order across every commander, best first
+    if suggestion_index is not None and len(commander_names) == 1:
+        yield from suggestion_index.iter_suggestions(commander_names[0])
+        return
+    if suggestion_index is not None:
+        rows = [row for commander_name in commander_names for row in suggestion_index.iter_suggestions(commander_name)]
+    else:
+        cur = get_cursor()
+        cur.execute("""
+        SELECT sc.card_name, c.synergy_score, sc.scryfall_id
+        FROM edhrec_cards c
+        JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+        JOIN scryfall_cards sc ON c.card_id = sc.id
+        WHERE cmd.name = ANY(%s)
+        ORDER BY c.synergy_score DESC
+        """, (list(commander_names),))
+        rows = cur.fetchall()
+    # Same order as ORDER BY synergy_score DESC, NULL scores first
+    rows.sort(key=lambda row: (row[1] is None, row[1] if row[1] is not None else 0), reverse=True)
+    yield from rows
+
+@app.route('/<commander_name>/suggestions', methods=['POST'])
+def get_suggestions_for_deck(commander_name):
+    # Body: {"decklist": ["1x Sol Ring", ...] or "1x Sol Ring\n...", "count": 100, "commanders": ["partner-name"]}
+    # Returns the top cards across every listed commander that aren't already in the deck, one entry per card name
+    # Deck lines that aren't a known card are listed in "unresolved", the cards they meant may still be suggested
+    json = request.get_json(silent=True)
+    if not isinstance(json, dict):
+        return jsonify({"error": "Request body must be a JSON object."}), 400
+
+    commander_names = [commander_name]
+    partners = json.get('commanders', [])
+    if not isinstance(partners, list) or not all(isinstance(partner, str) for partner in partners):
+        return jsonify({"error": "Commanders must be a list of commander names."}), 400
+    commander_names.extend(partner for partner in partners if partner not in commander_names)
+    if len(commander_names) > max_commanders_per_request:
+        return jsonify({"error": f"At most {max_commanders_per_request} commanders per request."}), 400
+    if any(len(name) > LONGEST_COMMANDER_NAME for name in commander_names):
         return jsonify({"error": "Commander name too long."}), 400
+    unknown_partners = [name for name in commander_names[1:] if card_catalog.commander_by_name(name) is None]
+    if unknown_partners:
+        return jsonify({"error": f"Unknown commanders: {', '.join(unknown_partners)}."}), 400
 
-    if int(count) > 100:
-        count = 100
+    try:
+        count = int(json.get('count', 100))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Count must be an integer."}), 400
+    count = max(0, min(count, 100))
+
+    decklist = json.get('decklist', [])
+    if not isinstance(decklist, (list, str)):
+        return jsonify({"error": "Decklist must be a list of card names or a string."}), 400
+    # Suggestions carry canonical names, ex. a deck's "Fire" has to exclude "Fire // Ice"
+    deck_card_names = set()
+    unresolved = []
+    for key, card_name in parse_decklist(decklist).items():
+        deck_card_names.add(key)
+        card = card_lookup.get(key) if card_lookup is not None else fetch_card(get_cursor(), key)
+        if card is None:
+            unresolved.append(card_name)
+        else:
+            deck_card_names.add(normalize_card_name(card[0]))
+
+    suggestions = []
+    seen_card_names = set()
+    excluded = 0
+    found = False
+    for name, score, scryfall_id in iter_suggestions_for_commanders(commander_names):
+        found = True
+        if len(suggestions) >= count:
+            break
+        normalized_name = normalize_card_name(name)
+        if normalized_name in seen_card_names:
+            continue
+        seen_card_names.add(normalized_name)
+        if normalized_name in deck_card_names:
+            excluded += 1
+            continue
+        suggestions.append({'name': name, 'score': score, 'scryfall_id': scryfall_id})
 
-    cur.execute("""
-    SELECT sc.card_name, c.synergy_score, sc.scryfall_id
-    FROM edhrec_cards c
-    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
-    JOIN scryfall_cards sc ON c.card_id = sc.id
-    WHERE cmd.name = %s
-    ORDER BY c.synergy_score DESC
-    LIMIT %s
-    """, (commander_name, count))
-
-    data = cur.fetchall()
-    suggestions = [{'name': name, 'score': score, 'scryfall_id': scryfall_id} for name, score, scryfall_id in data]
-    
-    if not suggestions:
+    if not found:
         return jsonify({"error": "No suggestions found for this commander."}), 404
-    return jsonify({"suggestions": suggestions, "count": count}), 200
+    return jsonify({"suggestions": suggestions, "count": len(suggestions), "excluded": excluded, "commanders": commander_names, "unresolved": unresolved}), 200
 
 @app.route('/<commander_name>/suggestions/range/<start>/<end>', methods=['GET'])
+@http_cache.versioned(max_age=http_max_age)
+@response_cache.cached()
 def get_suggestions_range(commander_name, start, end):
-    # Get the suggestions for the commander
-    try:
-        int(start)
-        int(end)
-    except ValueError:
-        return jsonify({"error": "Start and end must be integers."}), 400
-
-    # Longest commander name is 31 characters (Asmoranomardicadaistinaculdacar)
-    if len(commander_name) > longest_commander_name:
-        return jsonify({"error": "Commander name too long."}), 400
-
-    if int(start) < 0:
-        start = 0
-    if int(end) > int(start) + 100:
-        end = start + 100
-
-    cur.execute("""
-    SELECT sc.card_name, c.synergy_score, sc.scryfall_id
-    FROM edhrec_cards c
-    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
-    JOIN scryfall_cards sc ON c.card_id = sc.id
-    WHERE cmd.name = %s
-    ORDER BY c.synergy_score DESC
-    LIMIT %s
-    OFFSET %s
-    """, (commander_name, end, start))
-    data = cur.fetchall()
-    suggestions = [{'name': name, 'score': score, 'scryfall_id': scryfall_id} for name, score, scryfall_id in data]
-    if not suggestions:
-        return jsonify({"error": "No suggestions found for this commander."}), 404
-    return jsonify({"suggestions": suggestions, "start": start, "end": end}), 200
+    start, end, echo = suggestions_range_page(commander_name, start, end)
+    body, status = suggestions_body(suggestion_rows(commander_name, start, end), echo)
+    return jsonify(body), status
 
 @app.route('/<commander_name>/reductions/<count>', methods=['GET'])
+@http_cache.versioned(max_age=http_max_age)
+@response_cache.cached()
 def get_reductions(commander_name, count):
+    count = reductions_count(commander_name, count)
+    if suggestion_index is not None:
+        data = suggestion_index.get_reductions(commander_name, max(count, 0))
+    else:
+        data = fetch_reductions(get_cursor(), commander_name, max(count, 0))
+    body, status = reductions_body(data, count)
+    return jsonify(body), status
+
+@app.route('/export/suggestions', methods=['GET'])
+def export_suggestions():
+    # Every commander/card row in one streamed response, ?format=ndjson (default) or csv
+    # ?since=<dataset version> only returns rows that changed after that version, the current one is in X-Dataset-Version
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Format must be one of: {', '.join(EXPORT_FORMATS)}."}), 400
+
+    since = request.args.get('since')
+    if since is not None:
+        since = parse_since(since)
+        if since is None:
+            return jsonify({"error": "Since must be a dataset version from X-Dataset-Version."}), 400
+
+    version = dataset_version.current()
+    # Its own connection and cursor, held until the response is closed (last row sent or client gone) instead of until the view returns
+    conn = db_pool.getconn()
     try:
-        count = int(count)
-    except ValueError:
-        return jsonify({"error": "Count must be an integer."}), 400
-    
-    if len(commander_name) > longest_commander_name:
-        return jsonify({"error": "Commander name too long."}), 400
-    
-    if count > 100:
-        count = 100
+        cur = open_export_cursor(conn, since, itersize=export_itersize)
+    except Exception:
+        db_pool.putconn(conn)
+        raise
 
-    cur.execute("""
-        SELECT sc.card_name, c.percentage, c.synergy_score, sc.scryfall_id
-        FROM edhrec_cards c
-        JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
-        JOIN scryfall_cards sc ON c.card_id = sc.id
-        WHERE cmd.name = %s AND c.synergy_score < 0.8
-        ORDER BY c.percentage ASC, c.synergy_score ASC
-        LIMIT %s
-    """, (commander_name, count))
-    data = cur.fetchall()
-
-    reductions = [{'name': name, 'percentage': percentage, 'score': score, 'scryfall_id': scryfall_id} for name, percentage, score, scryfall_id in data]
-
-    if not reductions:
-        return jsonify({"error": "No reductions found for this commander."}), 404
-    return jsonify({"reductions": reductions, "count": count}), 200
+    def release_export():
+        try:
+            close_export_cursor(conn, cur)
+        finally:
+            db_pool.putconn(conn)
+
+    chunks = export_chunks(cur, export_format, batch_size=export_itersize)
+
+    headers = {
+        "X-Dataset-Version": version,
+        "Cache-Control": "no-store",
+        # Don't let nginx buffer the whole export before passing it on
+        "X-Accel-Buffering": "no",
+        "Content-Disposition": f"attachment; filename=suggestions-{version}.{export_format}",
+    }
+    if request.accept_encodings['gzip']:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    mimetype = "text/csv" if export_format == 'csv' else "application/x-ndjson"
+    response = Response(chunks, mimetype=mimetype, headers=headers)
+    response.call_on_close(release_export)
+    return response
 
 @app.route('/cards/<card_name>', methods=['GET'])
+@http_cache.versioned(max_age=http_max_age)
+@response_cache.cached(normalize=lambda card_name: ((), {'card_name': normalize_card_name(unquote(card_name))}))
 def get_card(card_name):
-
-    # Shessra%2C%20Death%27s%20Whisper => shessra, death's whisper
-    card_name = unquote(card_name.lower())
-
+    # Shessra%2C%20Death%27s%20Whisper => Shessra, Death's Whisper, any case, punctuation or accents, or one face of a // card
+    card_name = unquote(card_name)
+
+    if card_lookup is not None:
+        data = card_lookup.get(card_name)
+    else:
+        data = fetch_card(get_cursor(), card_name)
+    body, status = card_body(data)
+    return jsonify(body), status
+
+def fetch_related_cards(cur, commander_name:str) -> list:
+    # The commander's legal cards as dicts, on the request's pooled connection (gunicorn runs views on threads)
     cur.execute("""
-        SELECT sc.card_name, sc.mana_cost, sc.cmc, sc.type_line, sc.oracle_text, sc.colors, sc.color_identity, sc.commander_legal, sc.set_code, sc.rarity, sc.prices, sc.edhrec_rank
-        FROM scryfall_cards sc
-        WHERE LOWER(sc.card_name) = %s
-    """, (card_name,))
-
-    data = list(cur.fetchone())
-    if not data:
-        return jsonify({"error": "Card not found."}), 404
-
-    return jsonify({
-        "name": data[0],
-        "mana_cost": data[1],
-        "cmc": data[2],
-        "type_line": data[3],
-        "oracle_text": data[4],
-        "colors": data[5],
-        "color_identity": data[6],
-        "commander_legal": data[7],
-        "set_code": data[8],
-        "rarity": data[9],
-        "prices": data[10],
-        "edhrec_rank": data[11]
-    }), 200
+        SELECT ec.card_id, ec.percentage, ec.num_decks, ec.synergy_score, sc.*
+        FROM edhrec_cards ec
+        INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
+        WHERE ec.commander_id = (
+            SELECT id FROM edhrec_commanders
+            WHERE card_name = %s
+        )
+        AND sc.commander_legal = true
+        ORDER BY ec.card_id ASC
+    """, (commander_name,))
+    columns = [col[0] for col in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+def parse_card_or_none(card:dict):
+    # Cards that can't be parsed have no embedding and get masked out of scoring
+    try:
+        return ml_card_parser.parse_card(card)
+    except Exception:
+        return None
+
+def embed_deck(cards:list):
+    # Cards in the precomputed store are a row gather, everything else (ex. new printings) is parsed and embedded live
+    # Returns the parsed cards, the embedding rows in card order and a mask of which cards have a row
+    rows = embedding_store.lookup([card.get('id') for card in cards]) if embedding_store is not None else np.full(len(cards), -1)
+    parsed_cards = [embedding_store.parsed_card(row) if row >= 0 else parse_card_or_none(card) for card, row in zip(cards, rows)]
+    has_embedding = np.array([parsed_card is not None for parsed_card in parsed_cards], dtype=bool)
+    if not has_embedding.any():
+        return parsed_cards, None, has_embedding
+
+    stored = rows[has_embedding] >= 0
+    live_cards = [parsed_card for parsed_card, row in zip(parsed_cards, rows) if parsed_card is not None and row < 0]
+    embeddings = np.zeros((int(has_embedding.sum()), len(ml_card_embedder.parsed_properties_encoder.classes_)), dtype=np.float64)
+    if stored.any():
+        embeddings[stored] = embedding_store.embeddings(rows[has_embedding][stored])
+    if live_cards:
+        embeddings[~stored] = ml_card_embedder.embed_parsed_cards(live_cards, testing=True)
+    return parsed_cards, embeddings, has_embedding
+
+def cache_stats() -> dict:
+    stats = dict()
+    response_stats = response_cache.stats()
+    for cache_name, cache_stats in (("response", response_stats), ("model", model_registry.stats())):
+        for stat in ("size", "hits", "misses", "evictions"):
+            stats[(cache_name, stat)] = cache_stats[stat]
+    stats[("response", "size_bytes")] = response_stats["size_bytes"]
+    return stats
+
+metrics.gauge("cache_stats", "Response and model cache counters", cache_stats, ("cache", "stat"))
+metrics.gauge("db_pool_connections", "Pooled connections by state", lambda: {(state,): value for state, value in db_pool.stats().items()}, ("state",))
+metrics.gauge("dataset_version_info", "Dataset version this worker is serving", lambda: {(dataset_version.version,): 1} if dataset_version.version else None, ("version",))
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/cache/stats', methods=['GET'])
+def get_response_cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+@app.route('/analyze/model-cache', methods=['GET'])
+def get_model_cache_stats():
+    return jsonify(model_registry.stats()), 200
 
 @app.route('/analyze/<raw_commander_name>', methods=['POST'])
 def analyze(raw_commander_name):
-    print(raw_commander_name)
+    start_time = time.perf_counter()
+    cur = get_cursor()
     content_type = request.headers.get('Content-Type')
-    print(request)
-    print(request.headers)
-    print(content_type)
     if (content_type != 'application/json'):
+        request_log.log("analyze_rejected", level=logging.WARNING, commander=raw_commander_name, content_type=content_type)
         return 'Content-Type not supported!'
     json = request.json
 
-    print(json)
-    
     cur.execute("""
         SELECT cmd.card_name
         FROM edhrec_commanders cmd
         WHERE cmd.name = %s
     """, (raw_commander_name,))
 
-    commander_name = cur.fetchone()[0]
-
-    print(cur.fetchone())
+    row = cur.fetchone()
+    commander_name = row[0] if row is not None else None
 
     if not commander_name:
         return jsonify({"error": "Commander not found."}), 404
-    
-    print(commander_name)
+
     req_cards = json
-    cards = ml_db.get_related_cards_from_commander_name(commander_name)
+    cards = fetch_related_cards(cur, commander_name)
     cards = [card for card in cards if card['card_name'] in req_cards]
 
+    found_card_names = {card['card_name'] for card in cards}
     for card_name in req_cards:
-        if card_name not in [card['card_name'] for card in cards]:
+        if card_name not in found_card_names:
             card = ml_db.get_card_by_name(card_name)
             if card:
                 cards.append(card)
 
-    embeddings = ml_card_embedder.embed_and_parse_cards(cards, testing=True)
-    formatted_name = ml_converter.sanitize_filename(commander_name)
-    commander_model = joblib.load(f"ml_scripts/cmd_models/{formatted_name}.joblib")
+    commander_model = model_registry.get(commander_name)
+    if commander_model is None:
+        return jsonify({"error": "No model trained for this commander."}), 404
 
-    scores = {card['card_name']: 0 for card in cards}
-    parsed_cards = [ml_card_parser.parse_card(card) for card in cards]
-    
-    for i, card in enumerate(cards):
-        try:
-            if i % 1000 == 0:
-                print(f"Scoring {i} of {len(cards)}")
-            card_embedding = embeddings[i]
-            if card_embedding is None:
-                continue
-            score = round(commander_model.predict([card_embedding])[0], 2)
-            scores[card['card_name']] = score
-        except Exception as e:
-            continue
-    
+    parsed_cards, embeddings, has_embedding = embed_deck(cards)
+    card_scores = score_cards(commander_model, embeddings, has_embedding)
+    scores = {card['card_name']: score for card, score in zip(cards, card_scores.tolist())}
+    parsed_cards = [parsed_card for parsed_card in parsed_cards if parsed_card is not None]
+
+    request_log.log(
+        "analyze", commander=commander_name, requested_cards=len(req_cards), found_cards=len(cards),
+        embedded_cards=int(has_embedding.sum()), seconds=round(time.perf_counter() - start_time, 4)
+    )
     return jsonify({"scores": scores, "parsed_cards": parsed_cards}), 200
     
 
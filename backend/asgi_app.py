@@ -0,0 +1,329 @@
+import json
+import asyncio
+from decimal import Decimal
+from functools import wraps
+from urllib.parse import unquote
+from contextlib import asynccontextmanager
+import os
+import time
+from contextvars import ContextVar
+import asyncpg
+import psycopg2
+import psycopg2.pool
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags, quote_etag
+
+from app import (
+    app as flask_app, db_config, cors_origins,
+    suggestion_index, card_lookup, autocomplete_index, commander_list, dataset_stats_cache, dataset_version,
+    http_cache, http_max_age, response_cache,
+    request_seconds, request_errors, db_seconds, db_rows, serialize_seconds,
+)
+from api_scripts.card_names import normalize_card_name
+from api_scripts.card_lookup import FETCH_CARD_SQL
+from api_scripts.read_queries import (
+    asyncpg_sql, DB_INFO_SQL, DB_INFO_FALLBACK_SQL, COMMANDER_INFO_SQL, SIMILAR_COMMANDERS_SQL, SIMILAR_COMMANDERS_FALLBACK_SQL,
+    SUGGESTION_PAGE_SQL, SUGGESTION_PAGE_FALLBACK_SQL, REDUCTIONS_SQL, REDUCTIONS_FALLBACK_SQL,
+)
+from api_scripts.read_responses import (
+    InvalidRequest, error_body, check_commander_name, db_info_body, commander_info_body, random_commander_bucket,
+    random_commander_body, autocomplete_limit, suggestions_page, suggestions_range_page, suggestions_body,
+    reductions_count, reductions_body, card_body,
+)
+
+# ASGI entry point serving the read endpoints from an asyncpg pool, so one process can wait on hundreds of queries at once
+# Everything else (POST suggestions, /analyze, the stats endpoints) is handed to the Flask app unchanged. Run with:
+#   gunicorn -b 0.0.0.0:8000 --workers 2 -k uvicorn.workers.UvicornWorker asgi_app:app
+# The in-memory state (suggestion index, commander list, dataset version, caches) is the Flask app's, shared by both,
+# and so are the queries (api_scripts/read_queries.py) and the argument checks and bodies (api_scripts/read_responses.py)
+
+db_pool = None
+
+# Route of the request being handled, in Flask's <param> syntax so both apps report the same series on /metrics
+current_route = ContextVar("current_route", default="background")
+
+# The psycopg2 ones come from the shared state reloading on a thread (dataset version, commander list), same as Flask's
+DB_UNAVAILABLE_ERRORS = (
+    asyncpg.exceptions.PostgresConnectionError,
+    asyncpg.exceptions.InterfaceError,
+    asyncio.TimeoutError,
+    ConnectionError,
+    psycopg2.OperationalError,
+    psycopg2.InterfaceError,
+    psycopg2.pool.PoolError,
+)
+
+class JSONResponse(Response):
+    # Same body Flask's jsonify produces (sorted keys, compact, Decimal as a string), so both apps share cache entries
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        start_time = time.perf_counter()
+        body = (json.dumps(content, default=json_default, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+        serialize_seconds.observe(time.perf_counter() - start_time, current_route.get())
+        return body
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+async def init_connection(conn):
+    # psycopg2 hands back json columns (ex. scryfall_cards.prices) as dicts, asyncpg as strings unless told otherwise
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+@asynccontextmanager
+async def lifespan(app):
+    global db_pool
+    db_pool = await asyncpg.create_pool(
+        database=db_config['name'],
+        user=db_config['user'],
+        password=db_config['password'],
+        host=db_config['host'],
+        port=db_config['port'],
+        min_size=int(os.getenv('ASYNC_DB_POOL_MIN', 1)),
+        max_size=int(os.getenv('ASYNC_DB_POOL_MAX', 20)),
+        init=init_connection,
+    )
+    yield
+    await db_pool.close()
+
+async def fetch(query:str, *args):
+    # query is in psycopg2's placeholders like the Flask app's, see read_queries.asyncpg_sql()
+    sql = asyncpg_sql(query)
+    async with db_pool.acquire(timeout=float(os.getenv('DB_POOL_TIMEOUT', 10))) as conn:
+        start_time = time.perf_counter()
+        rows = await conn.fetch(sql, *args)
+        record_query(time.perf_counter() - start_time, len(rows))
+        return rows
+
+async def fetchrow(query:str, *args):
+    sql = asyncpg_sql(query)
+    async with db_pool.acquire(timeout=float(os.getenv('DB_POOL_TIMEOUT', 10))) as conn:
+        start_time = time.perf_counter()
+        row = await conn.fetchrow(sql, *args)
+        record_query(time.perf_counter() - start_time, 1 if row is not None else 0)
+        return row
+
+def record_query(seconds:float, rowcount:int):
+    route = current_route.get()
+    db_seconds.observe(seconds, route)
+    if rowcount > 0:
+        db_rows.inc(rowcount, route)
+
+def instrumented(path:str, handler):
+    # Times the whole request (ETag check and response cache included), the Flask app does the same in after_request
+    route = path.replace("{", "<").replace("}", ">")
+
+    @wraps(handler)
+    async def wrapper(request):
+        token = current_route.set(route)
+        start_time = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status_code
+            return response
+        except InvalidRequest as e:
+            status = 400
+            return json_response(error_body(e.message, status))
+        except DB_UNAVAILABLE_ERRORS:
+            status = 503
+            return await handle_db_unavailable(request, None)
+        finally:
+            request_seconds.observe(time.perf_counter() - start_time, route, request.method, str(status))
+            if status >= 500:
+                request_errors.inc(1, route, str(status))
+            current_route.reset(token)
+    return wrapper
+
+async def current_dataset_version() -> str:
+    # Only a stale version needs Postgres, and that check runs on a thread so it doesn't block the loop
+    if dataset_version.is_stale():
+        return await run_in_threadpool(dataset_version.current)
+    return dataset_version.version
+
+def versioned(normalize=None, cached:bool=True):
+    # Async counterpart of http_cache.versioned + response_cache.cached, same ETags and cache keys as the Flask views
+    # cached=False only adds the ETag, for endpoints that are cheaper to answer than to cache
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            version = await current_dataset_version()
+            etag = http_cache.etag(version, request.scope["path"], request.scope["query_string"].decode("latin-1"))
+            headers = {
+                "ETag": quote_etag(etag),
+                "Cache-Control": f"public, max-age={http_max_age}",
+                "X-Dataset-Version": version,
+            }
+            if parse_etags(request.headers.get("if-none-match")).contains_weak(etag):
+                return Response(status_code=304, headers=headers)
+
+            if not cached:
+                response = await handler(request)
+                if response.status_code == 200:
+                    response.headers.update(headers)
+                return response
+
+            kwargs = normalize(**request.path_params) if normalize is not None else dict(request.path_params)
+            key = response_cache.make_key(handler.__name__, (), kwargs, query=request.query_params.multi_items())
+            entry = response_cache.get(key)
+            if entry is not None:
+                status, mimetype, body = entry
+                return Response(body, status_code=status, media_type=mimetype, headers=headers)
+
+            generation = response_cache.generation
+            response = await handler(request)
+            if response.status_code != 200:
+                return response
+            response_cache.set(key, response.status_code, response.media_type, response.body, generation)
+            response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
+
+def json_response(result:tuple) -> JSONResponse:
+    # A read_responses (body, status)
+    body, status = result
+    return JSONResponse(body, status_code=status)
+
+async def index(request):
+    return JSONResponse({"message": "Success!"})
+
+async def fetch_db_info():
+    try:
+        data = await fetchrow(DB_INFO_SQL)
+        if data is not None:
+            return tuple(data)
+    except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.ObjectNotInPrerequisiteStateError):
+        # View not created or never refreshed yet, fall back to the full scan
+        pass
+    return tuple(await fetchrow(DB_INFO_FALLBACK_SQL))
+
+@versioned()
+async def get_db_info(request):
+    data = dataset_stats_cache.get('dbinfo')
+    if data is None:
+        data = await fetch_db_info()
+        dataset_stats_cache.set('dbinfo', data)
+    return json_response(db_info_body(data))
+
+async def fetch_similar_commanders(commander_id, commander_name, card_count):
+    try:
+        return await fetch(SIMILAR_COMMANDERS_SQL, commander_id)
+    except asyncpg.exceptions.UndefinedTableError:
+        # Similarity table not built yet, fall back to the self-join
+        pass
+    return await fetch(SIMILAR_COMMANDERS_FALLBACK_SQL, card_count, commander_name)
+
+@versioned()
+async def get_commander_info(request):
+    commander_name = request.path_params['commander_name']
+    check_commander_name(commander_name)
+    data = await fetchrow(COMMANDER_INFO_SQL, commander_name)
+    similar_rows = await fetch_similar_commanders(data[0], commander_name, data[4]) if data else []
+    return json_response(commander_info_body(data, similar_rows))
+
+async def get_random_commander(request):
+    bucket = random_commander_bucket(request.query_params.get('colors'))
+    # A stale list reloads from Postgres, keep that off the loop
+    if commander_list.is_stale():
+        random_commander = await run_in_threadpool(commander_list.random, bucket)
+    else:
+        random_commander = commander_list.random(bucket)
+    return json_response(random_commander_body(random_commander))
+
+@versioned(cached=False)
+async def autocomplete(request):
+    # ?q=atr&commander=true => commanders whose name (or a word in it) starts with "atr", best edhrec_rank first
+    query = request.query_params.get('q', '')
+    commanders_only = request.query_params.get('commander', '').lower() in ('1', 'true', 'yes')
+    limit = autocomplete_limit(request.query_params.get('limit', 20))
+    return JSONResponse({"query": query, "results": autocomplete_index.search(query, commanders_only, limit)})
+
+async def fetch_suggestion_page(commander_name:str, start:int, end:int) -> list:
+    try:
+        return await fetch(SUGGESTION_PAGE_SQL, commander_name, start + 1, end)
+    except asyncpg.exceptions.UndefinedColumnError:
+        # Ranks not migrated yet, fall back to sorting the commander's cards
+        pass
+    return await fetch(SUGGESTION_PAGE_FALLBACK_SQL, commander_name, max(end - start, 0), start)
+
+async def fetch_reductions(commander_name:str, count:int) -> list:
+    try:
+        return await fetch(REDUCTIONS_SQL, commander_name, count)
+    except asyncpg.exceptions.UndefinedColumnError:
+        # Ranks not migrated yet, fall back to sorting the commander's cards
+        pass
+    return await fetch(REDUCTIONS_FALLBACK_SQL, commander_name, count)
+
+async def suggestion_rows(commander_name:str, start:int, end:int) -> list:
+    if suggestion_index is not None:
+        return suggestion_index.get_suggestions(commander_name, start, max(end - start, 0))
+    return await fetch_suggestion_page(commander_name, start, end)
+
+@versioned()
+async def get_suggestions(request):
+    commander_name = request.path_params['commander_name']
+    start, end, echo = suggestions_page(commander_name, request.path_params['count'])
+    return json_response(suggestions_body(await suggestion_rows(commander_name, start, end), echo))
+
+@versioned()
+async def get_suggestions_range(request):
+    commander_name = request.path_params['commander_name']
+    start, end, echo = suggestions_range_page(commander_name, request.path_params['start'], request.path_params['end'])
+    return json_response(suggestions_body(await suggestion_rows(commander_name, start, end), echo))
+
+@versioned()
+async def get_reductions(request):
+    commander_name = request.path_params['commander_name']
+    count = reductions_count(commander_name, request.path_params['count'])
+    if suggestion_index is not None:
+        data = suggestion_index.get_reductions(commander_name, max(count, 0))
+    else:
+        data = await fetch_reductions(commander_name, max(count, 0))
+    return json_response(reductions_body(data, count))
+
+@versioned(normalize=lambda card_name: {'card_name': normalize_card_name(unquote(card_name))})
+async def get_card(request):
+    # Shessra%2C%20Death%27s%20Whisper => Shessra, Death's Whisper, any case, punctuation or accents, or one face of a // card
+    card_name = unquote(request.path_params['card_name'])
+
+    if card_lookup is not None:
+        data = card_lookup.get(card_name)
+    else:
+        key = normalize_card_name(card_name)
+        data = await fetchrow(FETCH_CARD_SQL, key) if key else None
+    return json_response(card_body(data))
+
+async def handle_db_unavailable(request, error):
+    return JSONResponse({"error": "Database unavailable, please try again."}, status_code=503)
+
+def get_route(path:str, handler) -> Route:
+    return Route(path, instrumented(path, handler), methods=['GET'])
+
+app = Starlette(
+    routes=[
+        get_route('/', index),
+        get_route('/dbinfo', get_db_info),
+        get_route('/random-commander', get_random_commander),
+        get_route('/autocomplete', autocomplete),
+        get_route('/cards/{card_name}', get_card),
+        get_route('/{commander_name}/info', get_commander_info),
+        get_route('/{commander_name}/suggestions/range/{start}/{end}', get_suggestions_range),
+        get_route('/{commander_name}/suggestions/{count}', get_suggestions),
+        get_route('/{commander_name}/reductions/{count}', get_reductions),
+        # Anything not matched above (ex. POST /<commander>/suggestions, /analyze) runs in the Flask app on a thread
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=cors_origins, allow_methods=['*'], allow_headers=['*'])],
+    exception_handlers={error: handle_db_unavailable for error in DB_UNAVAILABLE_ERRORS},
+    lifespan=lifespan,
+)
@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.chdir(BASE_DIR)
+
+import numpy as np
+from ml_scripts.card_fetcher import CardsContext
+from ml_scripts.card_embedder import CardEmbedder
+from ml_scripts.card_parser import CardParser
+from ml_scripts.converter import MLConverter
+from api_scripts.model_registry import ModelRegistry
+from api_scripts.deck_scoring import score_cards
+
+# Compares the old /analyze scoring path (parse twice, one predict per card) with the batched one
+#   python bench_scripts/analyze_benchmark.py --commander "Atraxa, Praetors' Voice" --sizes 60 100 300
+
+def old_path(embedder, parser, model, cards):
+    embeddings = embedder.embed_and_parse_cards(cards, testing=True)
+    scores = {card['card_name']: 0 for card in cards}
+    parsed_cards = [parser.parse_card(card) for card in cards]
+    for i, card in enumerate(cards):
+        try:
+            card_embedding = embeddings[i]
+            if card_embedding is None:
+                continue
+            scores[card['card_name']] = round(model.predict([card_embedding])[0], 2)
+        except Exception:
+            continue
+    return scores, parsed_cards
+
+def new_path(embedder, parser, model, cards):
+    parsed_cards = [parser.parse_card(card) for card in cards]
+    has_embedding = np.ones(len(cards), dtype=bool)
+    embeddings = embedder.embed_parsed_cards(parsed_cards, testing=True)
+    card_scores = score_cards(model, embeddings, has_embedding)
+    scores = {card['card_name']: score for card, score in zip(cards, card_scores.tolist())}
+    return scores, parsed_cards
+
+def time_path(path, repeats:int, *args) -> float:
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        path(*args)
+        timings.append(time.perf_counter() - start_time)
+    return float(np.median(timings))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /analyze scoring for different deck sizes")
+    parser.add_argument("--commander", default="Atraxa, Praetors' Voice")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[60, 100, 300])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    context = CardsContext()
+    embedder = CardEmbedder()
+    card_parser = CardParser()
+    registry = ModelRegistry(os.path.join(BASE_DIR, 'ml_scripts', 'cmd_models'), MLConverter())
+    model = registry.get(args.commander)
+    if model is None:
+        sys.exit(f"No model trained for {args.commander}")
+
+    catalog = [card for card in context.get_all_cards() if card['card_name'] is not None]
+    random.seed(42)
+
+    print(f"{'cards':>6} {'old ms':>10} {'new ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        deck = random.sample(catalog, size)
+        old_scores, _ = old_path(embedder, card_parser, model, deck)
+        new_scores, _ = new_path(embedder, card_parser, model, deck)
+        assert all(abs(old_scores[name] - new_scores[name]) < 1e-9 for name in old_scores), "Scores differ between paths"
+        old_seconds = time_path(old_path, args.repeats, embedder, card_parser, model, deck)
+        new_seconds = time_path(new_path, args.repeats, embedder, card_parser, model, deck)
+        print(f"{size:>6} {old_seconds * 1000:>10.2f} {new_seconds * 1000:>10.2f} {old_seconds / new_seconds:>7.1f}x")
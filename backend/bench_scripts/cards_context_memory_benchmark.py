@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.chdir(BASE_DIR)
+
+# Peak RSS and time of reading the training data with CardsContext's list methods, the streaming iter_* methods
+# and the columnar load_cmd_pct_relation_arrays()
+# Each mode runs in its own process, so one mode's peak can't hide the other's
+#   python bench_scripts/cards_context_memory_benchmark.py --itersize 2000 10000 50000
+
+def run_mode(mode:str, itersize:int) -> dict:
+    from ml_scripts.card_fetcher import CardsContext
+
+    rels_seconds = None
+    start_time = time.perf_counter()
+    db = CardsContext(itersize=itersize)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cards = 0
+    rels = 0
+    percentage_total = 0
+    if mode == "lists":
+        cards = len(db.get_all_cards())
+        for rel in db.get_cmd_pct_relations():
+            rels += 1
+            percentage_total += rel['percentage']
+    elif mode == "arrays":
+        cards = sum(1 for _ in db.iter_all_cards())
+        rels_start_time = time.perf_counter()
+        arrays = db.load_cmd_pct_relation_arrays()
+        rels_seconds = time.perf_counter() - rels_start_time
+        rels = len(arrays.card_id)
+        percentage_total = arrays.percentage.sum()
+    else:
+        cards = sum(1 for _ in db.iter_all_cards())
+        for rel in db.iter_cmd_pct_relations():
+            rels += 1
+            percentage_total += rel.percentage
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "itersize": itersize,
+        "cards": cards,
+        "rels": rels,
+        "percentage_total": float(percentage_total),
+        "seconds": time.perf_counter() - start_time,
+        "rels_seconds": rels_seconds,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_mb": peak_kb / 1024,
+        "growth_mb": (peak_kb - baseline_kb) / 1024,
+    }
+
+def run_isolated(mode:str, itersize:int) -> dict:
+    output = subprocess.run([sys.executable, __file__, "--child", mode, "--itersize", str(itersize)], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory of CardsContext's list vs streaming methods")
+    parser.add_argument("--itersize", type=int, nargs="+", default=[2000, 10000, 50000])
+    parser.add_argument("--child", choices=["lists", "stream", "arrays"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.itersize[0])))
+        sys.exit(0)
+
+    results = [run_isolated("lists", args.itersize[0])]
+    results.extend(run_isolated("stream", itersize) for itersize in args.itersize)
+    results.append(run_isolated("arrays", args.itersize[0]))
+    print(f"{'mode':>7} {'itersize':>9} {'rels':>9} {'seconds':>8} {'peak MB':>9} {'growth MB':>10}")
+    for result in results:
+        itersize = result['itersize'] if result['mode'] == "stream" else "-"
+        print(f"{result['mode']:>7} {itersize:>9} {result['rels']:>9} {result['seconds']:>8.2f} {result['peak_mb']:>9.1f} {result['growth_mb']:>10.1f}")
+        if result['rels_seconds'] is not None:
+            print(f"{'':>7} relations loaded in {result['rels_seconds']:.3f} seconds")
+    if any(abs(result['percentage_total'] - results[0]['percentage_total']) > 1e-6 * abs(results[0]['percentage_total']) for result in results):
+        print("Warning: the modes read different data")
@@ -0,0 +1,354 @@
+from dotenv import load_dotenv
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+import httpx
+import psycopg2
+
+from serving_benchmark import percentile
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Reproducible load test of every public API route, meant to be diffed against a stored baseline in CI
+# The request plan is built from the database with a fixed seed (same seed + same data = same requests in the same order):
+# commanders are picked with a Zipf-like skew towards the most played ones, range pages go as deep as each commander's
+# card list, /analyze gets 100-card decks. Start the API against the Docker Postgres first, then ex:
+#   python bench_scripts/load_test.py --concurrency 1 8 32 128 --duration 20 -o load_test.json
+#   python bench_scripts/load_test.py --baseline load_test_baseline.json -o load_test.json
+# Exits with 1 when a route regresses past the --max-* thresholds against --baseline.
+# --save-plan/--plan pin the exact requests, so a run doesn't even depend on what's in the database.
+
+# Route labels are the Flask url rules, the same labels the API's /metrics uses
+ROUTE_WEIGHTS = {
+    "GET /<commander_name>/suggestions/<count>": 0.20,
+    "GET /autocomplete": 0.15,
+    "GET /<commander_name>/info": 0.12,
+    "GET /<commander_name>/suggestions/range/<start>/<end>": 0.12,
+    "GET /cards/<card_name>": 0.10,
+    "GET /<commander_name>/reductions/<count>": 0.06,
+    "POST /<commander_name>/suggestions": 0.06,
+    "GET /random-commander": 0.05,
+    "POST /analyze/<raw_commander_name>": 0.04,
+    "GET /dbinfo": 0.03,
+    "GET /": 0.01,
+    "GET /metrics": 0.01,
+    "GET /cache/stats": 0.005,
+    "GET /analyze/model-cache": 0.005,
+    # A full export streams the whole table, keep it rare so it doesn't dominate the run
+    "GET /export/suggestions": 0.001,
+}
+
+ZIPF_EXPONENT = 1.1
+DECK_SIZE = 100
+# Commanders that get an /analyze deck, the decks are the slow part of building the plan
+DECK_COMMANDERS = 50
+RANDOM_COMMANDER_COLORS = [None, None, "w", "ub", "rg", "wubrg", "c"]
+
+def load_dataset(conn, commander_limit:int, card_limit:int) -> dict:
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT cmd.name, cmd.card_name, COUNT(*)
+        FROM edhrec_commanders cmd
+        JOIN edhrec_cards c ON c.commander_id = cmd.id
+        WHERE cmd.name IS NOT NULL AND cmd.card_name IS NOT NULL AND length(cmd.name) <= 31
+        GROUP BY cmd.id, cmd.name, cmd.card_name
+        ORDER BY MAX(c.num_decks) DESC, cmd.name ASC
+        LIMIT %s
+    """, (commander_limit,))
+    commanders = [{"name": name, "card_name": card_name, "card_count": card_count} for name, card_name, card_count in cur.fetchall()]
+
+    cur.execute("""
+        SELECT card_name
+        FROM scryfall_cards
+        WHERE card_name IS NOT NULL AND edhrec_rank IS NOT NULL
+        GROUP BY card_name
+        ORDER BY MIN(edhrec_rank) ASC, card_name ASC
+        LIMIT %s
+    """, (card_limit,))
+    cards = [row[0] for row in cur.fetchall()]
+
+    for commander in commanders[:DECK_COMMANDERS]:
+        cur.execute("""
+            SELECT sc.card_name
+            FROM edhrec_cards c
+            JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+            JOIN scryfall_cards sc ON c.card_id = sc.id
+            WHERE cmd.name = %s
+            ORDER BY c.num_decks DESC, sc.card_name ASC
+            LIMIT %s
+        """, (commander["name"], DECK_SIZE))
+        commander["deck"] = [row[0] for row in cur.fetchall()]
+    cur.close()
+    return {"commanders": commanders, "cards": cards}
+
+def zipf_weights(n:int) -> list:
+    # Cumulative weights for random.choices, rank k is picked ~ 1 / (k + 1) ** ZIPF_EXPONENT
+    cumulative = []
+    total = 0.0
+    for k in range(n):
+        total += 1 / (k + 1) ** ZIPF_EXPONENT
+        cumulative.append(total)
+    return cumulative
+
+def build_deck(rng:random.Random, commander:dict, cards:list, card_weights:list) -> list:
+    # Mostly the commander's own cards with some staples that aren't in its list, like a real decklist
+    deck = [commander["card_name"]] + commander.get("deck", [])[:int(DECK_SIZE * 0.8)]
+    seen = set(deck)
+    for card in rng.choices(cards, cum_weights=card_weights, k=DECK_SIZE * 10):
+        if len(deck) >= DECK_SIZE:
+            break
+        if card not in seen:
+            seen.add(card)
+            deck.append(card)
+    return deck
+
+def build_plan(dataset:dict, size:int, seed:int, weights:dict) -> list:
+    rng = random.Random(seed)
+    commanders = dataset["commanders"]
+    cards = dataset["cards"]
+    deck_commanders = [commander for commander in commanders if commander.get("deck")]
+    if not commanders or not cards:
+        raise ValueError("The database has no commanders or cards to build a plan from")
+    commander_weights = zipf_weights(len(commanders))
+    deck_commander_weights = zipf_weights(len(deck_commanders))
+    card_weights = zipf_weights(len(cards))
+    routes = [route for route, weight in weights.items() if weight > 0]
+    route_weights = [weights[route] for route in routes]
+
+    plan = []
+    for _ in range(size):
+        route = rng.choices(routes, weights=route_weights)[0]
+        method, rule = route.split(" ", 1)
+        commander = rng.choices(commanders, cum_weights=commander_weights)[0]
+        entry = {"route": route, "method": method, "path": rule}
+
+        if rule == "/<commander_name>/info":
+            entry["path"] = f"/{commander['name']}/info"
+        elif rule == "/<commander_name>/suggestions/<count>":
+            entry["path"] = f"/{commander['name']}/suggestions/{rng.choice([10, 25, 50, 100])}"
+        elif rule == "/<commander_name>/suggestions/range/<start>/<end>":
+            # Any page of the commander's list, so deep pages are as likely as the first one
+            start = rng.randrange(0, max(commander["card_count"], 100), 100)
+            entry["path"] = f"/{commander['name']}/suggestions/range/{start}/{start + 100}"
+        elif rule == "/<commander_name>/reductions/<count>":
+            entry["path"] = f"/{commander['name']}/reductions/{rng.choice([25, 50, 100])}"
+        elif rule == "/<commander_name>/suggestions":
+            deck_commander = rng.choices(deck_commanders, cum_weights=deck_commander_weights)[0] if deck_commanders else commander
+            deck = build_deck(rng, deck_commander, cards, card_weights)
+            entry["path"] = f"/{deck_commander['name']}/suggestions"
+            entry["json"] = {"decklist": [f"1x {card}" for card in deck], "count": 100}
+        elif rule == "/analyze/<raw_commander_name>":
+            deck_commander = rng.choices(deck_commanders, cum_weights=deck_commander_weights)[0] if deck_commanders else commander
+            entry["path"] = f"/analyze/{deck_commander['name']}"
+            entry["json"] = build_deck(rng, deck_commander, cards, card_weights)
+        elif rule == "/random-commander":
+            colors = rng.choice(RANDOM_COMMANDER_COLORS)
+            if colors is not None:
+                entry["params"] = {"colors": colors}
+        elif rule == "/autocomplete":
+            # What someone has typed so far, into the commander picker or a card search
+            commanders_only = rng.random() < 0.5
+            name = commander["card_name"] if commanders_only else rng.choices(cards, cum_weights=card_weights)[0]
+            entry["params"] = {"q": name[:rng.randint(1, min(len(name), 10))], "commander": str(commanders_only).lower()}
+        elif rule == "/cards/<card_name>":
+            card = rng.choices(cards, cum_weights=card_weights)[0]
+            entry["path"] = "/cards/" + quote(card.lower() if rng.random() < 0.3 else card, safe="")
+        elif rule == "/export/suggestions":
+            entry["params"] = {"format": rng.choice(["ndjson", "csv"])}
+        plan.append(entry)
+    return plan
+
+def plan_digest(plan:list) -> str:
+    return hashlib.sha1(json.dumps(plan, sort_keys=True).encode("utf-8")).hexdigest()
+
+async def send(client:httpx.AsyncClient, entry:dict, bypass_cache:bool, nonce:str) -> int:
+    params = dict(entry.get("params", {}))
+    if bypass_cache:
+        params["nocache"] = nonce
+    if entry["route"] == "GET /export/suggestions":
+        # Read the whole stream, the response is only done when the last row is
+        async with client.stream("GET", entry["path"], params=params) as response:
+            async for _ in response.aiter_bytes():
+                pass
+            return response.status_code
+    response = await client.request(entry["method"], entry["path"], params=params, json=entry.get("json"))
+    return response.status_code
+
+async def run_client(client:httpx.AsyncClient, client_id:int, plan:list, offset:int, warmup_deadline:float, deadline:float, bypass_cache:bool, samples:list):
+    i = offset
+    while time.perf_counter() < deadline:
+        entry = plan[i % len(plan)]
+        i += 1
+        request_start = time.perf_counter()
+        try:
+            status = await send(client, entry, bypass_cache, f"{client_id}-{i}")
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        if request_start >= warmup_deadline:
+            samples.append((entry["route"], status, time.perf_counter() - request_start))
+
+def summarize(samples:list, seconds:float) -> dict:
+    # 5xx and transport errors are errors, 4xx are expected for some of the plan (ex. a commander without a model)
+    timings = sorted(elapsed for _, _, elapsed in samples)
+    errors = sum(1 for _, status, _ in samples if not isinstance(status, int) or status >= 500)
+    client_errors = sum(1 for _, status, _ in samples if isinstance(status, int) and 400 <= status < 500)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "client_errors": client_errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput": len(samples) / seconds if seconds > 0 else 0.0,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+    }
+
+async def run_level(base_url:str, plan:list, concurrency:int, duration:float, warmup:float, bypass_cache:bool) -> dict:
+    samples = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start_time = time.perf_counter()
+        warmup_deadline = start_time + warmup
+        deadline = warmup_deadline + duration
+        # Clients start evenly spread over the plan, so every level replays the same requests
+        stride = max(len(plan) // concurrency, 1)
+        await asyncio.gather(*(run_client(client, i, plan, i * stride, warmup_deadline, deadline, bypass_cache, samples) for i in range(concurrency)))
+        measured = time.perf_counter() - warmup_deadline
+
+    routes = dict()
+    for sample in samples:
+        routes.setdefault(sample[0], []).append(sample)
+    return {
+        "concurrency": concurrency,
+        "seconds": measured,
+        "overall": summarize(samples, measured),
+        "routes": {route: summarize(route_samples, measured) for route, route_samples in sorted(routes.items())},
+    }
+
+def compare(result:dict, baseline:dict, max_latency:float, max_throughput:float, max_error_rate:float) -> list:
+    # Returns a line per regression: p95 up or throughput down by more than the given fraction, or more errors
+    regressions = []
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in result["levels"]:
+        baseline_level = baseline_levels.get(level["concurrency"])
+        if baseline_level is None:
+            continue
+        pairs = [("overall", level["overall"], baseline_level["overall"])]
+        pairs.extend((route, stats, baseline_level["routes"][route]) for route, stats in level["routes"].items() if route in baseline_level["routes"])
+        for name, stats, before in pairs:
+            label = f"c={level['concurrency']} {name}"
+            if before["p95_ms"] > 0 and stats["p95_ms"] > before["p95_ms"] * (1 + max_latency):
+                regressions.append(f"{label}: p95 {before['p95_ms']:.2f} => {stats['p95_ms']:.2f} ms")
+            if name == "overall" and before["throughput"] > 0 and stats["throughput"] < before["throughput"] * (1 - max_throughput):
+                regressions.append(f"{label}: throughput {before['throughput']:.1f} => {stats['throughput']:.1f} req/s")
+            if stats["error_rate"] > before["error_rate"] + max_error_rate:
+                regressions.append(f"{label}: error rate {before['error_rate']:.2%} => {stats['error_rate']:.2%}")
+    return regressions
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_level(level:dict):
+    print(f"\nconcurrency {level['concurrency']}")
+    print(f"{'route':<60} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(level["routes"].items()) + [("overall", level["overall"])]:
+        print(f"{name:<60} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>9.1f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproducible load test of the public API with a JSON result to diff against a baseline")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--plan-size", type=int, default=20000)
+    parser.add_argument("--commanders", type=int, default=1000, help="How many of the most played commanders to draw from")
+    parser.add_argument("--cards", type=int, default=5000, help="How many of the best ranked cards to draw from")
+    parser.add_argument("--weight", action="append", default=[], metavar="'METHOD RULE=WEIGHT'", help="Override a route's share of the plan, ex. --weight 'GET /export/suggestions=0'")
+    parser.add_argument("--bypass-cache", action="store_true", help="Make every request miss the response caches")
+    parser.add_argument("--plan", help="Replay a plan written by --save-plan instead of building one from the database")
+    parser.add_argument("--save-plan", help="Write the plan to this file")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--max-latency-regression", type=float, default=0.25, help="Allowed p95 increase as a fraction")
+    parser.add_argument("--max-throughput-regression", type=float, default=0.15, help="Allowed throughput drop as a fraction")
+    parser.add_argument("--max-error-rate-increase", type=float, default=0.01, help="Allowed error rate increase")
+    args = parser.parse_args()
+
+    weights = dict(ROUTE_WEIGHTS)
+    for override in args.weight:
+        route, _, weight = override.rpartition("=")
+        if route not in weights:
+            parser.error(f"Unknown route {route!r}, expected one of: {', '.join(weights)}")
+        weights[route] = float(weight)
+
+    if args.plan:
+        with open(args.plan, encoding="utf-8") as f:
+            plan = json.load(f)
+    else:
+        load_dotenv(os.path.join(BASE_DIR, '.env'))
+        # Connect to the database
+        conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+        dataset = load_dataset(conn, args.commanders, args.cards)
+        conn.close()
+        plan = build_plan(dataset, args.plan_size, args.seed, weights)
+    if args.save_plan:
+        with open(args.save_plan, "w", encoding="utf-8") as f:
+            json.dump(plan, f)
+    print(f"Plan of {len(plan)} requests, sha1 {plan_digest(plan)}")
+
+    dataset_etag = None
+    try:
+        dataset_etag = httpx.get(args.url + "/dbinfo", timeout=30).headers.get("ETag")
+    except httpx.HTTPError as e:
+        print(f"Couldn't reach {args.url}: {e}")
+        sys.exit(1)
+
+    result = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "git_commit": git_commit(),
+            "dataset_etag": dataset_etag,
+            "seed": args.seed,
+            "plan_sha1": plan_digest(plan),
+            "plan_size": len(plan),
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "bypass_cache": args.bypass_cache,
+        },
+        "levels": [],
+    }
+    for concurrency in args.concurrency:
+        level = asyncio.run(run_level(args.url, plan, concurrency, args.duration, args.warmup, args.bypass_cache))
+        result["levels"].append(level)
+        print_level(level)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("plan_sha1") != result["meta"]["plan_sha1"]:
+            print("Warning: the baseline was recorded with a different request plan")
+        regressions = compare(result, baseline, args.max_latency_regression, args.max_throughput_regression, args.max_error_rate_increase)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+        if regressions:
+            sys.exit(1)
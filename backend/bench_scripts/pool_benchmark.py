@@ -0,0 +1,65 @@
+import argparse
+import threading
+import time
+import requests
+
+# Measures API throughput with N concurrent clients
+# Start the API against a local Postgres first, ex:
+#   gunicorn -b 0.0.0.0:8000 --workers 2 --threads 8 app:app
+#   python bench_scripts/pool_benchmark.py --clients 1 4 16 32 --duration 10
+
+DEFAULT_PATHS = [
+    "/dbinfo",
+    "/urza-lord-high-artificer/info",
+    "/urza-lord-high-artificer/suggestions/100",
+    "/atraxa-praetors-voice/suggestions/range/100/200",
+    "/atraxa-praetors-voice/reductions/100",
+    "/random-commander",
+    "/cards/sol%20ring",
+]
+
+def run_client(base_url:str, paths:list, deadline:float, results:list, lock:threading.Lock):
+    session = requests.Session()
+    completed = 0
+    errors = 0
+    i = 0
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        try:
+            response = session.get(base_url + path, timeout=30)
+            if response.status_code >= 500:
+                errors += 1
+            else:
+                completed += 1
+        except requests.RequestException:
+            errors += 1
+    with lock:
+        results.append((completed, errors))
+
+def run_benchmark(base_url:str, paths:list, clients:int, duration:float) -> dict:
+    results = []
+    lock = threading.Lock()
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=run_client, args=(base_url, paths, deadline, results, lock)) for _ in range(clients)]
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start_time
+    completed = sum(result[0] for result in results)
+    errors = sum(result[1] for result in results)
+    return {"clients": clients, "requests": completed, "errors": errors, "seconds": elapsed, "throughput": completed / elapsed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput benchmark for the pooled API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'requests':>10} {'errors':>8} {'req/s':>10}")
+    for clients in args.clients:
+        result = run_benchmark(args.url, DEFAULT_PATHS, clients, args.duration)
+        print(f"{result['clients']:>8} {result['requests']:>10} {result['errors']:>8} {result['throughput']:>10.1f}")
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import time
+import httpx
+
+from pool_benchmark import DEFAULT_PATHS
+
+# Side-by-side load test of the two serving modes, with many concurrent connections from a single async client
+# Start both against the same Postgres first, ex:
+#   gunicorn -b 0.0.0.0:8000 --workers 2 --threads 8 app:app
+#   gunicorn -b 0.0.0.0:8001 --workers 2 -k uvicorn.workers.UvicornWorker asgi_app:app
+#   python bench_scripts/serving_benchmark.py --concurrency 16 64 256 --duration 10
+# The response caches are bypassed with a unique query string unless --cached is passed
+
+def percentile(sorted_values:list, pct:float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+async def run_client(client:httpx.AsyncClient, client_id:int, paths:list, deadline:float, cached:bool, timings:list, errors:list):
+    i = client_id
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        params = None if cached else {"nocache": f"{client_id}-{i}"}
+        start_time = time.perf_counter()
+        try:
+            response = await client.get(path, params=params)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        timings.append(time.perf_counter() - start_time)
+
+async def run_benchmark(base_url:str, paths:list, concurrency:int, duration:float, cached:bool) -> dict:
+    timings = []
+    errors = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        start_time = time.perf_counter()
+        deadline = start_time + duration
+        await asyncio.gather(*(run_client(client, i, paths, deadline, cached, timings, errors) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start_time
+    timings.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(timings),
+        "errors": len(errors),
+        "throughput": len(timings) / elapsed,
+        "p50": percentile(timings, 50),
+        "p99": percentile(timings, 99),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and latency of the Flask (WSGI) and ASGI serving modes")
+    parser.add_argument("--wsgi-url", default="http://localhost:8000")
+    parser.add_argument("--asgi-url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128, 256])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--cached", action="store_true", help="Let repeated requests hit the response caches")
+    args = parser.parse_args()
+
+    print(f"{'mode':>5} {'conns':>6} {'requests':>10} {'errors':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in args.concurrency:
+        for mode, url in (("wsgi", args.wsgi_url), ("asgi", args.asgi_url)):
+            result = asyncio.run(run_benchmark(url, DEFAULT_PATHS, concurrency, args.duration, args.cached))
+            print(f"{mode:>5} {result['concurrency']:>6} {result['requests']:>10} {result['errors']:>8} {result['throughput']:>10.1f} {result['p50'] * 1000:>9.2f} {result['p99'] * 1000:>9.2f}")
@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+from api_scripts.db_pool import ConnectionPool
+from api_scripts.suggestion_index import SuggestionIndex
+
+# Loads the full suggestion index, reports its memory use, then times the same lookups the endpoints make
+#   python bench_scripts/suggestion_index_benchmark.py --requests 100000
+
+def percentile(sorted_values:list, pct:float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and memory benchmark for the in-memory suggestion index")
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    db_config = {
+        'name': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'host': os.getenv('DB_HOST'),
+        'port': os.getenv('DB_PORT')
+    }
+    db_pool = ConnectionPool(db_config, min_size=1, max_size=1)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = SuggestionIndex(db_pool).load()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    usage = index.memory_usage()
+    print(f"Loaded {usage['rows']} rows for {usage['commanders']} commanders ({usage['cards']} cards) in {index.load_seconds:.2f}s")
+    print(f"Index size: {usage['total_bytes'] / 1024 / 1024:.1f} MiB (getsizeof), {retained / 1024 / 1024:.1f} MiB retained (tracemalloc)")
+
+    commander_names = index.commander_names()
+    operations = [
+        ("suggestions", lambda name: index.get_suggestions(name, 0, 100)),
+        ("suggestions/range", lambda name: index.get_suggestions(name, random.randint(0, 400), 100)),
+        ("reductions", lambda name: index.get_reductions(name, 100)),
+    ]
+    for label, operation in operations:
+        timings = []
+        for _ in range(args.requests):
+            name = random.choice(commander_names)
+            start_time = time.perf_counter()
+            rows = operation(name)
+            [{'name': row[0], 'score': row[-2], 'scryfall_id': row[-1]} for row in rows]
+            timings.append(time.perf_counter() - start_time)
+        timings.sort()
+        print(f"{label:>18}: p50 {percentile(timings, 50) * 1000:.4f} ms, p99 {percentile(timings, 99) * 1000:.4f} ms, max {timings[-1] * 1000:.4f} ms")
@@ -0,0 +1,106 @@
+from dotenv import load_dotenv
+import os
+import time
+import argparse
+from pathlib import Path
+import psycopg2
+from psycopg2.extras import execute_values
+import numpy as np
+from scipy import sparse
+
+# Precomputes each commander's most similar commanders for /<commander>/info
+# Similarity is the number of distinct cards two commanders share, as a percentage of the commander's own card count.
+# Builds a sparse commander x card matrix and gets the pairwise overlaps from its product with its transpose, block_rows
+# commanders at a time. Almost every pair of commanders shares a staple, so the full product is close to dense
+# (N x N, ~5.8 GB at 20x scale), while one block is block_rows x N.
+
+CREATE_COMMANDER_SIMILARITY_SQL = """
+    CREATE TABLE IF NOT EXISTS commander_similarity (
+        commander_id INTEGER NOT NULL,
+        rank SMALLINT NOT NULL,
+        similar_commander_id INTEGER NOT NULL,
+        overlap_count INTEGER NOT NULL,
+        overlap_percentage NUMERIC NOT NULL,
+        PRIMARY KEY (commander_id, rank)
+    )
+"""
+
+def compute_commander_similarity(commander_ids:np.ndarray, card_ids:np.ndarray, top_k:int=5, block_rows:int=256) -> list:
+    # commander_ids and card_ids are parallel arrays, one entry per edhrec_cards row
+    # Returns (commander_id, rank, similar_commander_id, overlap_count, overlap_percentage) rows
+    commanders, commander_rows = np.unique(commander_ids, return_inverse=True)
+    card_counts = np.bincount(commander_rows, minlength=len(commanders))
+
+    has_card = card_ids >= 0
+    cards, card_cols = np.unique(card_ids[has_card], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(card_cols), dtype=np.int32), (commander_rows[has_card], card_cols)),
+        shape=(len(commanders), len(cards))
+    )
+    # Duplicate (commander, card) entries are summed on construction, clamp back to 0/1 so overlaps count distinct cards
+    matrix.data[:] = 1
+
+    k = min(top_k, len(commanders) - 1)
+    if k <= 0:
+        return []
+    matrix_t = matrix.T.tocsr()
+
+    rows = []
+    for start in range(0, len(commanders), block_rows):
+        end = min(start + block_rows, len(commanders))
+        # Overlaps of commanders start..end with every commander, the only dense array is this block
+        overlaps = (matrix[start:end] @ matrix_t).toarray()
+        overlaps[np.arange(end - start), np.arange(start, end)] = 0
+        top = np.argpartition(-overlaps, k - 1, axis=1)[:, :k]
+
+        for offset, candidates in enumerate(top):
+            i = start + offset
+            ranked = candidates[np.argsort(-overlaps[offset, candidates], kind="stable")]
+            for rank, j in enumerate(ranked):
+                overlap_count = int(overlaps[offset, j])
+                if overlap_count == 0:
+                    break
+                overlap_percentage = round(overlap_count * 100.0 / int(card_counts[i]), 4)
+                rows.append((int(commanders[i]), rank, int(commanders[j]), overlap_count, overlap_percentage))
+    return rows
+
+def build_commander_similarity(conn, top_k:int=5, block_rows:int=256):
+    start_time = time.time()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT c.commander_id, COALESCE(c.card_id, -1)
+        FROM edhrec_cards c
+        JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+    """)
+    data = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+    print(f"Loaded {len(data)} commander-card pairs in {time.time() - start_time:.2f} seconds")
+
+    rows = compute_commander_similarity(data[:, 0], data[:, 1], top_k=top_k, block_rows=block_rows)
+    print(f"Computed {len(rows)} similarity rows in {time.time() - start_time:.2f} seconds")
+
+    # Replace every row in one transaction so the API never sees the table half written. DELETE instead of TRUNCATE:
+    # TRUNCATE's ACCESS EXCLUSIVE lock would block /info until the commit, DELETE lets reads go on against the old rows
+    # (top_k rows per commander, so the dead ones are few and left to autovacuum)
+    cur.execute(CREATE_COMMANDER_SIMILARITY_SQL)
+    cur.execute("DELETE FROM commander_similarity")
+    execute_values(cur, """
+        INSERT INTO commander_similarity (commander_id, rank, similar_commander_id, overlap_count, overlap_percentage)
+        VALUES %s
+    """, rows, page_size=10000)
+    conn.commit()
+    cur.close()
+    print(f"Saved commander_similarity in {time.time() - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the commander_similarity table")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--block-rows", type=int, default=256, help="Commanders per block of the overlap product")
+    args = parser.parse_args()
+
+    BASE_DIR = Path(__file__).resolve().parent.parent
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+    build_commander_similarity(conn, top_k=args.top_k, block_rows=args.block_rows)
+    conn.close()
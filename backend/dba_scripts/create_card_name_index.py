@@ -0,0 +1,46 @@
+from dotenv import load_dotenv
+import os
+import sys
+from pathlib import Path
+import psycopg2
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api_scripts.card_names import ACCENTED, UNACCENTED
+
+# card_name_key() is the SQL twin of api_scripts/card_names.normalize_card_name, and the expression indexes on it
+# let /cards/<card_name> find a card (or either face of a split/MDFC card) without scanning scryfall_cards
+# Safe to rerun, CREATE OR REPLACE keeps the function in sync with the Python accent table and the indexes are rebuilt
+# so they never hold keys from an older version of it
+CREATE_CARD_NAME_KEY_SQL = f"""
+    CREATE OR REPLACE FUNCTION card_name_key(card_name TEXT) RETURNS TEXT AS $$
+        SELECT regexp_replace(translate(lower(card_name), '{ACCENTED}', '{UNACCENTED}'), '[^a-z0-9]', '', 'g')
+    $$ LANGUAGE SQL IMMUTABLE STRICT PARALLEL SAFE
+"""
+
+CREATE_CARD_NAME_INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS scryfall_cards_name_key_idx ON scryfall_cards (card_name_key(card_name))",
+    "CREATE INDEX IF NOT EXISTS scryfall_cards_front_face_key_idx ON scryfall_cards (card_name_key(split_part(card_name, ' // ', 1)))",
+    "CREATE INDEX IF NOT EXISTS scryfall_cards_back_face_key_idx ON scryfall_cards (card_name_key(split_part(card_name, ' // ', 2)))",
+]
+
+def create_card_name_index(conn):
+    cur = conn.cursor()
+    cur.execute(CREATE_CARD_NAME_KEY_SQL)
+    for sql in CREATE_CARD_NAME_INDEXES_SQL:
+        cur.execute(sql)
+    for index_name in ("scryfall_cards_name_key_idx", "scryfall_cards_front_face_key_idx", "scryfall_cards_back_face_key_idx"):
+        cur.execute(f"REINDEX INDEX {index_name}")
+    cur.execute("ANALYZE scryfall_cards")
+    conn.commit()
+    cur.close()
+
+if __name__ == "__main__":
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+    create_card_name_index(conn)
+    print("Created card_name_key() and its scryfall_cards indexes")
+    conn.close()
@@ -0,0 +1,276 @@
+from dotenv import load_dotenv
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+from pathlib import Path
+import psycopg2
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from api_scripts.card_names import normalize_card_name
+from api_scripts.read_responses import MAX_PAGE_SIZE
+from generate_synthetic_dataset import load_dataset
+
+# Plans every query the API and CardsContext send and exits with 1 if any of them sequentially scans a large table
+# Queries are pulled out of the source (cur.execute/fetch/fetchrow calls with a literal or module-level constant query,
+# and every *_SQL constant of the QUERY_MODULES, whose queries run from other files). Each one is explained the way
+# production plans it: default planner settings, with QUERY_PARAMS bound to the most played commander and card and
+# full pages, so the database needs production-sized tables. As a CI step, on an empty database:
+#   python dba_scripts/explain_check.py --synthetic 1 --strict
+# or against a loaded one, after migrate.py:
+#   python dba_scripts/explain_check.py [--verbose] [--strict]
+
+SOURCE_FILES = ["app.py", "asgi_app.py", "ml_scripts/card_fetcher.py", "ml_scripts/card_catalog.py", "api_scripts/*.py"]
+LARGE_TABLES = {"edhrec_cards", "scryfall_cards"}
+EXECUTE_METHODS = {"execute", "fetch", "fetchrow"}
+# Modules of shared query constants, each constant is reported under its own name instead of a function
+QUERY_MODULES = {"api_scripts/read_queries.py"}
+
+# Queries whose result is (an aggregate of) the whole table, no index can make them cheaper
+FULL_SCAN_QUERIES = {
+    # In-memory copies loaded at startup and on dataset changes
+    ("api_scripts/suggestion_index.py", "load"),
+    ("api_scripts/card_lookup.py", "fetch_rows"),
+    ("api_scripts/autocomplete_index.py", "load"),
+    ("api_scripts/commander_list.py", "load"),
+    ("ml_scripts/card_catalog.py", "load"),
+    # MODEL_PRELOAD ranks every commander by its most played card
+    ("app.py", "get_popular_commander_names"),
+    # /dbinfo before dataset_stats exists
+    ("api_scripts/read_queries.py", "DB_INFO_FALLBACK_SQL"),
+    # Training data, every relation above min_num_decks
+    ("ml_scripts/card_fetcher.py", "get_cmd_pct_relations"),
+}
+
+# Bound parameters of each query with any, as names of sample_values() entries: a tuple for %s placeholders, a dict for
+# %(name)s ones. A parameterized query missing here can't be planned and is reported as an error
+QUERY_PARAMS = {
+    ("app.py", "get_popular_commander_names"): ("preload_count",),
+    ("app.py", "iter_suggestions_for_commanders"): ("commander_names",),
+    ("app.py", "fetch_related_cards"): ("commander_card_name",),
+    ("app.py", "analyze"): ("commander_name",),
+    ("api_scripts/card_lookup.py", "fetch_card"): {"key": "card_key"},
+    ("api_scripts/read_queries.py", "COMMANDER_INFO_SQL"): ("commander_name",),
+    ("api_scripts/read_queries.py", "SIMILAR_COMMANDERS_SQL"): ("commander_id",),
+    ("api_scripts/read_queries.py", "SIMILAR_COMMANDERS_FALLBACK_SQL"): ("commander_card_count", "commander_name"),
+    ("api_scripts/read_queries.py", "SUGGESTION_PAGE_SQL"): ("commander_name", "first_rank", "page_size"),
+    ("api_scripts/read_queries.py", "SUGGESTION_PAGE_FALLBACK_SQL"): ("commander_name", "page_size", "offset"),
+    ("api_scripts/read_queries.py", "REDUCTIONS_SQL"): ("commander_name", "page_size"),
+    ("api_scripts/read_queries.py", "REDUCTIONS_FALLBACK_SQL"): ("commander_name", "page_size"),
+    ("ml_scripts/card_fetcher.py", "get_cmd_pct_relations"): ("min_num_decks",),
+    ("ml_scripts/card_fetcher.py", "get_related_cards_from_commander_name"): ("commander_card_name",),
+    ("ml_scripts/card_fetcher.py", "get_commander_synergies_by_id"): ("commander_id",),
+    ("ml_scripts/card_fetcher.py", "get_cmd_pct_relations_by_id"): ("commander_card_id",),
+    ("ml_scripts/card_fetcher.py", "get_commander_frequencies_by_id"): ("commander_id",),
+    ("ml_scripts/card_fetcher.py", "get_card_synergies_by_id"): ("card_id",),
+    ("ml_scripts/card_fetcher.py", "get_commander_sc_id_by_id"): ("commander_id",),
+}
+
+def resolve_string(node, constants:dict):
+    # Value of a string expression built from literals and module-level string constants, None if it isn't one
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return constants.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = resolve_string(node.left, constants), resolve_string(node.right, constants)
+        return left + right if left is not None and right is not None else None
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                if value.conversion != -1 or value.format_spec is not None:
+                    return None
+                value = value.value
+            part = resolve_string(value, constants)
+            if part is None:
+                return None
+            parts.append(part)
+        return "".join(parts)
+    return None
+
+def extract_queries(path:Path, label:str) -> tuple:
+    # Returns ([(label, function, line, sql)], [(label, function, line)] for calls whose query couldn't be resolved)
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    constants = dict()
+    queries = []
+    skipped = []
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = resolve_string(node.value, constants)
+            if value is not None:
+                constants[node.targets[0].id] = value
+                if label in QUERY_MODULES and node.targets[0].id.endswith("_SQL"):
+                    queries.append((label, node.targets[0].id, node.lineno, value))
+
+    def visit(node, function:str):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                visit(child, child.name)
+                continue
+            if isinstance(child, ast.Call) and child.args:
+                func = child.func
+                name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+                if name in EXECUTE_METHODS:
+                    sql = resolve_string(child.args[0], constants)
+                    if sql is not None and re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+                        queries.append((label, function, child.lineno, sql))
+                    elif sql is None and not isinstance(child.args[0], ast.Name):
+                        # A bare name is a helper passing its own query argument through
+                        skipped.append((label, function, child.lineno))
+            visit(child, function)
+
+    visit(tree, "<module>")
+    return queries, skipped
+
+def seq_scans(plan:dict) -> list:
+    scans = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        scans.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scans.extend(seq_scans(child))
+    return scans
+
+def sample_values(conn) -> dict:
+    # The most played commander and card have the most rows behind every lookup, so they get the plans most likely to
+    # fall back to a sequential scan. Raises ValueError on an empty database
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT cmd.id, cmd.name, cmd.card_name, cmd.card_id, COUNT(*)
+        FROM edhrec_commanders cmd
+        JOIN edhrec_cards c ON c.commander_id = cmd.id
+        GROUP BY cmd.id, cmd.name, cmd.card_name, cmd.card_id
+        ORDER BY COUNT(*) DESC, cmd.id ASC
+        LIMIT 1
+    """)
+    commander = cur.fetchone()
+    cur.execute("""
+        SELECT sc.id, sc.card_name
+        FROM edhrec_cards c
+        JOIN scryfall_cards sc ON c.card_id = sc.id
+        GROUP BY sc.id, sc.card_name
+        ORDER BY COUNT(*) DESC, sc.id ASC
+        LIMIT 1
+    """)
+    card = cur.fetchone()
+    cur.close()
+    conn.rollback()
+    if commander is None or card is None:
+        raise ValueError("No edhrec_cards rows to take sample parameters from, load a dataset first (ex. --synthetic 1)")
+
+    with open(BASE_DIR / "ml_scripts" / "config.json", "r") as f:
+        min_num_decks = json.load(f)["min_num_decks"]
+    commander_id, commander_name, commander_card_name, commander_card_id, commander_card_count = commander
+    return {
+        "commander_id": commander_id,
+        "commander_name": commander_name,
+        "commander_names": [commander_name],
+        "commander_card_name": commander_card_name,
+        "commander_card_id": commander_card_id,
+        "commander_card_count": commander_card_count,
+        "card_id": card[0],
+        "card_key": normalize_card_name(card[1]),
+        "first_rank": 1,
+        "page_size": MAX_PAGE_SIZE,
+        "offset": 0,
+        "min_num_decks": min_num_decks,
+        "preload_count": 64,
+    }
+
+def bind_params(names, samples:dict):
+    if isinstance(names, dict):
+        return {param: samples[name] for param, name in names.items()}
+    return tuple(samples[name] for name in names)
+
+def explain(conn, sql:str, params=None) -> dict:
+    # Bound client-side like the API's psycopg2 queries, so Postgres makes the custom plan it makes for a real request
+    cur = conn.cursor()
+    try:
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql.strip().rstrip(";"), params)
+        return cur.fetchone()[0][0]["Plan"]
+    finally:
+        cur.close()
+        conn.rollback()
+
+def plan_summary(plan:dict, depth:int=0) -> list:
+    relation = f" on {plan['Relation Name']}" if "Relation Name" in plan else ""
+    index = f" using {plan['Index Name']}" if "Index Name" in plan else ""
+    lines = [f"{'  ' * depth}{plan['Node Type']}{relation}{index}"]
+    for child in plan.get("Plans", []):
+        lines.extend(plan_summary(child, depth + 1))
+    return lines
+
+def find_queries() -> tuple:
+    queries = []
+    skipped = []
+    for pattern in SOURCE_FILES:
+        for path in sorted(BASE_DIR.glob(pattern)):
+            file_queries, file_skipped = extract_queries(path, path.relative_to(BASE_DIR).as_posix())
+            queries.extend(file_queries)
+            skipped.extend(file_skipped)
+    return queries, skipped
+
+def check_query_plans(conn, verbose:bool=False) -> tuple:
+    # Prints a line per problem (and per plan if verbose), returns the (failures, errors, skipped) query names
+    queries, skipped = find_queries()
+    samples = sample_values(conn)
+
+    failures = []
+    errors = []
+    for label, function, line, sql in queries:
+        name = f"{label}:{line} {function}"
+        param_names = QUERY_PARAMS.get((label, function))
+        if param_names is None and re.search(r"%\(\w+\)s|%s", sql):
+            errors.append(name)
+            print(f"ERROR {name}: no QUERY_PARAMS entry for its parameters")
+            continue
+        try:
+            plan = explain(conn, sql, bind_params(param_names, samples) if param_names is not None else None)
+        except psycopg2.Error as e:
+            errors.append(name)
+            print(f"ERROR {name}: {str(e).strip().splitlines()[0]}")
+            continue
+        scans = seq_scans(plan)
+        allowed = (label, function) in FULL_SCAN_QUERIES
+        if scans and not allowed:
+            failures.append(name)
+            print(f"FAIL  {name}: Seq Scan on {', '.join(sorted(set(scans)))}")
+        elif verbose:
+            print(f"OK    {name}{' (full scan allowed)' if scans else ''}")
+        if verbose or (scans and not allowed):
+            print("\n".join("        " + node for node in plan_summary(plan)))
+
+    for label, function, line in skipped:
+        print(f"SKIP  {label}:{line} {function}: query isn't a literal or module-level constant")
+    print(f"{len(queries)} queries planned, {len(failures)} with sequential scans, {len(errors)} errors, {len(skipped)} skipped")
+    return failures, errors, [f"{label}:{line} {function}" for label, function, line in skipped]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail on sequential scans of the large tables in the API's query plans")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    parser.add_argument("--strict", action="store_true", help="Also fail on queries that can't be planned or extracted")
+    parser.add_argument("--synthetic", type=float, metavar="SCALE", help="Load the synthetic dataset at this scale first, the database must be empty")
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+    try:
+        if args.synthetic is not None:
+            # Also runs the migrations and the derived table builds
+            load_dataset(conn, args.synthetic, seed=1, replace=False)
+        failures, errors, skipped = check_query_plans(conn, args.verbose)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    finally:
+        conn.close()
+
+    if failures or (args.strict and (errors or skipped)):
+        sys.exit(1)
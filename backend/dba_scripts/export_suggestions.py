@@ -0,0 +1,54 @@
+from dotenv import load_dotenv
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+import psycopg2
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+from api_scripts.suggestion_export import EXPORT_FORMATS, DEFAULT_ITERSIZE, parse_since, open_export_cursor, close_export_cursor, export_chunks, gzip_chunks
+
+# Writes every commander/card row to a file (or stdout) straight from Postgres, same output as /export/suggestions
+#   python dba_scripts/export_suggestions.py --format csv --gzip -o suggestions.csv.gz
+#   python dba_scripts/export_suggestions.py --since 20230801120000000000 -o changed.ndjson
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every commander suggestion as NDJSON or CSV")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--since", help="Only rows changed after this dataset version (X-Dataset-Version)")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--itersize", type=int, default=DEFAULT_ITERSIZE)
+    parser.add_argument("-o", "--output", help="Output file, stdout if not set")
+    args = parser.parse_args()
+
+    since = None
+    if args.since is not None:
+        since = parse_since(args.since)
+        if since is None:
+            parser.error(f"Invalid dataset version: {args.since}")
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+
+    start_time = time.time()
+    cur = open_export_cursor(conn, since, itersize=args.itersize)
+    chunks = export_chunks(cur, args.format, batch_size=args.itersize)
+    if args.gzip:
+        chunks = gzip_chunks(chunks)
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+        close_export_cursor(conn, cur)
+    conn.close()
+    print(f"Exported {written} bytes in {time.time() - start_time:.2f} seconds", file=sys.stderr)
@@ -0,0 +1,516 @@
+from dotenv import load_dotenv
+import io
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+from itertools import accumulate
+from pathlib import Path
+import psycopg2
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from api_scripts.card_names import ACCENT_TRANSLATION
+from migrate import apply_migrations
+from build_commander_similarity import build_commander_similarity
+from refresh_dataset_stats import refresh_dataset_stats
+from update_commander_ranks import update_commander_ranks
+
+# Fills an empty database with made-up data shaped like ours, for load tests and the ml_scripts pipeline
+# Scale 1 is about the production size (~30k scryfall_cards, ~1,900 edhrec_commanders, ~500k edhrec_cards),
+# the same --seed and --scale always give the same rows. Commanders and cards are drawn with the same popularity skew as
+# EDHREC (a few staples in most decks, a long tail of theme cards with high synergy) and cards only go to commanders
+# whose color identity covers theirs. Loads with COPY, then runs the migrations and the derived table builds, ex:
+#   python dba_scripts/generate_synthetic_dataset.py --scale 5
+#   python dba_scripts/generate_synthetic_dataset.py --scale 20 --replace
+#   python dba_scripts/generate_synthetic_dataset.py --scale 1 --out-dir synthetic/   COPY text files, no database
+# Refuses to touch tables that already have rows unless --replace is passed (which truncates them).
+
+SCRYFALL_CARDS_PER_SCALE = 30000
+COMMANDERS_PER_SCALE = 1900
+EDHREC_CARDS_PER_SCALE = 500000
+COPY_CHUNK_ROWS = 50000
+
+# Same columns as production (see README.md) for databases that don't have the tables yet
+CREATE_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS scryfall_cards (
+        id SERIAL PRIMARY KEY,
+        scryfall_id VARCHAR(36),
+        card_name VARCHAR(141),
+        mana_cost VARCHAR(46),
+        cmc SMALLINT,
+        type_line VARCHAR(90),
+        oracle_text TEXT,
+        power VARCHAR(5),
+        toughness VARCHAR(5),
+        colors VARCHAR(5),
+        color_identity VARCHAR(5),
+        commander_legal BOOLEAN DEFAULT true,
+        set_code VARCHAR(5),
+        rarity VARCHAR(8),
+        prices JSON,
+        edhrec_rank INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS edhrec_commanders (
+        id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        scryfall_id VARCHAR(255),
+        card_name VARCHAR(255),
+        card_id INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS edhrec_cards (
+        id SERIAL PRIMARY KEY,
+        commander_id INTEGER,
+        card_name TEXT,
+        percentage NUMERIC,
+        num_decks INTEGER,
+        synergy_score NUMERIC,
+        card_id INTEGER,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        CONSTRAINT unique_commander_card UNIQUE (commander_id, card_name)
+    )
+    """,
+]
+
+SCRYFALL_COLUMNS = ["id", "scryfall_id", "card_name", "mana_cost", "cmc", "type_line", "oracle_text", "power", "toughness", "colors", "color_identity", "commander_legal", "set_code", "rarity", "prices", "edhrec_rank"]
+COMMANDER_COLUMNS = ["id", "name", "scryfall_id", "card_name", "card_id"]
+EDHREC_COLUMNS = ["id", "commander_id", "card_name", "percentage", "num_decks", "synergy_score", "card_id"]
+
+COLORS = "WUBRG"
+COLOR_WORDS = {"W": "white", "U": "blue", "B": "black", "R": "red", "G": "green"}
+# Odds of a color identity having 0..5 colors
+CARD_COLOR_COUNTS = [0.12, 0.55, 0.23, 0.07, 0.01, 0.02]
+COMMANDER_COLOR_COUNTS = [0.03, 0.30, 0.35, 0.25, 0.03, 0.04]
+
+CARD_TYPES = [
+    ("Creature", 0.40), ("Instant", 0.11), ("Sorcery", 0.11), ("Artifact", 0.09), ("Enchantment", 0.10),
+    ("Land", 0.08), ("Artifact Creature", 0.03), ("Legendary Creature", 0.03), ("Planeswalker", 0.02),
+    ("Legendary Artifact", 0.01), ("Legendary Enchantment", 0.01), ("Kindred Instant", 0.01),
+]
+CREATURE_TYPES = ["Human", "Elf", "Goblin", "Zombie", "Wizard", "Soldier", "Dragon", "Angel", "Vampire", "Merfolk", "Beast", "Spirit", "Knight", "Cleric", "Rogue", "Warrior", "Elemental", "Sliver", "Faerie", "Dinosaur", "Golem", "Horror", "Cat", "Bird"]
+ARTIFACT_TYPES = ["Equipment", "Vehicle", "Treasure", "Clue"]
+ENCHANTMENT_TYPES = ["Aura", "Saga", "Shrine"]
+LAND_TYPES = ["Plains", "Island", "Swamp", "Mountain", "Forest"]
+SET_CODES = ["alp", "brs", "cmx", "dkm", "eld", "frn", "grv", "hml", "ikr", "jud", "khm", "lrw", "mbs", "nph", "ori", "plc", "ons", "rix", "stx", "tsp", "ulg", "vow", "wwk", "xln", "zen", "c13", "c16", "c20", "cmr", "clb"]
+RARITIES = [("common", 0.40), ("uncommon", 0.30), ("rare", 0.22), ("mythic", 0.08)]
+CMC_WEIGHTS = [1, 12, 20, 22, 18, 12, 8, 4, 3]
+
+ADJECTIVES = ["Ancient", "Blazing", "Cursed", "Dread", "Eternal", "Feral", "Gilded", "Hollow", "Iron", "Jagged", "Keen", "Lurking", "Molten", "Nimble", "Obsidian", "Primal", "Quiet", "Radiant", "Savage", "Twisted", "Unyielding", "Vengeful", "Withered", "Wild", "Arcane", "Bitter", "Crimson", "Drowned", "Ember", "Frozen", "Grim", "Hallowed", "Infernal", "Lost", "Mystic", "Noble", "Pale", "Restless", "Shattered", "Silent", "Sunlit", "Thorned", "Verdant", "Wandering", "Séance", "Jötun"]
+NOUNS = ["Angel", "Bloom", "Charm", "Drake", "Echo", "Familiar", "Guardian", "Herald", "Idol", "Juggernaut", "Knight", "Lotus", "Mentor", "Nomad", "Oracle", "Pact", "Ritual", "Sentinel", "Totem", "Vanguard", "Warden", "Wurm", "Bargain", "Cohort", "Decree", "Elixir", "Fury", "Gambit", "Hunger", "Insight", "Lantern", "Mirror", "Oath", "Prophet", "Reckoning", "Shaman", "Tithe", "Visage", "Whisper", "Zealot", "Ascendant", "Brute", "Colossus", "Dervish"]
+PLACES = ["the Wastes", "the Deep", "Ashmoor", "Blackhollow", "Cinderfall", "Dawnspire", "Emberveil", "Frosthelm", "Gloomwood", "Highmarch", "Ironpeak", "Lórien Vale", "Mistmere", "Nightfen", "Old Kessig", "Ravenholt", "Saltmarsh", "Thornwall", "Umbral Reach", "Wyrmcrag"]
+FIRST_NAMES = ["Aldric", "Brenna", "Caelum", "Dagna", "Eirik", "Fenna", "Garruk", "Hestia", "Ilsa", "Jorvan", "Kaelis", "Lyra", "Mordecai", "Nissa", "Orrin", "Pyra", "Quill", "Rhea", "Sorin", "Talia", "Ulric", "Vesna", "Wren", "Xander", "Ysolde", "Zara", "Ardyn", "Bastian", "Corra", "Drusilla", "Elowen", "Fiora", "Gideon", "Halvar", "Isolde", "Jareth", "Kestrel", "Lucan", "Márton", "Nyx", "Ophira", "Percival", "Rowan", "Seraphine", "Thorne", "Ulla", "Valka", "Wystan", "Yara", "Zephyr"]
+LAST_NAMES = ["Ashbourne", "Blackthorn", "Crowe", "Dunmore", "Everhart", "Fallowmere", "Graves", "Holloway", "Ironside", "Kessler", "Lockridge", "Marrow", "Nightingale", "Oakheart", "Pyke", "Ravensworth", "Stormcaller", "Thorncastle", "Vane", "Wolfe"]
+TITLES = ["the Unbroken", "Warlord of the Wastes", "Voice of the Deep", "Keeper of Secrets", "Tyrant of Ashmoor", "Herald of Dawn", "the Forsaken", "Grand Inquisitor", "Wandering Sage", "First of the Hunt", "Dreadlord", "Storm Seer", "High Priestess", "Blade of the Crown", "Devourer of Worlds", "the Undying", "Mind Thief", "Scourge of Thornwall", "Archmage Ascendant", "Patron of Thieves", "Queen of Ash", "Lord of Tides", "the Reanimator", "Heart of the Forest", "Iron Chancellor"]
+
+KEYWORDS = ["Flying", "Trample", "Haste", "Vigilance", "Deathtouch", "Lifelink", "Reach", "Menace", "First strike", "Double strike", "Hexproof", "Indestructible", "Flash", "Defender"]
+# {name}, {n}, {color}, {type} and {mana} are filled in per card, the phrasings are the ones card_parser.py looks for
+CREATURE_TEMPLATES = [
+    "When {name} enters the battlefield, draw a card.",
+    "Whenever {name} attacks, create a 1/1 {color} {type} creature token.",
+    "Whenever another creature you control dies, each opponent loses {n} life and you gain {n} life.",
+    "{name} gets +1/+1 for each artifact you control.",
+    "Whenever {name} deals combat damage to a player, draw that many cards.",
+    "At the beginning of your upkeep, put a +1/+1 counter on {name}.",
+    "{T}: Add {mana}.",
+    "Other {type} creatures you control get +1/+1.",
+    "When {name} dies, return target creature card from your graveyard to your hand.",
+    "Whenever you cast a noncreature spell, {name} deals {n} damage to any target.",
+    "Sacrifice a creature: Scry {n}.",
+    "Creature spells you cast cost {{1}} less to cast.",
+    "Whenever a creature enters the battlefield under your control, proliferate.",
+]
+SPELL_TEMPLATES = [
+    "Draw {n} cards.",
+    "Destroy target creature. Its controller loses {n} life.",
+    "Counter target spell.",
+    "Target creature gets +{n}/+{n} until end of turn.",
+    "{name} deals {n} damage to any target.",
+    "Destroy all creatures. They can't be regenerated.",
+    "Return target creature to its owner's hand.",
+    "Search your library for a basic land card, put it onto the battlefield tapped, then shuffle.",
+    "Create {n} 1/1 {color} {type} creature tokens.",
+    "Exile target creature. Return it to the battlefield under its owner's control at the beginning of the next end step.",
+    "Return target creature card from your graveyard to the battlefield.",
+    "Put {n} +1/+1 counters on target creature you control.",
+    "Gain control of target artifact until end of turn. Untap it. It gains haste until end of turn.",
+]
+PERMANENT_TEMPLATES = [
+    "{T}: Add {mana}.",
+    "Equipped creature gets +{n}/+{n}.\nEquip {{{n}}}",
+    "Enchant creature\nEnchanted creature gets +{n}/+0 and has flying.",
+    "At the beginning of your end step, create a Treasure token.",
+    "Whenever a creature you control dies, draw a card.",
+    "Spells you cast cost {{1}} less to cast.",
+    "Whenever you cast an artifact spell, create a 1/1 colorless Thopter artifact creature token with flying.",
+    "{{2}}, {T}: Draw a card, then discard a card.",
+    "Creatures you control have hexproof.",
+]
+LAND_TEMPLATES = [
+    "{T}: Add {{C}}.",
+    "{name} enters the battlefield tapped.\n{T}: Add {mana}.",
+    "{T}: Add {mana}. {name} deals 1 damage to you.",
+    "{T}, Pay 1 life, Sacrifice {name}: Search your library for a land card, put it onto the battlefield, then shuffle.",
+]
+PLANESWALKER_TEMPLATES = [
+    "+1: Draw a card.\n-{n}: Destroy target creature.",
+    "+1: Create a 2/2 {color} {type} creature token.\n-{n}: Return target creature card from your graveyard to the battlefield.",
+]
+
+def weighted_choice(rng:random.Random, pairs:list):
+    return rng.choices([value for value, _ in pairs], weights=[weight for _, weight in pairs])[0]
+
+def color_mask(colors:str) -> int:
+    return sum(1 << COLORS.index(color) for color in colors)
+
+def random_identity(rng:random.Random, color_counts:list) -> str:
+    count = rng.choices(range(len(color_counts)), weights=color_counts)[0]
+    chosen = set(rng.sample(COLORS, count))
+    return "".join(color for color in COLORS if color in chosen)
+
+def random_card_name(rng:random.Random, legendary:bool) -> str:
+    if legendary:
+        pattern = rng.random()
+        first = rng.choice(FIRST_NAMES)
+        if pattern < 0.5:
+            return f"{first}, {rng.choice(TITLES)}"
+        if pattern < 0.8:
+            return f"{first} {rng.choice(LAST_NAMES)}, {rng.choice(TITLES)}"
+        return f"{first} of {rng.choice(PLACES)}"
+    pattern = rng.random()
+    if pattern < 0.35:
+        return f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+    if pattern < 0.55:
+        return f"{rng.choice(NOUNS)} of {rng.choice(PLACES)}"
+    if pattern < 0.75:
+        return f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} of {rng.choice(PLACES)}"
+    if pattern < 0.9:
+        return f"{rng.choice(FIRST_NAMES)}'s {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+
+def unique_card_name(rng:random.Random, legendary:bool, used:set) -> str:
+    # Split cards ("Fire // Ice") show up now and then, past the name space the numbers keep the names unique
+    for attempt in range(20):
+        if not legendary and rng.random() < 0.02:
+            name = f"{random_card_name(rng, False)} // {random_card_name(rng, False)}"
+        else:
+            name = random_card_name(rng, legendary)
+        if attempt >= 10:
+            name = f"{name} {rng.randint(2, 99999)}"
+        if name not in used:
+            used.add(name)
+            return name
+    raise ValueError("Ran out of card names")
+
+def mana_cost(rng:random.Random, cmc:int, colors:str) -> str:
+    if not colors or cmc == 0:
+        return f"{{{cmc}}}"
+    pips = [rng.choice(colors) for _ in range(max(1, min(cmc, len(colors) + rng.randint(0, 2))))]
+    pips = [color for color in COLORS for pip in pips if pip == color]
+    generic = cmc - len(pips)
+    return (f"{{{generic}}}" if generic > 0 else "") + "".join(f"{{{pip}}}" for pip in pips)
+
+def power_toughness(rng:random.Random, cmc:int) -> tuple:
+    roll = rng.random()
+    if roll < 0.03:
+        return "*", "*"
+    if roll < 0.04:
+        return "1+*", "1+*"
+    power = max(0, min(12, round(rng.gauss(cmc, 1.2))))
+    toughness = max(1, min(12, round(rng.gauss(cmc, 1.2))))
+    return str(power), str(toughness)
+
+def oracle_text(rng:random.Random, name:str, card_type:str, identity:str) -> str:
+    if "Land" in card_type:
+        templates, lines = LAND_TEMPLATES, 1
+    elif "Planeswalker" in card_type:
+        templates, lines = PLANESWALKER_TEMPLATES, 1
+    elif "Creature" in card_type:
+        templates, lines = CREATURE_TEMPLATES, rng.choice([0, 1, 1, 2])
+    elif card_type.endswith(("Instant", "Sorcery")):
+        templates, lines = SPELL_TEMPLATES, rng.choice([1, 1, 2])
+    else:
+        templates, lines = PERMANENT_TEMPLATES, rng.choice([1, 2])
+    color = rng.choice(identity) if identity else None
+    text = []
+    if "Creature" in card_type and rng.random() < 0.45:
+        text.append(", ".join(rng.sample(KEYWORDS, rng.choice([1, 1, 2]))))
+    for template in rng.sample(templates, min(lines, len(templates))):
+        text.append(template.format(
+            name=name,
+            n=rng.randint(1, 4),
+            color=COLOR_WORDS[color] if color else "colorless",
+            type=rng.choice(CREATURE_TYPES),
+            mana=f"{{{color}}}" if color else "{C}",
+            T="{T}",
+        ))
+    return "\n".join(text) or None
+
+def random_prices(rng:random.Random, rarity:str) -> str:
+    base = {"common": 0.1, "uncommon": 0.25, "rare": 1.5, "mythic": 4.0}[rarity]
+    usd = base * rng.lognormvariate(0, 1.1)
+    if rng.random() < 0.05:
+        return json.dumps({"usd": None, "usd_foil": None, "usd_etched": None, "eur": None, "eur_foil": None, "tix": None})
+    return json.dumps({
+        "usd": f"{usd:.2f}",
+        "usd_foil": f"{usd * rng.uniform(1.2, 4):.2f}",
+        "usd_etched": None,
+        "eur": f"{usd * rng.uniform(0.7, 1.1):.2f}",
+        "eur_foil": f"{usd * rng.uniform(1.1, 3.5):.2f}",
+        "tix": f"{usd * rng.uniform(0.05, 0.3):.2f}",
+    })
+
+def random_card(rng:random.Random, card_id:int, name:str, card_type:str, identity:str, rarity:str) -> dict:
+    if card_type == "Land":
+        colors = ""
+        cmc = 0
+        cost = None
+        identity = identity[:2]
+        basic_types = [land for land, color in zip(LAND_TYPES, COLORS) if color in identity]
+        type_line = "Land" + (" — " + " ".join(basic_types) if basic_types and rng.random() < 0.2 else "")
+    else:
+        colors = identity if "Artifact" not in card_type or rng.random() < 0.2 else ""
+        cmc = rng.choices(range(len(CMC_WEIGHTS)), weights=CMC_WEIGHTS)[0]
+        if "Creature" in card_type or "Planeswalker" in card_type:
+            cmc = max(cmc, 1)
+        cost = mana_cost(rng, cmc, colors)
+        if "Creature" in card_type:
+            type_line = f"{card_type} — {' '.join(rng.sample(CREATURE_TYPES, rng.choice([1, 1, 2])))}"
+        elif card_type.endswith("Artifact") and rng.random() < 0.4:
+            type_line = f"{card_type} — {rng.choice(ARTIFACT_TYPES)}"
+        elif card_type.endswith("Enchantment") and rng.random() < 0.4:
+            type_line = f"{card_type} — {rng.choice(ENCHANTMENT_TYPES)}"
+        elif card_type == "Kindred Instant":
+            type_line = f"{card_type} — {rng.choice(CREATURE_TYPES)}"
+        else:
+            type_line = card_type
+    power, toughness = power_toughness(rng, cmc) if "Creature" in card_type else (None, None)
+    return {
+        "id": card_id,
+        "scryfall_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "card_name": name,
+        "mana_cost": cost,
+        "cmc": cmc,
+        "type_line": type_line,
+        "oracle_text": oracle_text(rng, name, card_type, identity),
+        "power": power,
+        "toughness": toughness,
+        "colors": colors,
+        "color_identity": identity,
+        "commander_legal": True,
+        "set_code": rng.choice(SET_CODES),
+        "rarity": rarity,
+        "prices": random_prices(rng, rarity),
+        "edhrec_rank": None,
+    }
+
+def generate_cards(rng:random.Random, card_count:int, commander_count:int) -> tuple:
+    # Returns (scryfall_cards rows, the card dicts the commanders are made from)
+    used_names = set()
+    cards = []
+    for card_id in range(1, card_count + 1):
+        if card_id <= commander_count:
+            name = unique_card_name(rng, True, used_names)
+            card = random_card(rng, card_id, name, "Legendary Creature", random_identity(rng, COMMANDER_COLOR_COUNTS), weighted_choice(rng, [("rare", 0.8), ("mythic", 0.2)]))
+        else:
+            card_type = weighted_choice(rng, CARD_TYPES)
+            name = unique_card_name(rng, card_type.startswith("Legendary"), used_names)
+            card = random_card(rng, card_id, name, card_type, random_identity(rng, CARD_COLOR_COUNTS), weighted_choice(rng, RARITIES))
+        cards.append(card)
+
+    # ~8% of the cards never got an EDHREC rank (or aren't legal), the rest are ranked in a random order
+    ranked = [card for card in cards if card["id"] <= commander_count or rng.random() < 0.92]
+    rng.shuffle(ranked)
+    for rank, card in enumerate(ranked, start=1):
+        card["edhrec_rank"] = rank
+    for card in cards:
+        if card["edhrec_rank"] is None and rng.random() < 0.25:
+            card["commander_legal"] = False
+    return cards, cards[:commander_count]
+
+def commander_slug(card_name:str) -> str:
+    # EDHREC's page name, ex. "Atraxa, Praetors' Voice" => "atraxa-praetors-voice"
+    slug = card_name.lower().translate(ACCENT_TRANSLATION)
+    slug = "".join(char for char in slug if char.isalnum() or char in " -")
+    return "-".join(slug.split())
+
+def base_percentage(rank:int) -> float:
+    # Share of all the decks that could play a card that do, ~60% for the top staple down to ~3% for the long tail
+    return 3 + 57 / rank ** 0.5
+
+def generate_edhrec_cards(rng:random.Random, cards:list, commanders:list, pair_count:int):
+    # Yields (edhrec_cards row) per commander/card pair. Each commander gets ~70% of its cards by global popularity
+    # (staples, synergy around 0) and ~30% uniformly from the rest of its colors (theme cards, high synergy)
+    pools = dict()
+    playable = sorted((card for card in cards if card["edhrec_rank"] is not None and card["commander_legal"]), key=lambda card: card["edhrec_rank"])
+    average_cards = pair_count / len(commanders)
+    row_id = 0
+
+    commander_order = list(range(len(commanders)))
+    rng.shuffle(commander_order)
+    for popularity, index in enumerate(commander_order):
+        commander = commanders[index]
+        mask = color_mask(commander["color_identity"])
+        pool = pools.get(mask)
+        if pool is None:
+            pool_cards = [card for card in playable if color_mask(card["color_identity"]) & ~mask == 0]
+            pool = pools[mask] = (pool_cards, list(accumulate(1 / card["edhrec_rank"] ** 0.9 for card in pool_cards)))
+        pool_cards, cumulative = pool
+        commander["num_decks"] = int(25000 / (popularity + 1) ** 0.85) + rng.randint(20, 200)
+
+        # Divided by the lognormal's mean so the total lands on pair_count
+        count = min(len(pool_cards) - 1, max(40, round(average_cards * rng.lognormvariate(0, 0.35) / math.exp(0.35 ** 2 / 2))))
+        staple_count = round(count * 0.7)
+        chosen = dict()
+        for card in rng.choices(pool_cards, cum_weights=cumulative, k=staple_count * 2):
+            if len(chosen) >= staple_count:
+                break
+            if card["id"] != commander["card_id"]:
+                chosen.setdefault(card["card_name"], (card, False))
+        while len(chosen) < count:
+            card = rng.choice(pool_cards)
+            if card["id"] != commander["card_id"] and card["card_name"] not in chosen:
+                chosen[card["card_name"]] = (card, True)
+
+        for card, theme in chosen.values():
+            base = base_percentage(card["edhrec_rank"])
+            if theme:
+                percentage = base + rng.gammavariate(2, 9)
+            else:
+                percentage = base * rng.lognormvariate(0, 0.4)
+            percentage = max(1, min(99, round(percentage)))
+            synergy_score = max(-60, min(90, round(percentage - base + rng.gauss(0, 2))))
+            num_decks = max(1, round(percentage / 100 * commander["num_decks"]))
+            row_id += 1
+            yield (row_id, commander["id"], card["card_name"], percentage, num_decks, synergy_score, card["id"])
+
+def copy_value(value) -> str:
+    # COPY text format
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def copy_chunks(rows, chunk_rows:int=COPY_CHUNK_ROWS):
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(copy_value(value) for value in row))
+        buffer.write("\n")
+        count += 1
+        if count >= chunk_rows:
+            yield buffer.getvalue()
+            buffer = io.StringIO()
+            count = 0
+    if count:
+        yield buffer.getvalue()
+
+def copy_rows(cur, table:str, columns:list, rows) -> int:
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    total = 0
+    for chunk in copy_chunks(rows):
+        cur.copy_expert(copy_sql, io.StringIO(chunk))
+        total += chunk.count("\n")
+    return total
+
+def write_rows(path:Path, rows) -> int:
+    total = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for chunk in copy_chunks(rows):
+            f.write(chunk)
+            total += chunk.count("\n")
+    return total
+
+def generate_dataset(scale:float, seed:int) -> tuple:
+    # Returns (scryfall_cards rows, edhrec_commanders rows, edhrec_cards row generator)
+    rng = random.Random(seed)
+    card_count = max(100, round(SCRYFALL_CARDS_PER_SCALE * scale))
+    commander_count = max(5, round(COMMANDERS_PER_SCALE * scale))
+    pair_count = max(500, round(EDHREC_CARDS_PER_SCALE * scale))
+
+    cards, commander_cards = generate_cards(rng, card_count, commander_count)
+    commanders = []
+    used_slugs = set()
+    for card in commander_cards:
+        slug = commander_slug(card["card_name"])
+        if slug in used_slugs:
+            continue
+        used_slugs.add(slug)
+        commanders.append({"id": len(commanders) + 1, "name": slug, "scryfall_id": card["scryfall_id"], "card_name": card["card_name"], "card_id": card["id"], "color_identity": card["color_identity"]})
+
+    scryfall_rows = [tuple(card[column] for column in SCRYFALL_COLUMNS) for card in cards]
+    commander_rows = [tuple(commander[column] for column in COMMANDER_COLUMNS) for commander in commanders]
+    return scryfall_rows, commander_rows, generate_edhrec_cards(rng, cards, commanders, pair_count)
+
+def load_dataset(conn, scale:float, seed:int, replace:bool):
+    cur = conn.cursor()
+    for sql in CREATE_TABLES_SQL:
+        cur.execute(sql)
+    cur.execute("SELECT (SELECT COUNT(*) FROM scryfall_cards) + (SELECT COUNT(*) FROM edhrec_commanders) + (SELECT COUNT(*) FROM edhrec_cards)")
+    if cur.fetchone()[0] > 0:
+        if not replace:
+            conn.rollback()
+            raise ValueError("The tables already have rows, pass --replace to truncate them")
+        cur.execute("TRUNCATE edhrec_cards, edhrec_commanders, scryfall_cards RESTART IDENTITY")
+
+    scryfall_rows, commander_rows, edhrec_rows = generate_dataset(scale, seed)
+    start_time = time.time()
+    print(f"Copied {copy_rows(cur, 'scryfall_cards', SCRYFALL_COLUMNS, scryfall_rows)} scryfall_cards")
+    print(f"Copied {copy_rows(cur, 'edhrec_commanders', COMMANDER_COLUMNS, commander_rows)} edhrec_commanders")
+    print(f"Copied {copy_rows(cur, 'edhrec_cards', EDHREC_COLUMNS, edhrec_rows)} edhrec_cards")
+    # The ids were copied in explicitly, move the sequences past them
+    for table in ("scryfall_cards", "edhrec_commanders", "edhrec_cards"):
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}")
+    conn.commit()
+    print(f"Generated and copied the dataset in {time.time() - start_time:.1f} seconds")
+
+    for table in ("scryfall_cards", "edhrec_commanders", "edhrec_cards"):
+        cur.execute(f"ANALYZE {table}")
+    conn.commit()
+    cur.close()
+
+    apply_migrations(conn)
+    # The rank migration only backfills once, a --replace load has to re-rank itself
+    update_commander_ranks(conn)
+    build_commander_similarity(conn)
+    refresh_dataset_stats(conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset shaped like production at a scale factor")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 is about the production size, ex. 5 or 20 for headroom tests")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--replace", action="store_true", help="Truncate scryfall_cards, edhrec_commanders and edhrec_cards first")
+    parser.add_argument("--out-dir", help="Write COPY text files (one per table) here instead of loading a database")
+    args = parser.parse_args()
+
+    if args.out_dir:
+        out_dir = Path(args.out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        scryfall_rows, commander_rows, edhrec_rows = generate_dataset(args.scale, args.seed)
+        for table, columns, rows in (("scryfall_cards", SCRYFALL_COLUMNS, scryfall_rows), ("edhrec_commanders", COMMANDER_COLUMNS, commander_rows), ("edhrec_cards", EDHREC_COLUMNS, edhrec_rows)):
+            count = write_rows(out_dir / f"{table}.copy", rows)
+            print(f"Wrote {count} rows to {out_dir / f'{table}.copy'}, load with: \\copy {table} ({', '.join(columns)}) FROM '{table}.copy'")
+        sys.exit(0)
+
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+    try:
+        load_dataset(conn, args.scale, args.seed, args.replace)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        conn.close()
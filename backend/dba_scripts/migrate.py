@@ -0,0 +1,106 @@
+from dotenv import load_dotenv
+import os
+import sys
+import argparse
+from pathlib import Path
+import psycopg2
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from create_card_name_index import CREATE_CARD_NAME_KEY_SQL, CREATE_CARD_NAME_INDEXES_SQL
+from update_commander_ranks import CREATE_RANK_COLUMNS_SQL, UPDATE_ALL_RANKS_SQL, CREATE_RANK_INDEXES_SQL
+
+# Versioned schema changes, applied in order and recorded in schema_migrations so each one runs exactly once
+# Every migration runs in its own transaction together with its schema_migrations row. Add new ones at the end, never edit
+# one that has shipped. Check the query plans afterwards with dba_scripts/explain_check.py
+#   python dba_scripts/migrate.py           apply everything pending
+#   python dba_scripts/migrate.py --list    show what's applied
+
+MIGRATIONS = [
+    (1, "card_name_key", [CREATE_CARD_NAME_KEY_SQL] + CREATE_CARD_NAME_INDEXES_SQL),
+    (2, "edhrec_cards_updated_at", [
+        "ALTER TABLE edhrec_cards ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+        "CREATE INDEX IF NOT EXISTS edhrec_cards_updated_at_idx ON edhrec_cards (updated_at)",
+    ]),
+    # One index per endpoint access path, the INCLUDE columns let the joins read card_id without visiting the heap
+    (3, "endpoint_access_path_indexes", [
+        # /suggestions, /suggestions/range, POST /suggestions, CardsContext.get_commander_synergies_by_id
+        "CREATE INDEX IF NOT EXISTS edhrec_cards_commander_synergy_idx ON edhrec_cards (commander_id, synergy_score DESC) INCLUDE (card_id)",
+        # /info similarity fallback (cards shared with other commanders), CardsContext.get_card_synergies_by_id
+        "CREATE INDEX IF NOT EXISTS edhrec_cards_card_idx ON edhrec_cards (card_id) INCLUDE (commander_id, synergy_score)",
+        # Commander <=> card joins in CardsContext and /random-commander
+        "CREATE INDEX IF NOT EXISTS edhrec_commanders_card_id_idx ON edhrec_commanders (card_id)",
+        "CREATE INDEX IF NOT EXISTS edhrec_commanders_card_name_idx ON edhrec_commanders (card_name)",
+        # CardsContext.get_card_by_name/get_id_by_name, the Scryfall update in transfer_sf_cards_from_json.py
+        "CREATE INDEX IF NOT EXISTS scryfall_cards_card_name_idx ON scryfall_cards (card_name)",
+        "ANALYZE edhrec_cards",
+        "ANALYZE edhrec_commanders",
+        "ANALYZE scryfall_cards",
+    ]),
+    # Precomputed positions for /suggestions, /suggestions/range and /reductions (which has no index of its own in
+    # migration 3, it reads reduction_rank), see update_commander_ranks.py
+    (4, "edhrec_cards_ranks", CREATE_RANK_COLUMNS_SQL + [UPDATE_ALL_RANKS_SQL] + CREATE_RANK_INDEXES_SQL + ["ANALYZE edhrec_cards"]),
+]
+
+CREATE_SCHEMA_MIGRATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+# Any constant works, it only keeps two migrate.py runs from applying the same migration at once
+MIGRATION_LOCK_ID = 72_110_017
+
+def applied_versions(cur) -> dict:
+    cur.execute("SELECT version, applied_at FROM schema_migrations ORDER BY version")
+    return dict(cur.fetchall())
+
+def apply_migrations(conn) -> list:
+    # Returns the (version, name) of every migration applied by this call
+    cur = conn.cursor()
+    cur.execute(CREATE_SCHEMA_MIGRATIONS_SQL)
+    conn.commit()
+
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        if version in applied_versions(cur):
+            conn.rollback()
+            continue
+        try:
+            for sql in statements:
+                cur.execute(sql)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        applied.append((version, name))
+        print(f"Applied migration {version}: {name}")
+    cur.close()
+    return applied
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the pending schema migrations")
+    parser.add_argument("--list", action="store_true", help="Only show which migrations are applied")
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+    if args.list:
+        cur = conn.cursor()
+        cur.execute(CREATE_SCHEMA_MIGRATIONS_SQL)
+        applied = applied_versions(cur)
+        conn.commit()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4} {name:<32} {applied[version].isoformat() if version in applied else 'pending'}")
+    else:
+        applied = apply_migrations(conn)
+        print(f"Applied {len(applied)} migration(s)")
+    conn.close()
@@ -0,0 +1,42 @@
+from dotenv import load_dotenv
+import os
+from pathlib import Path
+import psycopg2
+
+# Single-row materialized view behind /dbinfo, so the API never scans edhrec_cards on a request
+# Run this (or call refresh_dataset_stats) after every ingest, refreshed_at doubles as the time of the last ingest
+CREATE_DATASET_STATS_SQL = """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS dataset_stats AS
+    SELECT
+        AVG(c.synergy_score) as avg_synergy_score,
+        (SELECT AVG(avg_synergy_score)
+        FROM (
+            SELECT AVG(c.synergy_score) as avg_synergy_score
+            FROM edhrec_cards c
+            GROUP BY c.commander_id
+        ) AS commander_avg_synergies) as avg_commander_synergy_score,
+        COUNT(DISTINCT cmd.id) as commander_count,
+        COUNT(*) as card_commander_pairs_count,
+        COUNT(DISTINCT c.card_name) as unique_card_count,
+        now() as refreshed_at
+    FROM edhrec_cards c
+    JOIN edhrec_commanders cmd ON c.commander_id = cmd.id
+    WITH NO DATA
+"""
+
+def refresh_dataset_stats(conn):
+    cur = conn.cursor()
+    cur.execute(CREATE_DATASET_STATS_SQL)
+    cur.execute("REFRESH MATERIALIZED VIEW dataset_stats")
+    conn.commit()
+    cur.close()
+
+if __name__ == "__main__":
+    BASE_DIR = Path(__file__).resolve().parent.parent
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+    refresh_dataset_stats(conn)
+    print("Refreshed dataset_stats")
+    conn.close()
@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 import os
 from pathlib import Path
 import psycopg2
+from refresh_dataset_stats import refresh_dataset_stats
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(os.path.join(BASE_DIR, '.env'))
@@ -37,4 +38,7 @@ for card in duplicate_cards:
             LIMIT %s
         )
     """, (card[0], card[1], card[2] - 1))
-    conn.commit()
\ No newline at end of file
+    conn.commit()
+
+# Recompute the /dbinfo stats now that the data changed
+refresh_dataset_stats(conn)
@@ -3,6 +3,7 @@ import os
 from pathlib import Path
 import psycopg2
 import json
+from refresh_dataset_stats import refresh_dataset_stats
 
 def configure_db():
     BASE_DIR = Path(__file__).resolve().parent.parent
@@ -213,4 +214,9 @@ def remove_tokens(data):
 with open(r"C:\Scryfall Cards\cards08082023.json", 'r', encoding="utf-8") as file:
     data = json.load(file)
 
-add_missing_power_toughness(data)
\ No newline at end of file
+add_missing_power_toughness(data)
+
+# Recompute the /dbinfo stats now that the data changed
+conn, cur = configure_db()
+refresh_dataset_stats(conn)
+conn.close()
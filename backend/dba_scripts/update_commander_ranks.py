@@ -0,0 +1,80 @@
+from dotenv import load_dotenv
+import os
+import time
+import argparse
+from pathlib import Path
+import psycopg2
+
+# Each edhrec_cards row's position in its commander's suggestion and reduction lists, so any page of either is an index
+# range scan on (commander_id, rank) instead of sorting the commander's cards and skipping past the first OFFSET rows.
+# Ranks start at 1 and follow the endpoints' ORDER BY, ties broken by id, over the rows the endpoints can return
+# (card_id joins scryfall_cards), so BETWEEN pages are as full as LIMIT/OFFSET ones. Rows that don't join get NULL ranks:
+#   synergy_rank    ORDER BY synergy_score DESC (NULLs first, like Postgres)
+#   reduction_rank  WHERE synergy_score < 0.8 ORDER BY percentage ASC, synergy_score ASC, NULL for every other row
+# webscraper.py recomputes the commanders it upserts, run this after any other bulk change to edhrec_cards or scryfall_cards:
+#   python dba_scripts/update_commander_ranks.py
+
+REDUCTION_THRESHOLD = 0.8
+
+# LEFT JOIN so the commander's unjoinable rows are in the result too, with NULL ranks that clear any stale ones
+RANKED_ROWS_SQL = f"""
+    SELECT ec.id,
+        CASE WHEN sc.id IS NOT NULL THEN ROW_NUMBER() OVER (
+            PARTITION BY ec.commander_id, sc.id IS NOT NULL
+            ORDER BY ec.synergy_score DESC, ec.id ASC
+        ) END AS synergy_rank,
+        CASE WHEN sc.id IS NOT NULL AND ec.synergy_score < {REDUCTION_THRESHOLD} THEN ROW_NUMBER() OVER (
+            PARTITION BY ec.commander_id, sc.id IS NOT NULL AND ec.synergy_score < {REDUCTION_THRESHOLD}
+            ORDER BY ec.percentage ASC, ec.synergy_score ASC, ec.id ASC
+        ) END AS reduction_rank
+    FROM edhrec_cards ec
+    LEFT JOIN scryfall_cards sc ON sc.id = ec.card_id
+"""
+
+# Only rows whose rank moved are written, an upsert that changes a few scores only rewrites the rows it reordered
+UPDATE_RANKS_SQL = """
+    UPDATE edhrec_cards c
+    SET synergy_rank = r.synergy_rank, reduction_rank = r.reduction_rank
+    FROM (""" + RANKED_ROWS_SQL + """    {where}
+    ) r
+    WHERE c.id = r.id AND (c.synergy_rank, c.reduction_rank) IS DISTINCT FROM (r.synergy_rank, r.reduction_rank)
+"""
+UPDATE_ALL_RANKS_SQL = UPDATE_RANKS_SQL.format(where="")
+UPDATE_COMMANDER_RANKS_SQL = UPDATE_RANKS_SQL.format(where="WHERE ec.commander_id = ANY(%s)")
+
+CREATE_RANK_COLUMNS_SQL = [
+    "ALTER TABLE edhrec_cards ADD COLUMN IF NOT EXISTS synergy_rank INTEGER",
+    "ALTER TABLE edhrec_cards ADD COLUMN IF NOT EXISTS reduction_rank INTEGER",
+]
+# The INCLUDE columns are everything the endpoints read from edhrec_cards, so the pages never visit the heap
+CREATE_RANK_INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS edhrec_cards_commander_synergy_rank_idx ON edhrec_cards (commander_id, synergy_rank) INCLUDE (card_id, synergy_score)",
+    "CREATE INDEX IF NOT EXISTS edhrec_cards_commander_reduction_rank_idx ON edhrec_cards (commander_id, reduction_rank) INCLUDE (card_id, percentage, synergy_score) WHERE reduction_rank IS NOT NULL",
+]
+
+def update_commander_ranks(conn, commander_ids:list=None) -> int:
+    # Recomputes the given commanders (every commander if None) and commits, returns how many rows changed
+    start_time = time.time()
+    cur = conn.cursor()
+    if commander_ids is None:
+        cur.execute(UPDATE_ALL_RANKS_SQL)
+    else:
+        cur.execute(UPDATE_COMMANDER_RANKS_SQL, (list(commander_ids),))
+    updated = cur.rowcount
+    conn.commit()
+    cur.close()
+    print(f"Updated the ranks of {updated} rows in {time.time() - start_time:.2f} seconds")
+    return updated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute edhrec_cards.synergy_rank and reduction_rank")
+    parser.add_argument("--commander-id", type=int, nargs="+", help="Only these commanders")
+    args = parser.parse_args()
+
+    BASE_DIR = Path(__file__).resolve().parent.parent
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+    # Connect to the database
+    conn = psycopg2.connect(dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT'))
+    update_commander_ranks(conn, args.commander_id)
+    conn.close()
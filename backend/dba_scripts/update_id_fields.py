@@ -3,6 +3,7 @@ import os
 from pathlib import Path
 import psycopg2
 import requests
+from update_commander_ranks import update_commander_ranks
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(os.path.join(BASE_DIR, '.env'))
@@ -61,3 +62,23 @@ for original_card, formatted_card in formatted_card_names:
     """, (original_card,))
     card_data = cur.fetchone()
     print(card_data)
+
+# Point the scraped rows still missing a card_id at their scryfall_cards row (lowest id of that name), the same join
+# the endpoints and the ranks use. Until then those rows have NULL ranks, so re-rank every commander that gained one
+cur.execute("""
+    UPDATE edhrec_cards ec
+    SET card_id = sc.id
+    FROM (
+        SELECT card_name, MIN(id) AS id
+        FROM scryfall_cards
+        GROUP BY card_name
+    ) sc
+    WHERE ec.card_id IS NULL AND ec.card_name = sc.card_name
+    RETURNING ec.commander_id
+""")
+commander_ids = sorted({row[0] for row in cur.fetchall()})
+conn.commit()
+print(f"Backfilled card_id on rows of {len(commander_ids)} commanders")
+
+if commander_ids:
+    update_commander_ranks(conn, commander_ids)
@@ -10,6 +10,9 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import re
+from refresh_dataset_stats import refresh_dataset_stats
+from build_commander_similarity import build_commander_similarity
+from update_commander_ranks import CREATE_RANK_COLUMNS_SQL, update_commander_ranks
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(os.path.join(BASE_DIR, '.env'))
@@ -48,6 +51,20 @@ CREATE TABLE IF NOT EXISTS edhrec_cards (
 """)
 conn.commit()
 
+# When each row last changed, for /export/suggestions?since=
+cur.execute("""
+ALTER TABLE edhrec_cards ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+""")
+cur.execute("""
+CREATE INDEX IF NOT EXISTS edhrec_cards_updated_at_idx ON edhrec_cards (updated_at)
+""")
+conn.commit()
+
+# Each row's place in its commander's lists, kept up to date by update_commander_ranks() after every upsert
+for sql in CREATE_RANK_COLUMNS_SQL:
+    cur.execute(sql)
+conn.commit()
+
 def scrape_commander_data(commander_name: str):
     driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()))
     url = f'https://edhrec.com/commanders/{commander_name.replace(" ", "-").lower()}'
@@ -110,11 +127,17 @@ def scrape_commander_data(commander_name: str):
     INSERT INTO edhrec_cards (commander_id, card_name, percentage, num_decks, synergy_score)
     VALUES (%(commander_id)s, %(card_name)s, %(percentage)s, %(num_decks)s, %(synergy_score)s)
     ON CONFLICT ON CONSTRAINT unique_commander_card DO UPDATE
-    SET percentage = EXCLUDED.percentage, num_decks = EXCLUDED.num_decks, synergy_score = EXCLUDED.synergy_score
+    SET percentage = EXCLUDED.percentage, num_decks = EXCLUDED.num_decks, synergy_score = EXCLUDED.synergy_score, updated_at = now()
+    -- Unchanged rows keep their updated_at, so /export/suggestions?since= only returns what actually moved
+    WHERE (edhrec_cards.percentage, edhrec_cards.num_decks, edhrec_cards.synergy_score)
+        IS DISTINCT FROM (EXCLUDED.percentage, EXCLUDED.num_decks, EXCLUDED.synergy_score)
     """, card_list)
 
     conn.commit()
 
+    # Only this commander's rows moved, re-rank just its list for /suggestions/range and /reductions
+    update_commander_ranks(conn, [commander_id])
+
     # Print the time it took to save the cards
     print(f"Saved {len(card_list)} cards in {time.time() - start_time} seconds")
 
@@ -146,6 +169,10 @@ if __name__ == "__main__":
         except Exception as e:
             print(e)
             continue
+    # Recompute the /<commander>/info similarity table and the /dbinfo stats now that the data changed
+    # The stats refresh goes last, it bumps the dataset version the API caches on
+    build_commander_similarity(conn)
+    refresh_dataset_stats(conn)
     # Close the database connection
     cur.close()
     conn.close()
\ No newline at end of file
@@ -1,6 +1,7 @@
 from card_embedder import CardEmbedder
 from card_fetcher import CardsContext
 from converter import MLConverter
+from embedding_store import save_embedding_store
 import json
 import os
 import datetime
@@ -26,7 +27,6 @@ converter = MLConverter()
 
 cards_raw = db.get_all_cards()
 commanders_raw = db.get_card_ids_of_commanders()
-rels = db.get_cmd_pct_relations()
 
 cards_raw = [
     card for card in cards_raw 
@@ -54,7 +54,7 @@ for i, card in enumerate(cards_raw):
 
 for i, commander in enumerate(commanders_raw):
     commanders[commander['card_name']]['index'] = i
-    commanders[commander['card_name']]['cards'] = []
+    commanders[commander['card_name']]['card_indices'] = np.empty(0, dtype=np.int64)
     commanders[commander['card_id']] = commander['card_name']
 
 # print(f"Cards: {len(cards)}")
@@ -66,26 +66,47 @@ for i, commander in enumerate(commanders_raw):
 # cmd ordered by card_id ASC
 # cards ordered by id ASC
 
-for rel in rels:
-    commander_name = commander_name_map.get(rel['commander_id'])
-    card_name = card_name_map.get(rel['card_id'])
-    if commander_name and card_name:
-        commanders[commander_name]['cards'].append(
-            (
-                cards[card_name],
-                rel['percentage'],
-                rel['synergy_score']
-            )
-        )
-        if 'highest_score' not in commanders[commander_name] or commanders[commander_name]['highest_score'] < rel['percentage']:
-            commanders[commander_name]['highest_score'] = rel['percentage']
-        if 'lowest_score' not in commanders[commander_name] or commanders[commander_name]['lowest_score'] > rel['percentage']:
-            commanders[commander_name]['lowest_score'] = rel['percentage']
-
-# print(f"Relations: {len(rels)}")
+def lookup(sorted_ids, values):
+    # Position of each value in sorted_ids, -1 where it isn't there
+    positions = np.searchsorted(sorted_ids, values).clip(max=len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == values, positions, -1)
+
+# The relations come in as columns and are grouped per commander with argsort, no dict lookups per relation.
+# Each commander gets its slice: the embedding index of every related card, their percentages and synergy scores.
+rels = db.load_cmd_pct_relation_arrays()
+card_ids = np.array(sorted(card_name_map))
+card_embedding_indices = np.array([cards[card_name_map[card_id]]['index'] for card_id in card_ids])
+commander_ids = np.array(sorted(commander_name_map))
+
+# Looked up once per distinct id, then gathered per relation through the dense indexes
+rel_card_positions = lookup(card_ids, rels.ids)[rels.card_index]
+rel_commander_positions = lookup(commander_ids, rels.ids)[rels.commander_index]
+known = (rel_card_positions >= 0) & (rel_commander_positions >= 0)
+rel_count = int(known.sum())
+
+order = np.argsort(rel_commander_positions[known], kind='stable')
+grouped_commanders = rel_commander_positions[known][order]
+grouped_card_indices = card_embedding_indices[rel_card_positions[known][order]]
+grouped_percentages = rels.percentage[known][order]
+grouped_synergy_scores = rels.synergy_score[known][order]
+group_starts = np.flatnonzero(np.diff(grouped_commanders, prepend=-1))
+group_ends = np.append(group_starts[1:], rel_count)
+for start, end in zip(group_starts, group_ends):
+    commander = commanders[commander_name_map[int(commander_ids[grouped_commanders[start]])]]
+    commander['card_indices'] = grouped_card_indices[start:end]
+    commander['percentages'] = grouped_percentages[start:end]
+    commander['synergy_scores'] = grouped_synergy_scores[start:end]
+    commander['highest_score'] = commander['percentages'].max()
+    commander['lowest_score'] = commander['percentages'].min()
+
+# print(f"Relations: {rel_count}")
 print(f"Time Elapsed: {time.time() - startTime}")
 
-embedder = CardEmbedder()
+# Training always refits the vocabulary and saves it for the API and the validation scripts
+embedder = CardEmbedder(refit=True)
+embedder.save_vocabulary()
+# The serving embeddings have to be rebuilt with the new vocabulary too
+save_embedding_store(embedder, db.get_all_cards())
 embeddings = embedder.embed_and_parse_cards(cards_raw) #, testing=False)
 joblib.dump(embeddings, 'embeddings.npy')
 print(f"Time Elapsed: {time.time() - startTime}")
@@ -97,25 +118,19 @@ for commander_name, commander_data in commanders.items():
         print(f"Training model {i} of {len(commanders)}")
     try:
         # print(commander_name, " ", commander_data.get('id'))
-        # print(len(commander_data.get('cards', [])))
+        # print(len(commander_data.get('card_indices', [])))
         if commander_name not in commanders:
             # print(f"Skipping {commander_name} because it's not in the cards list")
             continue
-        if len(commander_data.get('cards', 0)) < 130:
-            # print(f"Skipping {commander_name} because it has {len(commander_data.get('cards', 0))} cards")
+        if len(commander_data.get('card_indices', ())) < 130:
+            # print(f"Skipping {commander_name} because it has {len(commander_data.get('card_indices', ()))} cards")
             continue
-        X = []
-        y = []
         highest_card_score = commander_data['highest_score']
         lowest_card_score = commander_data['lowest_score']
-        for card in commander_data['cards']:
-            # print(card[0]['card_name'], card[1])
-            # print(embeddings[card[0].get('index')].shape)
-            if card and card[0].get('index', None) is not None:
-                X.append(embeddings[card[0]['index']])
-                # Normalizes the score, so some commanders aren't skewed to the top when ranked later
-                y.append( card[1] - lowest_card_score / (highest_card_score - lowest_card_score) )
-                # y.append(card[1] / 100)
+        X = embeddings[commander_data['card_indices']]
+        # Normalizes the score, so some commanders aren't skewed to the top when ranked later
+        y = commander_data['percentages'] - lowest_card_score / (highest_card_score - lowest_card_score)
+        # y = commander_data['percentages'] / 100
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         commanders[commander_name]['model'] = SGDRegressor(penalty=config["penalty"], alpha=config["alpha"])
         commanders[commander_name]['model'].fit(X_train, y_train)
@@ -129,27 +144,30 @@ for commander_name, commander_data in commanders.items():
         continue
         #print(f"Error for {commander_name}: {e}")
 
-def generate_batches(batch_size, rels, embeddings, commander_name_map, card_name_map):
-    num_samples = len(rels)
-    for offset in range(0, num_samples, batch_size):
-        batch_rels = rels[offset:offset + batch_size]
-        X, y = [], []
-        for rel in batch_rels:
-            commander_name = commander_name_map.get(rel['commander_id'])
-            card_name = card_name_map.get(rel['card_id'])
-            if commander_name and card_name:
-                commander_idx = commanders[commander_name]['index']
-                card_idx = cards[card_name]['index']
-                cmd_high = commanders[commander_name].get('highest_score', None)
-                cmd_low = commanders[commander_name].get('lowest_score', None)
-                if cmd_high is None or cmd_low is None:
-                    continue
-                commander_embedding = embeddings[commander_idx]
-                card_embedding = embeddings[card_idx]
-                X.append(np.concatenate((commander_embedding, card_embedding)).reshape(1, -1))
-                y.append(rel['percentage'] - cmd_low / (cmd_high + 1 - cmd_low))
-        X = np.vstack(X)
-        yield X, np.array(y)
+def generate_batches(batch_size, commanders, embeddings):
+    # Gathers each commander's (commander_embedding, card_embedding) rows from the relation slices above
+    X, y = [], []
+    rows = 0
+    for commander_data in commanders.values():
+        if not isinstance(commander_data, dict):
+            # card_id => name entries
+            continue
+        cmd_high = commander_data.get('highest_score', None)
+        cmd_low = commander_data.get('lowest_score', None)
+        if cmd_high is None or cmd_low is None:
+            continue
+        card_embeddings = embeddings[commander_data['card_indices']]
+        commander_embeddings = np.broadcast_to(embeddings[commander_data['index']], (len(card_embeddings), embeddings.shape[1]))
+        X.append(np.hstack((commander_embeddings, card_embeddings)))
+        y.append(commander_data['percentages'] - cmd_low / (cmd_high + 1 - cmd_low))
+        rows += len(card_embeddings)
+        while rows >= batch_size:
+            X_all, y_all = np.vstack(X), np.concatenate(y)
+            yield X_all[:batch_size], y_all[:batch_size]
+            X, y = [X_all[batch_size:]], [y_all[batch_size:]]
+            rows -= batch_size
+    if rows:
+        yield np.vstack(X), np.concatenate(y)
 
 
 gen_model = MLPRegressor(hidden_layer_sizes=(100, 50), max_iter=1, warm_start=True, random_state=42, activation=config['activation'], solver='adam')
@@ -159,10 +177,10 @@ gen_model = MLPRegressor(hidden_layer_sizes=(100, 50), max_iter=1, warm_start=Tr
 # Trained with (commander_embedding, card_embedding) -> frequency
 print("Starting gen model training...")
 print("Time Elapsed: ", time.time() - startTime)
-batch_size = len(rels) # // 5
+batch_size = rel_count # // 5
 i = 0
-done = len(rels) // batch_size
-for X_batch, y_batch in generate_batches(batch_size, rels, embeddings, commander_name_map, card_name_map):
+done = rel_count // batch_size
+for X_batch, y_batch in generate_batches(batch_size, commanders, embeddings):
     print(f"Batch {i} of {done}")
     gen_model.partial_fit(X_batch, y_batch)
     i += 1
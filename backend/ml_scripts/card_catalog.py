@@ -0,0 +1,191 @@
+import time
+import threading
+
+# Every scryfall_cards and edhrec_commanders row in memory, indexed by id, card_name, scryfall_id and commander id
+# One catalog per process: CardsContext, CardEmbedder and the API all read the shared one (see shared_catalog())
+# instead of each fetching and re-keying the card table.
+
+CARD_FIELDS = ("id", "scryfall_id", "card_name", "mana_cost", "cmc", "type_line", "oracle_text", "power", "toughness", "colors", "color_identity", "commander_legal", "set_code", "rarity", "prices", "edhrec_rank")
+COMMANDER_FIELDS = ("id", "name", "scryfall_id", "card_name", "card_id")
+
+# Columns in CARD_FIELDS / COMMANDER_FIELDS order
+CATALOG_CARDS_SQL = """
+    SELECT id, scryfall_id, card_name, mana_cost, cmc, type_line, oracle_text, power, toughness, colors, color_identity, commander_legal, set_code, rarity, prices, edhrec_rank
+    FROM scryfall_cards
+    ORDER BY id ASC
+"""
+# The commander_legal cards of CATALOG_CARDS_SQL, for streaming them without building a catalog
+CATALOG_LEGAL_CARDS_SQL = """
+    SELECT id, scryfall_id, card_name, mana_cost, cmc, type_line, oracle_text, power, toughness, colors, color_identity, commander_legal, set_code, rarity, prices, edhrec_rank
+    FROM scryfall_cards
+    WHERE commander_legal = true
+    ORDER BY id ASC
+"""
+CATALOG_COMMANDERS_SQL = """
+    SELECT id, name, scryfall_id, card_name, card_id
+    FROM edhrec_commanders
+    ORDER BY id ASC
+"""
+
+class CatalogCard:
+    # One scryfall_cards row without a per-card dict, card.card_name or card['card_name'] like the row dicts
+    __slots__ = CARD_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(CARD_FIELDS, values):
+            setattr(self, field, value)
+
+    def __getitem__(self, field:str):
+        return getattr(self, field)
+
+    def get(self, field:str, default=None):
+        return getattr(self, field, default)
+
+    def to_dict(self) -> dict:
+        # A fresh dict in SELECT * column order, for callers that add keys to their cards
+        return {field: getattr(self, field) for field in CARD_FIELDS}
+
+class CatalogCommander:
+    # One edhrec_commanders row, card is its CatalogCard (None when card_id doesn't match one)
+    __slots__ = COMMANDER_FIELDS + ("card",)
+
+    def __init__(self, *values, card:CatalogCard=None):
+        for field, value in zip(COMMANDER_FIELDS, values):
+            setattr(self, field, value)
+        self.card = card
+
+    def __getitem__(self, field:str):
+        return getattr(self, field)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in COMMANDER_FIELDS}
+
+class CatalogIndex:
+    # Everything one load built, swapped in as a whole so readers never mix two loads
+    __slots__ = ("cards", "by_id", "by_scryfall_id", "by_name", "commanders", "commanders_by_id", "commanders_by_name", "commanders_by_card_id", "commanders_by_card_name")
+
+    def __init__(self, card_rows, commander_rows):
+        self.cards = [CatalogCard(*row) for row in card_rows]
+        self.by_id = dict()
+        self.by_scryfall_id = dict()
+        # A name can have more than one row, listed in id order
+        self.by_name = dict()
+        for card in self.cards:
+            self.by_id[card.id] = card
+            if card.scryfall_id is not None:
+                self.by_scryfall_id.setdefault(card.scryfall_id, card)
+            self.by_name.setdefault(card.card_name, []).append(card)
+
+        self.commanders = [CatalogCommander(*row, card=self.by_id.get(row[4])) for row in commander_rows]
+        self.commanders_by_id = {commander.id: commander for commander in self.commanders}
+        self.commanders_by_name = {commander.name: commander for commander in self.commanders}
+        self.commanders_by_card_id = dict()
+        self.commanders_by_card_name = dict()
+        for commander in self.commanders:
+            if commander.card_id is not None:
+                self.commanders_by_card_id.setdefault(commander.card_id, commander)
+            self.commanders_by_card_name.setdefault(commander.card_name, []).append(commander)
+
+class CardCatalog:
+    def __init__(self, db_pool=None):
+        self.db_pool = db_pool
+        self.load_seconds = None
+        self.index = CatalogIndex([], [])
+
+    def load(self):
+        # Reloads from the pool, like the API's other in-memory copies
+        start_time = time.time()
+        conn = self.db_pool.getconn()
+        try:
+            cur = conn.cursor()
+            cur.execute(CATALOG_CARDS_SQL)
+            card_rows = cur.fetchall()
+            cur.execute(CATALOG_COMMANDERS_SQL)
+            commander_rows = cur.fetchall()
+            cur.close()
+        finally:
+            self.db_pool.putconn(conn)
+        self.load_rows(card_rows, commander_rows)
+        self.load_seconds = time.time() - start_time
+        return self
+
+    def load_rows(self, card_rows, commander_rows):
+        # Rows are tuples in CARD_FIELDS / COMMANDER_FIELDS order, cards ordered by id
+        start_time = time.time()
+        self.index = CatalogIndex(card_rows, commander_rows)
+        self.load_seconds = time.time() - start_time
+        return self
+
+    def __len__(self) -> int:
+        return len(self.index.cards)
+
+    def cards(self, legal_only:bool=False) -> list:
+        # Every card in id order
+        if legal_only:
+            return [card for card in self.index.cards if card.commander_legal]
+        return self.index.cards
+
+    def card(self, card_id:int, legal_only:bool=False) -> CatalogCard:
+        card = self.index.by_id.get(card_id)
+        if card is None or (legal_only and not card.commander_legal):
+            return None
+        return card
+
+    def cards_by_ids(self, card_ids:list, legal_only:bool=False) -> list:
+        # Found cards in id order, each once
+        cards = (self.card(card_id, legal_only) for card_id in sorted(set(card_ids)))
+        return [card for card in cards if card is not None]
+
+    def card_by_scryfall_id(self, scryfall_id:str) -> CatalogCard:
+        return self.index.by_scryfall_id.get(scryfall_id)
+
+    def cards_named(self, card_name:str, legal_only:bool=False) -> list:
+        cards = self.index.by_name.get(card_name, [])
+        return [card for card in cards if card.commander_legal] if legal_only else cards
+
+    def card_by_name(self, card_name:str, legal_only:bool=True) -> CatalogCard:
+        # Lowest id with this exact name
+        cards = self.cards_named(card_name, legal_only)
+        return cards[0] if cards else None
+
+    def commanders(self) -> list:
+        # Every commander in id order
+        return self.index.commanders
+
+    def commander(self, commander_id:int) -> CatalogCommander:
+        return self.index.commanders_by_id.get(commander_id)
+
+    def commander_by_name(self, name:str) -> CatalogCommander:
+        # By edhrec_commanders.name, the name in the API's URLs
+        return self.index.commanders_by_name.get(name)
+
+    def commander_by_card_id(self, card_id:int) -> CatalogCommander:
+        return self.index.commanders_by_card_id.get(card_id)
+
+    def commanders_named(self, card_name:str) -> list:
+        return self.index.commanders_by_card_name.get(card_name, [])
+
+    def commander_cards(self, legal_only:bool=True) -> list:
+        # Cards that are some commander's card, id order
+        return [card for card in self.cards(legal_only) if card.id in self.index.commanders_by_card_id]
+
+shared_lock = threading.Lock()
+shared = None
+
+def shared_catalog(load) -> CardCatalog:
+    # The process' catalog, load() builds it the first time anyone asks
+    global shared
+    if shared is None:
+        with shared_lock:
+            if shared is None:
+                shared = load()
+    return shared
+
+def shared_catalog_loaded() -> bool:
+    return shared is not None
+
+def set_shared_catalog(catalog:CardCatalog):
+    # For processes that load the catalog themselves, ex. the API from its connection pool
+    global shared
+    with shared_lock:
+        shared = catalog
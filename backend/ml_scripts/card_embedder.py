@@ -9,19 +9,68 @@ except:
     from card_fetcher import CardsContext
     from card_parser import CardParser
 import json
+import os
 import time
+import hashlib
+import datetime
 import numpy as np
 from tensorflow_hub import KerasLayer
 from sklearn.preprocessing import MultiLabelBinarizer
 
+# Fitted encoder vocabularies are saved here by training (ml_scripts/app.py) and loaded by everything else
+# Bump VOCABULARY_VERSION whenever the artifact layout changes
+VOCABULARY_VERSION = 1
+VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "card_vocabulary.json")
+# The artifact is stale when any of these files change. The card table is deliberately not checked: the trained
+# models expect the saved vocabulary, so new printings shouldn't change it until the next training run refits it.
+VOCABULARY_SOURCES = ["card_parser.py", "card_reducer.py", "converter.py", "validation_set.json"]
+
 class CardEmbedder:
-    def __init__(self, config_options:dict=None):
+    def __init__(self, config_options:dict=None, vocabulary_path:str=VOCABULARY_PATH, refit:bool=False, context:CardsContext=None):
+        # Only needed to refit, the cards come from the shared card catalog either way
+        self.context = context
         self.text_embedder = "" #KerasLayer("https://tfhub.dev/google/universal-sentence-encoder/4")
         self.converter = MLConverter()
-        self.context = CardsContext()
         self.parser = CardParser()
         self.reducer = CardReducer()
+        self.vocabulary_path = vocabulary_path
+
+        # Loading the saved vocabulary takes milliseconds, refitting parses every card in the database
+        if refit or not self.load_vocabulary(vocabulary_path):
+            self.fit_vocabulary()
+
+        self.default_embedding_shape = ""#self.text_embedder(["Legendary Creature — Elf Warrior"]).shape
+
+        try:
+            with open("config.json", "r") as f:
+                config = json.load(f)
+        except:
+            with open("ml_scripts/config.json", "r") as f:
+                config = json.load(f)
+
+        self.min_count = config.get("min_count", 5)
+        self.threshold = config.get("threshold", 0.5)
+        self.npmi_scoring = config.get("npmi_scoring", True)
+        self.batch_size = config.get("batch_size", 65536)
+        self.penalty = config.get("penalty", "l1")
+        self.alpha = config.get("alpha", 0.001)
+        self.clean_text = config.get("clean_text", True)
+        self.oracle_text_encoding_method = config.get("oracle_text_encoding_method", "TFIDF")
+        self.vector_size = config.get("vector_size", 100)
+        self.window = config.get("window", 5)
+        self.freq_cutoff = config.get("freq_cutoff", 3)
+        self.embedding_size = config.get("embedding_size", 30)
+        self.remove_common_words = config.get("remove_common_words", False)
+        self.activation = config.get("activation", "relu")
+        
+        # I wish I could do this with the config options, that was having some issues though
+        if config_options is not None:
+            for key in config_options:
+                self.key = config_options[key]
 
+    def fit_vocabulary(self):
+        if self.context is None:
+            self.context = CardsContext()
         super_types, card_types, sub_types = self.context.get_all_card_types_and_sub_types()
 
         validation_set = None
@@ -54,40 +103,58 @@ class CardEmbedder:
         self.sub_types_encoder = MultiLabelBinarizer()
         self.sub_types_encoder.fit(sub_types)
 
-        self.default_embedding_shape = ""#self.text_embedder(["Legendary Creature — Elf Warrior"]).shape
+    def vocabulary_fingerprint(self) -> str:
+        # Hash of the code and data the vocabulary is built from
+        sha = hashlib.sha256()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for source in VOCABULARY_SOURCES:
+            sha.update(source.encode("utf-8"))
+            with open(os.path.join(base_dir, source), "rb") as f:
+                sha.update(f.read())
+        return sha.hexdigest()
+
+    def save_vocabulary(self, vocabulary_path:str=None):
+        vocabulary_path = vocabulary_path or self.vocabulary_path
+        vocabulary = {
+            "version": VOCABULARY_VERSION,
+            "fingerprint": self.vocabulary_fingerprint(),
+            "created_at": datetime.datetime.now().isoformat(),
+            "properties": self.parsed_properties_encoder.classes_.tolist(),
+            "super_types": self.super_type_encoder.classes_.tolist(),
+            "card_types": self.card_type_encoder.classes_.tolist(),
+            "sub_types": self.sub_types_encoder.classes_.tolist(),
+        }
+        # Write then rename, so a worker starting mid-save never reads half a file
+        with open(vocabulary_path + ".tmp", "w") as f:
+            json.dump(vocabulary, f)
+        os.replace(vocabulary_path + ".tmp", vocabulary_path)
 
+    def load_vocabulary(self, vocabulary_path:str) -> bool:
+        # Returns False when the artifact is missing or stale, the caller refits in that case
         try:
-            with open("config.json", "r") as f:
-                config = json.load(f)
-        except:
-            with open("ml_scripts/config.json", "r") as f:
-                config = json.load(f)
+            with open(vocabulary_path, "r") as f:
+                vocabulary = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if vocabulary.get("version") != VOCABULARY_VERSION or vocabulary.get("fingerprint") != self.vocabulary_fingerprint():
+            print(f"Card vocabulary at {vocabulary_path} is stale, refitting")
+            return False
 
-        self.min_count = config.get("min_count", 5)
-        self.threshold = config.get("threshold", 0.5)
-        self.npmi_scoring = config.get("npmi_scoring", True)
-        self.batch_size = config.get("batch_size", 65536)
-        self.penalty = config.get("penalty", "l1")
-        self.alpha = config.get("alpha", 0.001)
-        self.clean_text = config.get("clean_text", True)
-        self.oracle_text_encoding_method = config.get("oracle_text_encoding_method", "TFIDF")
-        self.vector_size = config.get("vector_size", 100)
-        self.window = config.get("window", 5)
-        self.freq_cutoff = config.get("freq_cutoff", 3)
-        self.embedding_size = config.get("embedding_size", 30)
-        self.remove_common_words = config.get("remove_common_words", False)
-        self.activation = config.get("activation", "relu")
-        
-        # I wish I could do this with the config options, that was having some issues though
-        if config_options is not None:
-            for key in config_options:
-                self.key = config_options[key]
+        self.parsed_properties_encoder = MultiLabelBinarizer(classes=vocabulary["properties"]).fit([])
+        self.super_type_encoder = MultiLabelBinarizer(classes=vocabulary["super_types"]).fit([])
+        self.card_type_encoder = MultiLabelBinarizer(classes=vocabulary["card_types"]).fit([])
+        self.sub_types_encoder = MultiLabelBinarizer(classes=vocabulary["sub_types"]).fit([])
+        return True
 
     def embed_and_parse_cards(self, cards:list, testing=False) -> np.ndarray:
         cards = [self.parser.parse_card(card) for card in cards]
-        cards = self.reducer.reduce_cards(cards, min_count=self.min_count)
+        return self.embed_parsed_cards(cards, testing=testing)
+
+    def embed_parsed_cards(self, parsed_cards:list, testing=False) -> np.ndarray:
+        # For callers that already have CardParser output, so cards aren't parsed twice
+        parsed_cards = self.reducer.reduce_cards(parsed_cards, min_count=self.min_count)
 
-        encoded_cards = self.parsed_properties_encoder.transform([card['properties'] for card in cards])
+        encoded_cards = self.parsed_properties_encoder.transform([card['properties'] for card in parsed_cards])
         encoded_cards = np.array(encoded_cards)
 
         return encoded_cards
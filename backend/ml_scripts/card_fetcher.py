@@ -1,28 +1,121 @@
 from pathlib import Path
 import psycopg2
 import os
+import io
 import json
+from collections import namedtuple
+from functools import lru_cache
+from contextlib import contextmanager
+from itertools import count
 from dotenv import load_dotenv
+import numpy as np
 try: 
     from ml_scripts.converter import MLConverter
+    from ml_scripts.cards_snapshot import CardsSnapshot, SNAPSHOT_TABLES, write_snapshot
+    from ml_scripts.card_catalog import CardCatalog, CatalogCard, CARD_FIELDS, COMMANDER_FIELDS, CATALOG_CARDS_SQL, CATALOG_LEGAL_CARDS_SQL, CATALOG_COMMANDERS_SQL, shared_catalog, shared_catalog_loaded
 except ModuleNotFoundError:
     from converter import MLConverter
+    from cards_snapshot import CardsSnapshot, SNAPSHOT_TABLES, write_snapshot
+    from card_catalog import CardCatalog, CatalogCard, CARD_FIELDS, COMMANDER_FIELDS, CATALOG_CARDS_SQL, CATALOG_LEGAL_CARDS_SQL, CATALOG_COMMANDERS_SQL, shared_catalog, shared_catalog_loaded
+
+# Rows fetched per round trip by the iter_* methods, only one batch is held in memory at a time
+DEFAULT_ITERSIZE = 10000
+
+# One row of get_cmd_pct_relations(), a tuple with field names instead of a dict per row
+CmdPctRelation = namedtuple('CmdPctRelation', ['commander_id', 'card_id', 'percentage', 'synergy_score'])
+
+CMD_PCT_RELATIONS_SQL = """
+    SELECT cmd.card_id AS cmd_card_id, ec.card_id AS ec_card_id, percentage, synergy_score
+    FROM edhrec_cards ec
+    INNER JOIN edhrec_commanders cmd ON ec.commander_id = cmd.id
+    INNER JOIN scryfall_cards sc1 ON ec.card_id = sc1.id
+    INNER JOIN scryfall_cards sc2 ON cmd.card_id = sc2.id
+    WHERE sc1.commander_legal = true AND sc2.commander_legal = true
+    AND ec.num_decks > %s
+    GROUP BY cmd.card_id, ec.card_id, percentage, synergy_score
+    ORDER BY cmd.card_id ASC
+"""
+
+# The same relations as CMD_PCT_RELATIONS_SQL, cast so every binary COPY row has the same 42 byte layout:
+# field count, then (length, value) for int4, int4, float8, float8, NULL percentages/scores come back as NaN
+CMD_PCT_RELATIONS_COPY_SQL = """
+    COPY (
+        SELECT cmd.card_id::int4, ec.card_id::int4, COALESCE(percentage::float8, 'NaN'), COALESCE(synergy_score::float8, 'NaN')
+        FROM edhrec_cards ec
+        INNER JOIN edhrec_commanders cmd ON ec.commander_id = cmd.id
+        INNER JOIN scryfall_cards sc1 ON ec.card_id = sc1.id
+        INNER JOIN scryfall_cards sc2 ON cmd.card_id = sc2.id
+        WHERE sc1.commander_legal = true AND sc2.commander_legal = true
+        AND ec.num_decks > %s
+        GROUP BY cmd.card_id, ec.card_id, percentage, synergy_score
+        ORDER BY cmd.card_id ASC
+    ) TO STDOUT WITH (FORMAT binary)
+"""
+COPY_BINARY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+CMD_PCT_RELATION_ROW = np.dtype([
+    ('field_count', '>i2'),
+    ('commander_id_length', '>i4'), ('commander_id', '>i4'),
+    ('card_id_length', '>i4'), ('card_id', '>i4'),
+    ('percentage_length', '>i4'), ('percentage', '>f8'),
+    ('synergy_score_length', '>i4'), ('synergy_score', '>f8'),
+])
+
+# get_cmd_pct_relations() as one array per column, row i of every array is the same relation.
+# ids is every card id in the relations, sorted and unique, so a card id's dense index is its position there
+# (np.searchsorted(ids, x)), commander_index and card_index are those positions for each row.
+CmdPctRelationArrays = namedtuple('CmdPctRelationArrays', ['commander_card_id', 'card_id', 'percentage', 'synergy_score', 'ids', 'commander_index', 'card_index'])
+
+def parse_cmd_pct_relations_copy(data) -> CmdPctRelationArrays:
+    # data is the whole output of CMD_PCT_RELATIONS_COPY_SQL
+    data = memoryview(data)
+    if bytes(data[:11]) != COPY_BINARY_SIGNATURE:
+        raise ValueError("Not a binary COPY stream")
+    extension_length = int.from_bytes(data[15:19], 'big')
+    body = data[19 + extension_length:-2]
+    if len(body) % CMD_PCT_RELATION_ROW.itemsize != 0:
+        raise ValueError(f"COPY body of {len(body)} bytes isn't a whole number of {CMD_PCT_RELATION_ROW.itemsize} byte rows")
+    rows = np.frombuffer(body, dtype=CMD_PCT_RELATION_ROW)
+    if len(rows) and ((rows['field_count'] != 4).any() or (rows['commander_id_length'] != 4).any() or (rows['card_id_length'] != 4).any()
+                      or (rows['percentage_length'] != 8).any() or (rows['synergy_score_length'] != 8).any()):
+        raise ValueError("Unexpected row layout in the COPY stream")
+    return cmd_pct_relation_arrays(rows['commander_id'], rows['card_id'], rows['percentage'], rows['synergy_score'])
+
+def cmd_pct_relation_arrays(commander_card_id, card_id, percentage, synergy_score) -> CmdPctRelationArrays:
+    commander_card_id = np.asarray(commander_card_id).astype(np.int32)
+    card_id = np.asarray(card_id).astype(np.int32)
+    ids, inverse = np.unique(np.concatenate((commander_card_id, card_id)), return_inverse=True)
+    return CmdPctRelationArrays(
+        commander_card_id=commander_card_id,
+        card_id=card_id,
+        percentage=np.asarray(percentage).astype(np.float64),
+        synergy_score=np.asarray(synergy_score).astype(np.float64),
+        ids=ids,
+        commander_index=inverse[:len(card_id)],
+        card_index=inverse[len(card_id):],
+    )
+
+@lru_cache(maxsize=None)
+def record_type(columns:tuple):
+    # namedtuple for a query's columns, made once per distinct column list
+    return namedtuple('Record', columns, rename=True)
 
 class CardsContext:
-    def __init__(self):
+    def __init__(self, itersize:int=DEFAULT_ITERSIZE, snapshot_dir:str=None, db_pool=None):
         self.converter = MLConverter()
+        self.itersize = itersize
+        self.cursor_ids = count()
         self.BASE_DIR = Path(__file__).resolve().parent
         load_dotenv(os.path.join(self.BASE_DIR, '..\.env'))
 
-        # Connect to the database
-        self.conn = psycopg2.connect(
-            dbname=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT')
-        )
-        self.cur = self.conn.cursor()
+        # With a snapshot (see cards_snapshot.py) every query is answered from it and no connection is opened,
+        # snapshot_dir defaults to CARDS_SNAPSHOT_DIR, pass "" to always use the database
+        if snapshot_dir is None:
+            snapshot_dir = os.getenv('CARDS_SNAPSHOT_DIR')
+        self.snapshot = CardsSnapshot(snapshot_dir) if snapshot_dir else None
+        # With a db_pool (ex. the API's) every query borrows a pooled connection for the call instead of opening its own
+        self.db_pool = db_pool
+        self._conn = None
+        self._cur = None
 
         try:
             with open('config.json', 'r') as f:
@@ -47,29 +140,122 @@ class CardsContext:
     # "colors" "color_identity" "commander_legal"	"set_code"	"rarity"	"edhrec_rank"   "prices"
     # "U"	    "U"	            true	            "10e"	    "uncommon"	17200           "{""usd"": ""0.18"", ""usd_foil"": ""0.62"", ""usd_etched"": null, ""eur"": ""0.09"", ""eur_foil"": ""0.39"", ""tix"": ""0.02""}"
 
+    @property
+    def conn(self):
+        # Connected on first use, a process that only needs the card catalog never opens a connection
+        if self._conn is None:
+            if self.snapshot:
+                raise RuntimeError("CardsContext is reading a snapshot and has no database connection")
+            if self.db_pool is not None:
+                raise RuntimeError("CardsContext borrows its connections from db_pool, use cursor()")
+            self._conn = psycopg2.connect(
+                dbname=os.getenv('DB_NAME'),
+                user=os.getenv('DB_USER'),
+                password=os.getenv('DB_PASSWORD'),
+                host=os.getenv('DB_HOST'),
+                port=os.getenv('DB_PORT')
+            )
+        return self._conn
+
+    @property
+    def cur(self):
+        if self._cur is None:
+            self._cur = self.conn.cursor()
+        return self._cur
+
+    @contextmanager
+    def cursor(self):
+        # A cursor for one query, on a pooled connection held only for the call when there's a db_pool
+        if self.db_pool is None:
+            yield self.cur
+            return
+        conn = self.db_pool.getconn()
+        try:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+        finally:
+            self.db_pool.putconn(conn)
+
+    @property
+    def catalog(self) -> CardCatalog:
+        # The process-wide card catalog (card_catalog.py), the first CardsContext to need it loads it
+        return shared_catalog(self.load_catalog)
+
+    def load_catalog(self) -> CardCatalog:
+        if self.snapshot:
+            return CardCatalog().load_rows(self.snapshot.cards.tuples(CARD_FIELDS), self.snapshot.commanders.tuples(COMMANDER_FIELDS))
+        return CardCatalog().load_rows(self.iter_rows(CATALOG_CARDS_SQL), self.iter_rows(CATALOG_COMMANDERS_SQL))
+
     def fetch_list_of_dicts(self, cursor)-> list:
         columns = [col[0] for col in cursor.description]
         return [dict(zip(columns, row)) for row in cursor.fetchall()]
-    
+
+    def iter_rows(self, query:str, params=None, itersize:int=None):
+        # Streams plain tuples through a named (server-side) cursor instead of fetchall()
+        for row, _ in self.iter_rows_with_columns(query, params, itersize):
+            yield row
+
+    def iter_records(self, query:str, params=None, itersize:int=None):
+        # Streams namedtuples (row.card_name, row[2]), no per-row dict
+        record = None
+        for row, columns in self.iter_rows_with_columns(query, params, itersize):
+            if record is None:
+                record = record_type(columns)
+            yield record._make(row)
+
+    def iter_rows_with_columns(self, query:str, params=None, itersize:int=None):
+        # Yields (row, column names), a named cursor only has a description once the first batch is fetched
+        # Pooled connections are autocommit, where a named cursor has to be declared WITH HOLD
+        conn = self.conn if self.db_pool is None else self.db_pool.getconn()
+        cur = conn.cursor(name=f"cards_context_{next(self.cursor_ids)}", withhold=self.db_pool is not None)
+        cur.itersize = itersize or self.itersize
+        try:
+            cur.execute(query, params)
+            columns = None
+            for row in cur:
+                if columns is None:
+                    columns = tuple(col[0] for col in cur.description)
+                yield row, columns
+        finally:
+            cur.close()
+            if self.db_pool is not None:
+                self.db_pool.putconn(conn)
+
     def get_all_cards(self) -> list:
-        self.cur.execute("""
-            SELECT * FROM scryfall_cards
-            WHERE commander_legal = true
-            ORDER BY id ASC
-        """)
-        return self.fetch_list_of_dicts(self.cur)
-
-    def get_commander_sc_id_by_id(self, card_id:int) -> int:
-        self.cur.execute("""
-            SELECT sc.id FROM scryfall_cards sc
-            INNER JOIN edhrec_commanders ON sc.id = edhrec_commanders.card_id
-            AND commander_legal = true
-            ORDER BY id ASC
-        """, (card_id,))
-        return self.cur.fetchone()[0]
+        # New dicts every call, callers add their own keys to them
+        return [card.to_dict() for card in self.catalog.cards(legal_only=True)]
+
+    def iter_all_cards(self, itersize:int=None):
+        # Same cards as get_all_cards() as CatalogCard records, card.to_dict() gives the dict when one is needed
+        # Read from the shared catalog once something loaded it, otherwise streamed itersize rows at a time
+        # so a one-pass caller (ex. single_card_validator.py) never holds every card
+        if self.snapshot or shared_catalog_loaded():
+            return iter(self.catalog.cards(legal_only=True))
+        return (CatalogCard(*row) for row in self.iter_rows(CATALOG_LEGAL_CARDS_SQL, itersize=itersize))
+
+    def export_snapshot(self, directory:str) -> dict:
+        # Writes every table the query methods read, see cards_snapshot.py
+        tables = {table: self.iter_rows_with_columns(query) for table, query in SNAPSHOT_TABLES.items()}
+        return write_snapshot(tables, directory, source=f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}")
+
+    def get_commander_sc_id_by_id(self, commander_id:int) -> int:
+        # scryfall_cards id of the commander, None if it has no card_id or its card isn't commander legal
+        if self.snapshot:
+            return self.snapshot.get_commander_sc_id_by_id(commander_id)
+        with self.cursor() as cur:
+            cur.execute("""
+                SELECT sc.id FROM scryfall_cards sc
+                INNER JOIN edhrec_commanders ON sc.id = edhrec_commanders.card_id
+                WHERE edhrec_commanders.id = %s AND sc.commander_legal = true
+            """, (commander_id,))
+            row = cur.fetchone()
+            return row[0] if row else None
     
     def get_all_card_types_and_sub_types(self):
-        return self.get_card_types_and_sub_types(self.get_all_cards())
+        return self.get_card_types_and_sub_types(self.catalog.cards(legal_only=True))
     
     def get_card_types_and_sub_types(self, card_list:list):
         super_types = set()
@@ -83,165 +269,142 @@ class CardsContext:
         return list(super_types), list(card_types), list(sub_types)
 
     def get_card_by_id(self, card_id:int) -> dict:
-        self.cur.execute("""
-            SELECT * FROM scryfall_cards
-            WHERE id = %s
-            AND commander_legal = true
-            ORDER BY id ASC
-        """, (card_id,))
-        return self.fetch_list_of_dicts(self.cur)[0]
+        return self.catalog.cards_by_ids([card_id], legal_only=True)[0].to_dict()
     
     def get_card_ids_of_commanders(self) -> list:
-        self.cur.execute("""
-            SELECT ec.card_name, ec.card_id FROM edhrec_commanders ec
-            INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
-            WHERE ec.card_name IS NOT NULL
-            AND ec.id IS NOT NULL
-            AND ec.card_id IS NOT NULL
-            AND sc.commander_legal = true
-            ORDER BY card_id ASC
-        """)
-        return [{'card_name': row[0], 'card_id': row[1]} for row in self.cur.fetchall()]
+        commanders = [
+            commander for commander in self.catalog.commanders()
+            if commander.card_name is not None and commander.card is not None and commander.card.commander_legal
+        ]
+        commanders.sort(key=lambda commander: commander.card_id)
+        return [{'card_name': commander.card_name, 'card_id': commander.card_id} for commander in commanders]
     
     def get_cards(self) -> list:
-        self.cur.execute("""
-            SELECT * FROM scryfall_cards
-            WHERE commander_legal = true
-            ORDER BY id ASC
-        """)
-        return self.fetch_list_of_dicts(self.cur)
+        return self.get_all_cards()
     
     def get_cmd_pct_relations(self) -> list:
-        self.cur.execute("""
-            SELECT cmd.card_id AS cmd_card_id, ec.card_id AS ec_card_id, percentage, synergy_score
-            FROM edhrec_cards ec
-            INNER JOIN edhrec_commanders cmd ON ec.commander_id = cmd.id
-            INNER JOIN scryfall_cards sc1 ON ec.card_id = sc1.id
-            INNER JOIN scryfall_cards sc2 ON cmd.card_id = sc2.id
-            WHERE sc1.commander_legal = true AND sc2.commander_legal = true
-            AND ec.num_decks > %s
-            GROUP BY cmd.card_id, ec.card_id, percentage, synergy_score
-            ORDER BY cmd.card_id ASC
-        """, (self.config['min_num_decks'],))
-        return [{'commander_id': row[0], 'card_id': row[1], 'percentage': row[2], 'synergy_score': row[3]} for row in self.cur.fetchall()]
+        if self.snapshot:
+            return self.snapshot.get_cmd_pct_relations(self.config['min_num_decks'])
+        with self.cursor() as cur:
+            cur.execute(CMD_PCT_RELATIONS_SQL, (self.config['min_num_decks'],))
+            return [{'commander_id': row[0], 'card_id': row[1], 'percentage': row[2], 'synergy_score': row[3]} for row in cur.fetchall()]
+
+    def iter_cmd_pct_relations(self, itersize:int=None):
+        # Same rows as get_cmd_pct_relations() as CmdPctRelation tuples, ~500k of them, so stream instead of building dicts
+        if self.snapshot:
+            columns = self.snapshot.cmd_pct_relation_columns(min_num_decks=self.config['min_num_decks'])
+            for row in self.snapshot.relation_rows(columns):
+                yield CmdPctRelation._make(row)
+            return
+        for row in self.iter_rows(CMD_PCT_RELATIONS_SQL, (self.config['min_num_decks'],), itersize):
+            yield CmdPctRelation._make(row)
+
+    def load_cmd_pct_relation_arrays(self) -> CmdPctRelationArrays:
+        # Same rows as get_cmd_pct_relations() through a binary COPY, parsed in one np.frombuffer instead of a tuple and dict per row
+        if self.snapshot:
+            return cmd_pct_relation_arrays(*self.snapshot.cmd_pct_relation_columns(min_num_decks=self.config['min_num_decks']))
+        buffer = io.BytesIO()
+        with self.cursor() as cur:
+            cur.copy_expert(cur.mogrify(CMD_PCT_RELATIONS_COPY_SQL, (self.config['min_num_decks'],)).decode(), buffer)
+        return parse_cmd_pct_relations_copy(buffer.getbuffer())
 
     def get_related_cards_from_commander_name(self, commander_name:str) -> list:
-        self.cur.execute("""
-            SELECT ec.card_id, ec.percentage, ec.num_decks, ec.synergy_score, sc.*
-            FROM edhrec_cards ec
-            INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
-            WHERE ec.commander_id = (
-                SELECT id FROM edhrec_commanders
-                WHERE card_name = %s
-            )
-            AND sc.commander_legal = true
-            ORDER BY ec.card_id ASC;
-        """, (commander_name,))
-        return self.fetch_list_of_dicts(self.cur)
+        if self.snapshot:
+            return self.snapshot.get_related_cards_from_commander_name(commander_name)
+        with self.cursor() as cur:
+            cur.execute("""
+                SELECT ec.card_id, ec.percentage, ec.num_decks, ec.synergy_score, sc.*
+                FROM edhrec_cards ec
+                INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
+                WHERE ec.commander_id = (
+                    SELECT id FROM edhrec_commanders
+                    WHERE card_name = %s
+                )
+                AND sc.commander_legal = true
+                ORDER BY ec.card_id ASC;
+            """, (commander_name,))
+            return self.fetch_list_of_dicts(cur)
 
     def get_commanders(self) -> list:
-        self.cur.execute("""
-            SELECT * FROM scryfall_cards sc
-            WHERE id IN (
-                SELECT card_id FROM edhrec_commanders ec
-            ) AND commander_legal = true
-            ORDER BY id ASC
-        """)
-        return self.fetch_list_of_dicts(self.cur)
+        return [card.to_dict() for card in self.catalog.commander_cards()]
     
     def get_commander_by_id(self, commander_id:int) -> dict:
-        self.cur.execute("""
-            SELECT * FROM edhrec_commanders
-            WHERE id = %s
-            ORDER BY id ASC
-        """, (commander_id,))
-        return self.fetch_list_of_dicts(self.cur)[0]
+        commander = self.catalog.commander(commander_id)
+        if commander is None:
+            raise IndexError(f"No commander with id {commander_id}")
+        return commander.to_dict()
     
     def get_commander_synergies_by_id(self, commander_id:int) -> list:
-        self.cur.execute("""
-            SELECT ec.card_id, ec.synergy_score
-            FROM edhrec_cards ec
-            INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
-            WHERE commander_id = %s
-            AND sc.commander_legal = true
-            ORDER BY ec.card_id ASC;
-        """, (commander_id,))
-        return self.fetch_list_of_dicts(self.cur)
+        if self.snapshot:
+            return self.snapshot.get_commander_synergies_by_id(commander_id)
+        with self.cursor() as cur:
+            cur.execute("""
+                SELECT ec.card_id, ec.synergy_score
+                FROM edhrec_cards ec
+                INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
+                WHERE commander_id = %s
+                AND sc.commander_legal = true
+                ORDER BY ec.card_id ASC;
+            """, (commander_id,))
+            return self.fetch_list_of_dicts(cur)
     
     def get_cmd_pct_relations_by_id(self, card_id:str) -> list:
-        self.cur.execute("""
-            SELECT cmd.card_id AS cmd_card_id, ec.card_id AS ec_card_id, percentage, synergy_score
-            FROM edhrec_cards ec
-            INNER JOIN edhrec_commanders cmd ON ec.commander_id = cmd.id
-            INNER JOIN scryfall_cards sc1 ON ec.card_id = sc1.id
-            INNER JOIN scryfall_cards sc2 ON cmd.card_id = sc2.id
-            WHERE sc1.commander_legal = true AND sc2.commander_legal = true
-            AND cmd.card_id = %s
-            GROUP BY cmd.card_id, ec.card_id, percentage, synergy_score
-        """, (card_id,))
-        return [{'commander_id': row[0], 'card_id': row[1], 'percentage': row[2], 'synergy_score': row[3]} for row in self.cur.fetchall()]
+        if self.snapshot:
+            return self.snapshot.get_cmd_pct_relations_by_id(card_id)
+        with self.cursor() as cur:
+            cur.execute("""
+                SELECT cmd.card_id AS cmd_card_id, ec.card_id AS ec_card_id, percentage, synergy_score
+                FROM edhrec_cards ec
+                INNER JOIN edhrec_commanders cmd ON ec.commander_id = cmd.id
+                INNER JOIN scryfall_cards sc1 ON ec.card_id = sc1.id
+                INNER JOIN scryfall_cards sc2 ON cmd.card_id = sc2.id
+                WHERE sc1.commander_legal = true AND sc2.commander_legal = true
+                AND cmd.card_id = %s
+                GROUP BY cmd.card_id, ec.card_id, percentage, synergy_score
+            """, (card_id,))
+            return [{'commander_id': row[0], 'card_id': row[1], 'percentage': row[2], 'synergy_score': row[3]} for row in cur.fetchall()]
 
     def get_commander_frequencies_by_id(self, commander_id:int) -> list:
-        self.cur.execute("""
-            SELECT ec.card_id, ec.percentage
-            FROM edhrec_cards ec
-            INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
-            WHERE ec.commander_id = %s
-            AND sc.commander_legal = true
-            ORDER BY ec.card_id ASC;
-        """, (commander_id,))
-        return self.fetch_list_of_dicts(self.cur)
+        if self.snapshot:
+            return self.snapshot.get_commander_frequencies_by_id(commander_id)
+        with self.cursor() as cur:
+            cur.execute("""
+                SELECT ec.card_id, ec.percentage
+                FROM edhrec_cards ec
+                INNER JOIN scryfall_cards sc ON ec.card_id = sc.id
+                WHERE ec.commander_id = %s
+                AND sc.commander_legal = true
+                ORDER BY ec.card_id ASC;
+            """, (commander_id,))
+            return self.fetch_list_of_dicts(cur)
 
     def get_cmd_id_from_sc_id(self, scryfall_id:int) -> int:
-        self.cur.execute("""
-            SELECT cmd.id AS commander_id
-            FROM scryfall_cards sc
-            INNER JOIN edhrec_commanders cmd ON sc.card_name = cmd.card_name
-            WHERE sc.id = %s
-            AND sc.commander_legal = true
-        """, (scryfall_id,))
-        return self.cur.fetchone()[0]
+        card = self.catalog.card(scryfall_id, legal_only=True)
+        return self.catalog.commanders_named(card.card_name)[0].id
 
     def get_card_synergies_by_id(self, card_id:int) -> list:
-        self.cur.execute("""
-            SELECT commander_id, synergy_score FROM edhrec_cards
-            WHERE card_id = %s
-            AND commander_legal = true
-            ORDER BY commander_id ASC
-        """, (card_id,))
-        return self.fetch_list_of_dicts(self.cur)
+        if self.snapshot:
+            return self.snapshot.get_card_synergies_by_id(card_id)
+        with self.cursor() as cur:
+            cur.execute("""
+                SELECT commander_id, synergy_score FROM edhrec_cards
+                WHERE card_id = %s
+                AND commander_legal = true
+                ORDER BY commander_id ASC
+            """, (card_id,))
+            return self.fetch_list_of_dicts(cur)
     
     def get_card_batch_by_id(self, card_ids:list) -> list:
-        self.cur.execute("""
-            SELECT * FROM scryfall_cards
-            WHERE id = ANY(%s)
-        """, (card_ids,))
-        return self.fetch_list_of_dicts(self.cur)
+        return [card.to_dict() for card in self.catalog.cards_by_ids(card_ids)]
     
     def get_commander_batch_by_id(self, commander_ids:list) -> list:
-        self.cur.execute("""
-            SELECT [sc].* FROM scryfall_cards sc
-            INNER JOIN edhrec_commanders ec
-            ON sc.id = ec.card_id
-            WHERE sc.id = ANY(%s)
-        """, (commander_ids,))
-        return self.fetch_list_of_dicts(self.cur)
+        # scryfall_cards rows of the ids that are some commander's card
+        return [card.to_dict() for card in self.catalog.cards_by_ids(commander_ids) if self.catalog.commander_by_card_id(card.id) is not None]
 
     def get_card_by_name(self, card_name:str) -> dict:
-        self.cur.execute("""
-            SELECT * FROM scryfall_cards
-            WHERE card_name = %s
-            AND commander_legal = true
-            ORDER BY id ASC
-        """, (card_name,))
-        if self.cur.rowcount == 0:
-            return None
-        return self.fetch_list_of_dicts(self.cur)[0]
+        card = self.catalog.card_by_name(card_name)
+        return card.to_dict() if card is not None else None
     
     def get_id_by_name(self, card_name:str) -> int:
-        self.cur.execute("""
-            SELECT id FROM scryfall_cards
-            WHERE card_name = %s
-        """, (card_name,))
-        return self.fetch_list_of_dicts(self.cur)
+        return [{'id': card.id} for card in self.catalog.cards_named(card_name)]
         
\ No newline at end of file
@@ -0,0 +1,301 @@
+import os
+import json
+import mmap
+import shutil
+import datetime
+from decimal import Decimal
+import numpy as np
+
+# An on-disk copy of the tables CardsContext reads, so the ML scripts can run without a database:
+#   python cards_snapshot.py                      (export, needs the DB)
+#   CARDS_SNAPSHOT_DIR=cards_snapshot python app.py
+# Every column is its own file and memory-mapped on load, numbers as .npy, everything else as one JSON value per line
+# plus an .npy of byte offsets. The tables are exported whole, CardsContext's filters are applied when they're read.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cards_snapshot")
+MANIFEST_FILE = "manifest.json"
+
+# NULLS FIRST so the 0 stored for a NULL id keeps the id columns sorted for searchsorted
+SNAPSHOT_TABLES = {
+    "scryfall_cards": "SELECT * FROM scryfall_cards ORDER BY id ASC",
+    "edhrec_commanders": "SELECT * FROM edhrec_commanders ORDER BY id ASC",
+    "edhrec_cards": """
+        SELECT id, commander_id, percentage, num_decks, synergy_score, card_id FROM edhrec_cards
+        ORDER BY commander_id ASC NULLS FIRST, card_id ASC NULLS FIRST, id ASC
+    """,
+}
+
+NUMERIC_DTYPES = {"bool": np.bool_, "int": np.int64, "float": np.float64}
+
+def column_kind(values:list) -> str:
+    kinds = {type(value) for value in values if value is not None}
+    if kinds and kinds <= {bool}:
+        return "bool"
+    if kinds and kinds <= {int}:
+        return "int"
+    if kinds and kinds <= {int, float, Decimal}:
+        return "float"
+    return "json"
+
+def json_default(value):
+    # NUMERIC and timestamps outside the numeric columns
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def write_column(directory:str, table:str, column:str, values:list) -> dict:
+    kind = column_kind(values)
+    nulls = np.array([value is None for value in values], dtype=np.bool_)
+    path = os.path.join(directory, f"{table}.{column}")
+    if kind == "json":
+        offsets = []
+        with open(path + ".jsonl", "wb") as f:
+            for value in values:
+                offsets.append(f.tell())
+                f.write(json.dumps(value, default=json_default).encode("utf-8") + b"\n")
+            offsets.append(f.tell())
+        np.save(path + ".offsets.npy", np.array(offsets, dtype=np.int64))
+    else:
+        # NULLs are stored as 0 (NaN for floats) and flagged in the .nulls file
+        fill = float("nan") if kind == "float" else 0
+        np.save(path + ".npy", np.array([fill if value is None else value for value in values], dtype=NUMERIC_DTYPES[kind]))
+    if nulls.any():
+        np.save(path + ".nulls.npy", nulls)
+    return {"name": column, "kind": kind, "nulls": bool(nulls.any())}
+
+def write_snapshot(tables:dict, directory:str=SNAPSHOT_DIR, source:str=None) -> dict:
+    # tables is {table name: iterable of (row, column names)}, as CardsContext.iter_rows_with_columns yields them
+    tmp_directory = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.datetime.now().isoformat(),
+        "source": source,
+        "tables": dict(),
+    }
+    for table, rows in tables.items():
+        columns = []
+        values = None
+        for row, columns in rows:
+            if values is None:
+                values = [[] for _ in columns]
+            for column_values, value in zip(values, row):
+                column_values.append(value)
+        values = values or [[] for _ in columns]
+        manifest["tables"][table] = {
+            "rows": len(values[0]) if values else 0,
+            "columns": [write_column(tmp_directory, table, column, column_values) for column, column_values in zip(columns, values)],
+        }
+    with open(os.path.join(tmp_directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the whole directory in, a reader never sees columns from two different exports
+    old_directory = directory.rstrip(os.sep) + ".old"
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(tmp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+    return manifest
+
+class SnapshotTable:
+    def __init__(self, directory:str, name:str, manifest:dict):
+        self.name = name
+        self.rows = manifest["rows"]
+        self.kinds = {column["name"]: column["kind"] for column in manifest["columns"]}
+        self.columns = list(self.kinds)
+        self.arrays = dict()
+        self.nulls = dict()
+        self.blobs = dict()
+        for column in manifest["columns"]:
+            path = os.path.join(directory, f"{name}.{column['name']}")
+            if column["nulls"]:
+                self.nulls[column["name"]] = np.load(path + ".nulls.npy", mmap_mode="r")
+            if column["kind"] == "json":
+                self.arrays[column["name"]] = np.load(path + ".offsets.npy", mmap_mode="r")
+                with open(path + ".jsonl", "rb") as f:
+                    # mmap can't map an empty file
+                    self.blobs[column["name"]] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+            else:
+                self.arrays[column["name"]] = np.load(path + ".npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name:str) -> np.ndarray:
+        # The mapped array of a numeric column
+        if self.kinds[name] == "json":
+            raise TypeError(f"{self.name}.{name} is not a numeric column")
+        return self.arrays[name]
+
+    def present(self, name:str) -> np.ndarray:
+        # True where the column is not NULL
+        if name not in self.nulls:
+            return np.ones(self.rows, dtype=np.bool_)
+        return ~self.nulls[name]
+
+    def values(self, name:str, rows) -> list:
+        # Python values of one column, None for NULLs
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.kinds[name] == "json":
+            offsets = self.arrays[name]
+            blob = self.blobs[name]
+            values = [json.loads(blob[offsets[row]:offsets[row + 1]]) for row in rows]
+        else:
+            values = self.arrays[name][rows].tolist()
+        if name in self.nulls:
+            nulls = self.nulls[name][rows]
+            values = [None if null else value for value, null in zip(values, nulls)]
+        return values
+
+    def tuples(self, columns:list):
+        # Every row as a tuple of these columns, for loading the card catalog
+        rows = np.arange(self.rows)
+        return zip(*(self.values(column, rows) for column in columns)) if columns else iter(())
+
+    def records(self, rows, columns:list=None) -> list:
+        # One dict per row like CardsContext.fetch_list_of_dicts, decoded column by column
+        columns = columns or self.columns
+        values = [self.values(column, rows) for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)] if columns else [dict() for _ in rows]
+
+def lookup(sorted_ids:np.ndarray, values) -> np.ndarray:
+    # Position of each value in sorted_ids, -1 where it isn't there
+    values = np.asarray(values, dtype=np.int64)
+    if len(sorted_ids) == 0:
+        return np.full(values.shape, -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, values).clip(max=len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == values, positions, -1)
+
+class CardsSnapshot:
+    # Answers CardsContext's edhrec_cards queries from a snapshot, same rows, columns and order as the SQL
+    # The card and commander lookups go through the card catalog, which CardsContext loads from cards and commanders
+    # NUMERIC columns (percentage, synergy_score) come back as floats instead of Decimals
+    def __init__(self, directory:str=SNAPSHOT_DIR):
+        with open(os.path.join(directory, MANIFEST_FILE), "r") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Cards snapshot version {self.manifest.get('version')} is not {SNAPSHOT_VERSION}, export it again")
+        self.directory = directory
+        self.cards = SnapshotTable(directory, "scryfall_cards", self.manifest["tables"]["scryfall_cards"])
+        self.commanders = SnapshotTable(directory, "edhrec_commanders", self.manifest["tables"]["edhrec_commanders"])
+        self.edhrec_cards = SnapshotTable(directory, "edhrec_cards", self.manifest["tables"]["edhrec_cards"])
+        self.card_ids = self.cards.column("id")
+        self.commander_ids = self.commanders.column("id")
+        self.legal_cards = self.cards.column("commander_legal").astype(np.bool_) & self.cards.present("commander_legal")
+
+    def legal(self, card_ids) -> np.ndarray:
+        positions = lookup(self.card_ids, card_ids)
+        return (positions >= 0) & self.legal_cards[positions.clip(min=0)]
+
+    def commander_card_ids(self, commander_ids) -> np.ndarray:
+        # edhrec_commanders.card_id of each commander, -1 where there's no such commander or its card_id is NULL
+        positions = lookup(self.commander_ids, commander_ids)
+        found = (positions >= 0) & self.commanders.present("card_id")[positions.clip(min=0)]
+        return np.where(found, self.commanders.column("card_id")[positions.clip(min=0)], -1)
+
+    def commander_rows(self, commander_id:int) -> np.ndarray:
+        # edhrec_cards rows of one commander, ordered by card_id
+        commander_id_column = self.edhrec_cards.column("commander_id")
+        start, end = np.searchsorted(commander_id_column, [commander_id, commander_id + 1])
+        rows = np.arange(start, end)
+        return rows[self.edhrec_cards.present("commander_id")[rows]]
+
+    def get_commander_sc_id_by_id(self, commander_id:int) -> int:
+        # scryfall_cards id of the commander, None if it has no card_id or its card isn't commander legal
+        card_id = self.commander_card_ids([commander_id])[0]
+        if card_id < 0 or not self.legal([card_id])[0]:
+            return None
+        return int(card_id)
+
+    def cmd_pct_relation_columns(self, min_num_decks:int=None, commander_card_id:int=None) -> tuple:
+        # (commander card_id, card_id, percentage, synergy_score) arrays of the get_cmd_pct_relations queries, duplicates
+        # removed like their GROUP BY and ordered by commander card_id, card_id, NULL percentages/scores are NaN
+        edhrec_cards = self.edhrec_cards
+        commander_card_ids = self.commander_card_ids(edhrec_cards.column("commander_id"))
+        card_ids = edhrec_cards.column("card_id")
+        keep = edhrec_cards.present("commander_id") & edhrec_cards.present("card_id") & self.legal(card_ids) & self.legal(commander_card_ids)
+        if min_num_decks is not None:
+            keep &= edhrec_cards.present("num_decks") & (edhrec_cards.column("num_decks") > min_num_decks)
+        if commander_card_id is not None:
+            keep &= commander_card_ids == commander_card_id
+        rows = np.flatnonzero(keep)
+        commander_card_ids = commander_card_ids[rows]
+        card_ids = np.asarray(card_ids[rows])
+        percentage = np.asarray(edhrec_cards.column("percentage")[rows], dtype=np.float64)
+        synergy_score = np.asarray(edhrec_cards.column("synergy_score")[rows], dtype=np.float64)
+
+        order = np.lexsort((synergy_score, percentage, card_ids, commander_card_ids))
+        columns = [commander_card_ids[order], card_ids[order], percentage[order], synergy_score[order]]
+        if len(order):
+            # GROUP BY treats NULLs as equal
+            duplicate = np.ones(len(order) - 1, dtype=np.bool_)
+            for column in columns:
+                same = column[1:] == column[:-1]
+                if column.dtype.kind == "f":
+                    same |= np.isnan(column[1:]) & np.isnan(column[:-1])
+                duplicate &= same
+            unique = np.append(True, ~duplicate)
+            columns = [column[unique] for column in columns]
+        return tuple(columns)
+
+    def relation_rows(self, columns:tuple):
+        # (commander_id, card_id, percentage, synergy_score) tuples of cmd_pct_relation_columns(), NaN back to None
+        commander_card_ids, card_ids, percentage, synergy_score = columns
+        for commander_id, card_id, pct, score in zip(commander_card_ids.tolist(), card_ids.tolist(), percentage.tolist(), synergy_score.tolist()):
+            yield commander_id, card_id, None if pct != pct else pct, None if score != score else score
+
+    def relation_dicts(self, columns:tuple) -> list:
+        return [{'commander_id': row[0], 'card_id': row[1], 'percentage': row[2], 'synergy_score': row[3]} for row in self.relation_rows(columns)]
+
+    def get_cmd_pct_relations(self, min_num_decks:int) -> list:
+        return self.relation_dicts(self.cmd_pct_relation_columns(min_num_decks=min_num_decks))
+
+    def get_cmd_pct_relations_by_id(self, card_id:int) -> list:
+        return self.relation_dicts(self.cmd_pct_relation_columns(commander_card_id=card_id))
+
+    def get_related_cards_from_commander_name(self, commander_name:str) -> list:
+        commander_rows = [row for row, name in enumerate(self.commanders.values("card_name", np.arange(len(self.commanders)))) if name == commander_name]
+        if not commander_rows:
+            return []
+        rows = self.commander_rows(int(self.commander_ids[commander_rows[0]]))
+        rows = rows[self.legal(self.edhrec_cards.column("card_id")[rows])]
+        related = self.edhrec_cards.records(rows, ["card_id", "percentage", "num_decks", "synergy_score"])
+        cards = self.cards.records(lookup(self.card_ids, [relation['card_id'] for relation in related]))
+        return [{**relation, **card} for relation, card in zip(related, cards)]
+
+    def commander_card_rows(self, commander_id:int, columns:list) -> list:
+        rows = self.commander_rows(commander_id)
+        rows = rows[self.legal(self.edhrec_cards.column("card_id")[rows])]
+        return self.edhrec_cards.records(rows, columns)
+
+    def get_commander_synergies_by_id(self, commander_id:int) -> list:
+        return self.commander_card_rows(commander_id, ["card_id", "synergy_score"])
+
+    def get_commander_frequencies_by_id(self, commander_id:int) -> list:
+        return self.commander_card_rows(commander_id, ["card_id", "percentage"])
+
+    def get_card_synergies_by_id(self, card_id:int) -> list:
+        if not self.legal([card_id])[0]:
+            return []
+        rows = np.flatnonzero((self.edhrec_cards.column("card_id") == card_id) & self.edhrec_cards.present("card_id"))
+        rows = rows[np.argsort(self.edhrec_cards.column("commander_id")[rows], kind="stable")]
+        return self.edhrec_cards.records(rows, ["commander_id", "synergy_score"])
+
+if __name__ == "__main__":
+    import argparse
+    try:
+        from ml_scripts.card_fetcher import CardsContext
+    except ModuleNotFoundError:
+        from card_fetcher import CardsContext
+
+    parser = argparse.ArgumentParser(description="Export the tables CardsContext reads to a snapshot directory")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="Snapshot directory, replaced if it exists")
+    args = parser.parse_args()
+
+    # An empty snapshot_dir always reads from the database, even with CARDS_SNAPSHOT_DIR set
+    manifest = CardsContext(snapshot_dir="").export_snapshot(args.out)
+    for table, info in manifest["tables"].items():
+        print(f"{table}: {info['rows']} rows, {len(info['columns'])} columns")
+    print(f"Snapshot written to {args.out}")
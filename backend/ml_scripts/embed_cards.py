@@ -2,14 +2,15 @@ import pickle
 import numpy as np
 from card_embedder import CardEmbedder
 from card_fetcher import CardsContext
+from embedding_store import save_embedding_store
 
 # Get all cards and commanders
 context = CardsContext()
-cards = context.get_all_cards()
+all_cards = context.get_all_cards()
 commanders = context.get_commanders()
 
 # Filter out split cards
-cards = [card for card in cards if '//' not in card['card_name']]
+cards = [card for card in all_cards if '//' not in card['card_name']]
 commanders = [commander for commander in commanders if '//' not in commander['card_name']]
 
 # Embed cards and commanders
@@ -31,4 +32,9 @@ with open('commander_id_to_index.pkl', 'wb') as f:
 
 # Save embeddings
 np.save("card_embeddings.npy", card_embeddings)
-np.save("commander_embeddings.npy", commander_embeddings)
\ No newline at end of file
+np.save("commander_embeddings.npy", commander_embeddings)
+
+# Property embeddings for the API, covers every card (split cards included) so /analyze rarely has to parse live
+print("Saving serving embeddings...")
+shape = save_embedding_store(embedder, all_cards)
+print(f"Saved {shape[0]} serving embeddings of width {shape[1]}")
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import json
+import mmap
+import hashlib
+import datetime
+import numpy as np
+
+# Precomputed property embeddings (and CardParser output) for every card, written by embed_cards.py and read by the API
+# The matrix is memory-mapped read-only, so every gunicorn worker shares the same pages instead of holding its own copy
+STORE_VERSION = 1
+STORE_DIR = os.path.dirname(os.path.abspath(__file__))
+MATRIX_FILE = "card_property_embeddings.npy"
+PARSED_FILE = "card_property_embeddings.parsed.jsonl"
+INDEX_FILE = "card_property_embeddings.json"
+
+def vocabulary_hash(embedder) -> str:
+    # Rows are only valid for the exact property vocabulary they were encoded with
+    return hashlib.sha256("\n".join(map(str, embedder.parsed_properties_encoder.classes_)).encode("utf-8")).hexdigest()
+
+def save_embedding_store(embedder, cards:list, directory:str=STORE_DIR):
+    parsed_cards = [embedder.parser.parse_card(card) for card in cards]
+    embeddings = embedder.embed_parsed_cards(parsed_cards).astype(np.uint8)
+
+    # One JSON document per line, the offsets let the API read a single card without loading the file
+    offsets = []
+    with open(os.path.join(directory, PARSED_FILE + ".tmp"), "wb") as f:
+        for parsed_card in parsed_cards:
+            offsets.append(f.tell())
+            f.write(json.dumps(parsed_card).encode("utf-8") + b"\n")
+        offsets.append(f.tell())
+
+    index = {
+        "version": STORE_VERSION,
+        "vocabulary_hash": vocabulary_hash(embedder),
+        "created_at": datetime.datetime.now().isoformat(),
+        "shape": list(embeddings.shape),
+        "card_ids": [card["id"] for card in cards],
+        "parsed_offsets": offsets,
+    }
+    np.save(os.path.join(directory, MATRIX_FILE + ".tmp.npy"), embeddings)
+    with open(os.path.join(directory, INDEX_FILE + ".tmp"), "w") as f:
+        json.dump(index, f)
+
+    # Swap the files in, index last, so readers never pair a new index with an old matrix of a different shape
+    os.replace(os.path.join(directory, MATRIX_FILE + ".tmp.npy"), os.path.join(directory, MATRIX_FILE))
+    os.replace(os.path.join(directory, PARSED_FILE + ".tmp"), os.path.join(directory, PARSED_FILE))
+    os.replace(os.path.join(directory, INDEX_FILE + ".tmp"), os.path.join(directory, INDEX_FILE))
+    return embeddings.shape
+
+class EmbeddingStore:
+    def __init__(self, embedder, directory:str=STORE_DIR):
+        with open(os.path.join(directory, INDEX_FILE), "r") as f:
+            index = json.load(f)
+        if index.get("version") != STORE_VERSION:
+            raise ValueError(f"Embedding store version {index.get('version')} is not {STORE_VERSION}")
+        if index.get("vocabulary_hash") != vocabulary_hash(embedder):
+            raise ValueError("Embedding store was built with a different vocabulary, rerun embed_cards.py")
+
+        self.matrix = np.load(os.path.join(directory, MATRIX_FILE), mmap_mode="r")
+        if list(self.matrix.shape) != index["shape"]:
+            raise ValueError(f"Embedding matrix shape {self.matrix.shape} doesn't match its index {index['shape']}")
+        self.rows = {card_id: row for row, card_id in enumerate(index["card_ids"])}
+        self.parsed_offsets = np.array(index["parsed_offsets"], dtype=np.int64)
+        with open(os.path.join(directory, PARSED_FILE), "rb") as f:
+            self.parsed = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def lookup(self, card_ids:list) -> np.ndarray:
+        # Row of each card in the matrix, -1 for cards that weren't embedded (ex. new printings)
+        return np.array([self.rows.get(card_id, -1) for card_id in card_ids], dtype=np.int64)
+
+    def embeddings(self, rows:np.ndarray) -> np.ndarray:
+        # Fancy indexing copies just these rows out of the mapped file
+        return self.matrix[rows]
+
+    def parsed_card(self, row:int) -> dict:
+        return json.loads(self.parsed[self.parsed_offsets[row]:self.parsed_offsets[row + 1]])
@@ -21,14 +21,14 @@ print_limit = config['print_limit']
 min_count = config['min_count']
 
 commander_names = [commander['card_name'] for commander in context.get_commanders() if os.path.exists(f"cmd_models/{converter.sanitize_filename(commander['card_name'])}.joblib")]
-cards = context.get_all_cards()
+# Filtered on the catalog records, only the cards that are kept become dicts
 cards = [
-    card for card in cards
-    if card['card_name'] is not None
-    and card['type_line'] is not None
-    and card['oracle_text'] is not None
-    and '//' not in card['card_name'] 
-    and '//' not in card['type_line'] 
+    card.to_dict() for card in context.iter_all_cards()
+    if card.card_name is not None
+    and card.type_line is not None
+    and card.oracle_text is not None
+    and '//' not in card.card_name 
+    and '//' not in card.type_line 
 ]#[card_start:card_stop]
 
 commander_scores = {commander_name: {card['card_name']: 0 for card in cards} for commander_name in commander_names}
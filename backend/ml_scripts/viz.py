@@ -31,7 +31,6 @@ db = CardsContext()
 # Copied from test.py
 cards_raw = db.get_all_cards()
 commanders_raw = db.get_card_ids_of_commanders()
-rels = db.get_cmd_pct_relations()
 
 cards_raw = [
     card for card in cards_raw 
@@ -62,15 +61,16 @@ for i, commander in enumerate(commanders_raw):
     commanders[commander['card_name']]['cards'] = []
     commanders[commander['card_id']] = commander['card_name']
 
-for rel in rels:
-    commander_name = commander_name_map.get(rel['commander_id'])
-    card_name = card_name_map.get(rel['card_id'])
+# Streamed, the relations are only needed to fill in each commander's card list
+for rel in db.iter_cmd_pct_relations():
+    commander_name = commander_name_map.get(rel.commander_id)
+    card_name = card_name_map.get(rel.card_id)
     if commander_name and card_name:
         commanders[commander_name]['cards'].append(
             (
                 cards[card_name],
-                rel['percentage'],
-                rel['synergy_score']
+                rel.percentage,
+                rel.synergy_score
             )
         )
 
@@ -15,7 +15,7 @@ function DeckOptimizer() {
     const [showDeckEntry, setShowDeckEntry] = useState(false);
 
     const { suggestions, isLoading } = useAutocomplete(commander);
-    const { suggestions: cardSuggestions, fetchSuggestions } = useSuggestions(commander, 100);
+    const { suggestions: cardSuggestions, fetchSuggestions } = useSuggestions(commander, 100, decklist);
     const { reductions, isLoading: isReducing, fetchReductions } = useReductions(commander, 100);
     const { name: commanderFromUrl } = useParams(); // From the URL
 
@@ -5,32 +5,26 @@ export default function useAutocomplete(query, commander = true) {
     const [suggestions, setSuggestions] = useState([]);
     const [isLoading, setIsLoading] = useState(false);
 
+    const BASE_URL = "https://api.cardcognition.com";
+
     const fetchSuggestions = useCallback(
         debounce(async (query) => {
-            setIsLoading(true);
-            let apiUrl;
-            if (commander) {
-                apiUrl = `https://api.scryfall.com/cards/search?q=${encodeURIComponent(
-                    `(${query}) (is:commander game:paper -is:digital)`
-                )}&unique=cards&order=edhrec`;
-            } else {
-                apiUrl = `https://api.scryfall.com/cards/autocomplete?q=${encodeURIComponent(
-                    query
-                )}`;
+            if (!query) {
+                setSuggestions([]);
+                return;
             }
-            const response = await fetch(apiUrl);
-            const data = await response.json();
-            if (data.data) {
-                if (commander) {
-                    setSuggestions(data.data.map((card) => card.name));
-                } else {
-                    // Assuming the card autocomplete returns an array of strings
-                    setSuggestions(data.data);
-                }
-            } else {
+            setIsLoading(true);
+            // Served from the API's in-memory prefix index, ranked by EDHREC rank like the old Scryfall search
+            const apiUrl = `${BASE_URL}/autocomplete?q=${encodeURIComponent(query)}&commander=${commander}`;
+            try {
+                const response = await fetch(apiUrl);
+                const data = await response.json();
+                setSuggestions(data.results || []);
+            } catch (error) {
                 setSuggestions([]);
+            } finally {
+                setIsLoading(false);
             }
-            setIsLoading(false);
         }, 50),
         [commander]
     ); // debounce time is 50ms
@@ -1,7 +1,7 @@
 import { useState, useCallback } from 'react';
 import formatCommanderName from '../helpers/formatCommanderName';
 
-export default function useSuggestions(commanderName, count = 100) {
+export default function useSuggestions(commanderName, count = 100, decklist = "") {
     const [suggestions, setSuggestions] = useState([]);
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState(null);
@@ -11,27 +11,25 @@ export default function useSuggestions(commanderName, count = 100) {
     const fetchSuggestions = useCallback(async (name = commanderName) => {
         setIsLoading(true);
         try {
-            const response = await fetch(`${BASE_URL}/${formatCommanderName(name)}/suggestions/${count}`);
+            // The server skips cards already in the deck and removes duplicates, filling up to count
+            const response = await fetch(`${BASE_URL}/${formatCommanderName(name)}/suggestions`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ count: count, decklist: decklist.split('\n') }),
+            });
             const data = await response.json();
 
             const suggestionsData = data.suggestions.map(({name, score, scryfall_id}) => {
                 return [name, score, scryfall_id];
             });
 
-            // Remove duplicates
-            const uniqueSuggestions = suggestionsData.filter((suggestion, index, self) => {
-                return index === self.findIndex((s) => (
-                    s[0] === suggestion[0] && s[1] === suggestion[1] && s[2] === suggestion[2]
-                ));
-            });
-
-            setSuggestions(uniqueSuggestions);
+            setSuggestions(suggestionsData);
         } catch (error) {
             setError(error.message);
         } finally {
             setIsLoading(false);
         }
-    }, [commanderName, count]);
+    }, [commanderName, count, decklist]);
 
     return { suggestions, isLoading, error, fetchSuggestions };
 }